@@ -1,4 +1,5 @@
-from typing import Optional, Dict, Any
+import re
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
 
 class MentalWellnessAgent:
@@ -11,38 +12,96 @@ class MentalWellnessAgent:
         self.provider = provider
         self.model = model
 
-    def generate_response(self, message: str, user_id: Optional[str] = None, mood_context: Optional[Dict[str, Any]] = None) -> str:
-        """Generate a mood-aware response based on user message and mood context."""
+    def warm_up(self) -> None:
+        """Prepare the agent before the first request (clients, templates, code paths)."""
+        self.generate_response(
+            "warm-up", mood_context={"status": "available", "category": "neutral"}
+        )
+
+    def generate_response(
+        self,
+        message: str,
+        user_id: Optional[str] = None,
+        mood_context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Tuple[str, str]]] = None,
+    ) -> str:
+        """Generate a mood-aware response based on user message, mood context and recent turns.
+
+        ``history`` holds earlier (message, response) pairs, oldest first.
+        """
         msg = message.strip() if message else ""
-        
+
         if not msg:
             return self._get_default_response()
-        
+
         if mood_context and mood_context.get("status") == "available":
-            return self._generate_mood_aware_response(msg, mood_context)
+            return self._generate_mood_aware_response(msg, mood_context, history)
         else:
-            return self._generate_basic_response(msg)
+            return self._generate_basic_response(msg, history)
+
+    def stream_response(
+        self,
+        message: str,
+        user_id: Optional[str] = None,
+        mood_context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Tuple[str, str]]] = None,
+    ) -> Iterator[str]:
+        """Yield the reply in chunks as they are produced.
+
+        The mock has the whole reply at once; a streaming provider would yield its tokens here.
+        """
+        yield from self.chunk_text(self.generate_response(message, user_id, mood_context, history))
+
+    @staticmethod
+    def chunk_text(text: str, words_per_chunk: int = 8) -> Iterator[str]:
+        """Split text into chunks of whole words, keeping the whitespace after each word."""
+        words = re.findall(r"\s*\S+\s*", text)
+        for i in range(0, len(words), words_per_chunk):
+            yield "".join(words[i : i + words_per_chunk])
 
-    def _generate_mood_aware_response(self, message: str, mood_context: Dict[str, Any]) -> str:
+    def build_messages(
+        self, message: str, history: Optional[List[Tuple[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """Chat-completion style message list for real providers (system prompt, prior turns, message)."""
+        messages = [{"role": "system", "content": self._get_safety_disclaimer()}]
+        for user_message, reply in history or ():
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def _acknowledge(self, message: str, history: Optional[List[Tuple[str, str]]]) -> str:
+        """Acknowledge the message, linking it to the previous turn when there is one."""
+        acknowledgment = f'I hear you saying: "{message}".'
+        if history:
+            acknowledgment += f' Earlier you told me: "{history[-1][0]}".'
+        return acknowledgment
+
+    def _generate_mood_aware_response(
+        self,
+        message: str,
+        mood_context: Dict[str, Any],
+        history: Optional[List[Tuple[str, str]]] = None,
+    ) -> str:
         """Generate response tailored to user's mood state."""
         category = mood_context.get("category", "neutral")
         trend = mood_context.get("trend", "stable")
         latest_mood = mood_context.get("latest_mood", 5)
         latest_notes = mood_context.get("latest_notes")
-        
+
         # Acknowledge the user's message
-        acknowledgment = f'I hear you saying: "{message}".'
-        
+        acknowledgment = self._acknowledge(message, history)
+
         # Add mood-specific context if we have recent notes
         if latest_notes:
             acknowledgment += f' I also notice you recently noted: "{latest_notes}".'
-        
+
         # Generate mood-appropriate response
         mood_response = self._get_mood_specific_response(category, trend, latest_mood)
-        
+
         # Add trend-specific encouragement
         trend_response = self._get_trend_response(trend)
-        
+
         return f"{acknowledgment}\n\n{mood_response}{trend_response}\n\n{self._get_safety_disclaimer()}"
 
     def _get_mood_specific_response(self, category: str, trend: str, latest_mood: int) -> str:
@@ -87,9 +146,9 @@ class MentalWellnessAgent:
                 "- Try to stay in the present moment\n"
                 "- Reach out to a trusted friend, family member, or counselor\n"
                 "- Consider professional support if you haven't already"
-            )
+            ),
         }
-        
+
         return responses.get(category, self._get_default_response())
 
     def _get_trend_response(self, trend: str) -> str:
@@ -97,15 +156,17 @@ class MentalWellnessAgent:
         trend_responses = {
             "improving": "\n\nI'm encouraged to see your mood has been improving recently. Keep up the positive momentum!",
             "declining": "\n\nI notice your mood has been declining lately. This is a good time to be extra gentle with yourself and consider additional support.",
-            "stable": "\n\nYour mood has been fairly consistent recently, which shows good stability."
+            "stable": "\n\nYour mood has been fairly consistent recently, which shows good stability.",
         }
-        
+
         return trend_responses.get(trend, "")
 
-    def _generate_basic_response(self, message: str) -> str:
+    def _generate_basic_response(
+        self, message: str, history: Optional[List[Tuple[str, str]]] = None
+    ) -> str:
         """Generate basic response when no mood context is available."""
-        acknowledgment = f'I hear you saying: "{message}".'
-        
+        acknowledgment = self._acknowledge(message, history)
+
         basic_tips = (
             "Here are some general wellness suggestions:\n"
             "- Take a few deep, slow breaths\n"
@@ -113,9 +174,30 @@ class MentalWellnessAgent:
             "- Write down how you're feeling\n"
             "- Connect with someone you trust"
         )
-        
+
         return f"{acknowledgment}\n\n{basic_tips}\n\n{self._get_safety_disclaimer()}"
 
+    def generate_crisis_response(self, category: str = "crisis") -> str:
+        """Fixed safe response for messages flagged by the crisis detector; never model-generated."""
+        if category == "abuse":
+            opening = "Thank you for telling me. What you're describing sounds frightening, and you deserve to be safe."
+        elif category == "harm_to_others":
+            opening = "It sounds like you're carrying a lot right now. Please pause and step away from anyone you might hurt."
+        else:
+            opening = (
+                "I'm really glad you told me, and I'm so sorry you're feeling this way. "
+                "Your life matters, and you don't have to go through this alone."
+            )
+        return (
+            f"{opening}\n\n"
+            "Please reach out for immediate support:\n"
+            "- If you are in immediate danger, call your local emergency number now\n"
+            "- In the US, call or text 988 (Suicide & Crisis Lifeline)\n"
+            "- Elsewhere, contact your local crisis line (findahelpline.com lists services by country)\n"
+            "- If you can, tell someone you trust and stay with them\n\n"
+            "I'm here to keep talking, but a trained person can help right now in ways I can't."
+        )
+
     def _get_default_response(self) -> str:
         """Default response when no message is provided."""
         return (
@@ -1,21 +1,49 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Response
+
+from routes.chat import agent as chat_agent
 from routes.chat import router as chat_router
+from routes.chat_ws import router as chat_ws_router
 from routes.mood import router as mood_router
+from routes.sync import router as sync_router
 from services.config import settings
-from services.logging_service import configure_logging
+from services.logging_service import configure_logging, shutdown_logging
+from services.metrics import MetricsMiddleware, metrics
+from services.outbox import dispatcher
+from services.query_profiler import QueryProfilerMiddleware
+from services.startup import shutdown, warm_up
 
 configure_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pay engine, schema, pool and agent setup before serving instead of on the first request
+    app.state.startup_report = warm_up(chat_agent)
+    if settings.OUTBOX_DISPATCH:
+        dispatcher.start()
+    yield
+    await dispatcher.stop()
+    shutdown()
+    shutdown_logging()
+
+
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI-powered Mental Wellness backend built with FastAPI.",
+    lifespan=lifespan,
 )
 
+app.add_middleware(QueryProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Default docs are served at /docs and /redoc
 app.include_router(chat_router, prefix="/api", tags=["chat"])
 app.include_router(mood_router, prefix="/api", tags=["mood"])
+app.include_router(sync_router, prefix="/api", tags=["sync"])
+app.include_router(chat_ws_router, tags=["chat"])
 
 
 @app.get("/health")
@@ -23,6 +51,11 @@ async def health():
     return {"status": "ok", "app": settings.APP_NAME, "version": settings.APP_VERSION}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
 
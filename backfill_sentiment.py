@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Sentiment backfill script for Mental Wellness API.
+
+Scores mood notes, journal content and chat messages written before
+sentiment scoring existed, using a process pool for the scoring itself.
+"""
+import argparse
+import logging
+import os
+from collections import Counter
+
+from services.database import init_db, iter_shard_sessions
+from services.migrations import backfill_sentiment
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Backfill sentiment scores."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows per committed batch")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Scoring processes (1 scores in-process)",
+    )
+    args = parser.parse_args()
+
+    try:
+        logger.info("Applying schema upgrades...")
+        init_db()
+
+        report = Counter()
+        for shard, session in iter_shard_sessions():
+            logger.info(f"Shard {shard}...")
+            report.update(
+                backfill_sentiment(session, batch_size=args.batch_size, workers=args.workers)
+            )
+
+        for table, count in report.items():
+            logger.info(f"{table}: {count} rows scored")
+        return 0
+
+    except Exception as e:
+        logger.error(f"Sentiment backfill failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
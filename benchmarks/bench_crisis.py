@@ -0,0 +1,105 @@
+"""
+Crisis screening benchmark at lexicon scale.
+
+Builds a lexicon of the shipped phrases plus synthetic ones (default 10k in
+total) and compares screening one message with the Aho-Corasick detector,
+one precompiled regex per phrase, and a single alternation regex.
+
+Usage:
+    python -m benchmarks.bench_crisis --patterns 10000 --messages 2000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from services.crisis import (
+    DEFAULT_LEXICON_PATH,
+    CrisisDetector,
+    CrisisMatch,
+    load_lexicon,
+    normalize_text,
+)
+
+WORDS = (
+    "feel tired alone work sleep night family friend money stress school anxious sad lost "
+    "empty heavy pain future nobody cares hope tomorrow again always never tonight everything"
+).split()
+
+
+def make_lexicon(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    entries = load_lexicon(DEFAULT_LEXICON_PATH)
+    seen = {entry.phrase for entry in entries}
+    while len(entries) < count:
+        phrase = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 5)))
+        if phrase not in seen:
+            seen.add(phrase)
+            entries.append(CrisisMatch("synthetic", phrase))
+    return entries
+
+
+def make_messages(count: int, seed: int = 2) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        message = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        if i % 50 == 0:
+            message += " and honestly I want to die"
+        messages.append(message.capitalize() + ".")
+    return messages
+
+
+def timed(fn, messages: list):
+    started = time.perf_counter()
+    flagged = sum(1 for message in messages if fn(message))
+    return (time.perf_counter() - started) / len(messages) * 1e6, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crisis screening strategies")
+    parser.add_argument("--patterns", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument(
+        "--regex-messages", type=int, default=200, help="Messages for the per-phrase regex loop"
+    )
+    args = parser.parse_args()
+
+    entries = make_lexicon(args.patterns)
+    messages = make_messages(args.messages)
+    print(f"{len(entries)} patterns, {len(messages)} messages")
+
+    started = time.perf_counter()
+    detector = CrisisDetector(entries)
+    print(f"Aho-Corasick build: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    phrases = [normalize_text(entry.phrase) for entry in entries]
+    started = time.perf_counter()
+    per_phrase = [re.compile(re.escape(phrase)) for phrase in phrases]
+    print(f"Per-phrase regex build: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    alternation = re.compile("|".join(map(re.escape, sorted(phrases, key=len, reverse=True))))
+    print(f"Alternation regex build: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def loop(message):
+        normalized = normalize_text(message)
+        return any(pattern.search(normalized) for pattern in per_phrase)
+
+    results = {
+        "aho_corasick": timed(lambda m: detector.first_match(m) is not None, messages),
+        "regex_per_phrase": timed(loop, messages[: args.regex_messages]),
+        "regex_alternation": timed(
+            lambda m: alternation.search(normalize_text(m)) is not None, messages
+        ),
+        "normalize_only": timed(normalize_text, messages),
+    }
+    print(f"{'strategy':<20}{'us/message':>12}{'flagged':>10}")
+    for name, (us, flagged) in results.items():
+        print(f"{name:<20}{us:>12.1f}{flagged:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
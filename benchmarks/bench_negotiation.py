@@ -0,0 +1,140 @@
+"""
+Payload size and encode time for a 90-day history in each negotiated format.
+
+Builds synthetic mood and chat history rows (as the repositories select them)
+and reports the body size and the time to serialize (and compress) it as
+JSON, MessagePack, and either one with gzip or brotli (brotli only when the
+package is installed).
+
+Usage:
+    python -m benchmarks.bench_negotiation --days 90 --moods-per-day 3 --chats-per-day 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from services import negotiation, serialization
+
+NOTES = [
+    "Slept well",
+    "Busy day at work",
+    "Went for a walk",
+    "Feeling anxious about exams",
+    None,
+    "Quiet evening",
+]
+REPLY = (
+    "I hear you saying that today felt heavy. It's okay to take things one step at a time; "
+    "a short walk, a glass of water or a few slow breaths can help. Remember I'm not a substitute "
+    "for professional support."
+)
+
+
+def mood_rows(days: int, per_day: int, rng: random.Random) -> List[tuple]:
+    start = datetime.utcnow() - timedelta(days=days)
+    return [
+        (
+            "bench_user_0000001",
+            rng.randint(1, 10),
+            rng.choice(NOTES),
+            start + timedelta(days=day, hours=8 + 4 * i, seconds=rng.random()),
+        )
+        for day in range(days)
+        for i in range(per_day)
+    ]
+
+
+def chat_rows(days: int, per_day: int, rng: random.Random) -> List[tuple]:
+    start = datetime.utcnow() - timedelta(days=days)
+    rows = []
+    for day in range(days):
+        for i in range(per_day):
+            message = " ".join(
+                rng.choice(["I", "feel", "tired", "today", "work", "sleep", "better", "again"])
+                for _ in range(12)
+            )
+            rows.append(
+                (
+                    len(rows) + 1,
+                    message,
+                    REPLY,
+                    start + timedelta(days=day, minutes=37 * i),
+                    "mock",
+                    "mock-model",
+                )
+            )
+    return rows
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> Tuple[bytes, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return body, (time.perf_counter() - started) / repeat * 1000
+
+
+def report(name: str, variants: List[Tuple[str, Callable[[], bytes]]], repeat: int) -> None:
+    print(f"\n{name}")
+    print(f"{'format':<18}{'bytes':>10}{'ratio':>8}{'ms':>9}")
+    baseline = None
+    for label, fn in variants:
+        body, ms = timed(fn, repeat)
+        baseline = baseline or len(body)
+        print(f"{label:<18}{len(body):>10}{len(body) / baseline:>8.2f}{ms:>9.3f}")
+
+
+def variants_for(encode_json: Callable[[], bytes], encode_msgpack: Callable[[], bytes]):
+    variants = [
+        ("json", encode_json),
+        ("msgpack", encode_msgpack),
+        ("json+gzip", lambda: negotiation.compress(encode_json(), "gzip")),
+        ("msgpack+gzip", lambda: negotiation.compress(encode_msgpack(), "gzip")),
+    ]
+    if negotiation.brotli is not None:
+        variants += [
+            ("json+br", lambda: negotiation.compress(encode_json(), "br")),
+            ("msgpack+br", lambda: negotiation.compress(encode_msgpack(), "br")),
+        ]
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare history payload formats")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--moods-per-day", type=int, default=3)
+    parser.add_argument("--chats-per-day", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    moods = mood_rows(args.days, args.moods_per_day, rng)
+    chats = chat_rows(args.days, args.chats_per_day, rng)
+    print(
+        f"orjson={serialization.orjson is not None} msgpack={serialization.msgpack is not None} "
+        f"brotli={negotiation.brotli is not None}"
+    )
+
+    report(
+        f"mood history: {len(moods)} entries",
+        variants_for(
+            lambda: serialization.encode_mood_history("bench_user_0000001", moods),
+            lambda: serialization.encode_mood_history_msgpack("bench_user_0000001", moods),
+        ),
+        args.repeat,
+    )
+    report(
+        f"chat history: {len(chats)} messages",
+        variants_for(
+            lambda: serialization.encode_chat_history("bench_user_0000001", chats),
+            lambda: serialization.encode_chat_history_msgpack("bench_user_0000001", chats),
+        ),
+        args.repeat,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
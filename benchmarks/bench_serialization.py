@@ -0,0 +1,98 @@
+"""
+Throughput benchmark for history serialization.
+
+Compares the pydantic path (ORM row -> MoodEntry schema -> MoodResponse ->
+response_model re-validation -> JSON) with the fast path that encodes
+selected column tuples directly.
+
+Usage:
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from models.schemas import MoodResponse
+from services import serialization
+from services.repositories import convert_mood_entry_to_schema
+
+
+def make_rows(count: int) -> list:
+    start = datetime.utcnow() - timedelta(days=90)
+    rows = []
+    for i in range(count):
+        notes = random.choice([None, "Slept well", "Stressful day at work, but a good walk helped"])
+        rows.append(("bench_user", random.randint(1, 10), notes, start + timedelta(minutes=13 * i)))
+    return rows
+
+
+def legacy_mood(rows: list) -> bytes:
+    db_moods = [
+        SimpleNamespace(**dict(zip(serialization.MOOD_HISTORY_FIELDS, row))) for row in rows
+    ]
+    response = MoodResponse(
+        user_id="bench_user", moods=[convert_mood_entry_to_schema(m) for m in db_moods]
+    )
+    # FastAPI re-validates the returned model against response_model before encoding
+    return MoodResponse.model_validate(response.model_dump()).model_dump_json().encode("utf-8")
+
+
+def fast_mood(rows: list) -> bytes:
+    return serialization.encode_mood_history("bench_user", rows)
+
+
+def legacy_chat(rows: list) -> bytes:
+    import json
+
+    messages = [dict(zip(serialization.CHAT_HISTORY_FIELDS, row)) for row in rows]
+    payload = jsonable_encoder({"user_id": "bench_user", "messages": messages})
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_chat(rows: list) -> bytes:
+    return serialization.encode_chat_history("bench_user", rows)
+
+
+def measure(func, rows: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mood_rows = make_rows(args.rows)
+    chat_rows = [
+        (i, "How do I relax?", "Try slow breathing." * 5, row[3], "mock", "mock-model")
+        for i, row in enumerate(mood_rows)
+    ]
+
+    print(
+        f"rows={args.rows} repeat={args.repeat} encoder={'orjson' if serialization.orjson else 'json'}"
+    )
+    for name, legacy, fast, rows in (
+        ("mood/history", legacy_mood, fast_mood, mood_rows),
+        ("chat/history", legacy_chat, fast_chat, chat_rows),
+    ):
+        legacy_time = measure(legacy, rows, args.repeat)
+        fast_time = measure(fast, rows, args.repeat)
+        print(
+            f"{name:14s} legacy {args.rows / legacy_time:12,.0f} rows/s | "
+            f"fast {args.rows / fast_time:12,.0f} rows/s | speedup {legacy_time / fast_time:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
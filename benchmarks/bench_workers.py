@@ -0,0 +1,98 @@
+"""
+Throughput scaling with serve.py worker count.
+
+Starts the production launcher with 1, 2, 4, ... workers against the same
+database, drives it over real HTTP with concurrent keep-alive clients, and
+reports requests per second for each worker count.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.bench_workers --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+async def drive(base_url: str, path: str, concurrency: int, duration: float) -> float:
+    """Return requests per second achieved over ``duration`` seconds."""
+    completed = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+
+        async def worker():
+            nonlocal completed
+            while time.monotonic() < deadline:
+                response = await client.get(path)
+                if response.status_code == 200:
+                    completed += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return completed / (time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput scaling with worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/api/mood/statistics?user_id=bench_user_0000001")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+    print(
+        f"path={args.path} concurrency={args.concurrency} duration={args.duration}s cores={os.cpu_count()}"
+    )
+
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "serve.py",
+                "--workers",
+                str(workers),
+                "--port",
+                str(args.port),
+                "--host",
+                "127.0.0.1",
+            ],
+            cwd=ROOT,
+        )
+        try:
+            wait_until_ready(base_url)
+            asyncio.run(drive(base_url, args.path, args.concurrency, 1.0))  # Warm-up
+            rps = asyncio.run(drive(base_url, args.path, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        baseline = baseline or rps
+        print(f"workers={workers:3d}  {rps:10.1f} req/s  scaling {rps / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
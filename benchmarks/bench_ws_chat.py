@@ -0,0 +1,151 @@
+"""
+/ws/chat vs POST /api/chat load test.
+
+Starts the app under uvicorn, then has N concurrent users send M chat
+messages each, once as REST requests on keep-alive connections and once over
+one WebSocket per user, and reports messages per second and latency
+percentiles (send to full reply) for both. Rate limits are raised for the run
+so both transports are measured rather than the token buckets.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.bench_ws_chat --users 16 --messages 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks.bench_workers import ROOT, wait_until_ready
+from benchmarks.load import summarize
+
+MESSAGES = [
+    "Work has been a lot this week",
+    "I slept badly again",
+    "Trying to stay positive",
+    "Feeling a bit better today",
+]
+
+
+async def run_rest(base_url: str, users: List[str], messages: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=len(users), max_keepalive_connections=len(users))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def user(user_id: str):
+            nonlocal errors
+            for i in range(messages):
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/chat", json={"message": MESSAGES[i % len(MESSAGES)], "user_id": user_id}
+                )
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(user_id) for user_id in users))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_ws(ws_url: str, users: List[str], messages: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def user(user_id: str):
+        nonlocal errors
+        async with connect(f"{ws_url}/ws/chat?user_id={user_id}") as ws:
+            json.loads(await ws.recv())  # ready
+            for i in range(messages):
+                started = time.perf_counter()
+                await ws.send(
+                    json.dumps({"type": "message", "message": MESSAGES[i % len(MESSAGES)]})
+                )
+                while True:
+                    frame = json.loads(await ws.recv())
+                    if frame["type"] in ("end", "error"):
+                        break
+                if frame["type"] == "end":
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+    # Connection setup (identification, context load) is part of the measured run
+    started = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in users))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /ws/chat with POST /api/chat")
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=16,
+        help="Concurrent users (one socket or keep-alive connection each)",
+    )
+    parser.add_argument("--messages", type=int, default=50, help="Messages per user")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        CHAT_USER_RATE="100000",
+        CHAT_USER_BURST="100000",
+        CHAT_IP_RATE="100000",
+        CHAT_IP_BURST="100000",
+        LOG_LEVEL="WARNING",
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(args.port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url)
+        results = {}
+        for name, runner, url in (
+            ("rest", run_rest, base_url),
+            ("websocket", run_ws, f"ws://127.0.0.1:{args.port}"),
+        ):
+            users = [f"ws_bench_{name}_{i:03d}" for i in range(args.users)]
+            asyncio.run(runner(url, users, 2))  # Warm-up: users, pools, caches
+            results[name] = asyncio.run(runner(url, users, args.messages))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    print(f"users={args.users} messages/user={args.messages} cores={os.cpu_count()}")
+    print(f"{'transport':<12}{'msg/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, stats in results.items():
+        print(
+            f"{name:<12}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
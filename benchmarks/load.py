@@ -0,0 +1,258 @@
+"""
+In-process async load harness.
+
+Drives the ASGI app through httpx without a network hop and reports
+throughput and latency percentiles per endpoint. Results can be saved as a
+JSON baseline and compared against a previous baseline to catch regressions.
+
+SQLite serializes writers, so write-heavy scenarios at high concurrency mostly
+measure lock contention; point DATABASE_URL at PostgreSQL for realistic runs.
+
+Every request reaches the app from the same ASGI client, which would put the
+whole run in one per-IP rate limit bucket. Requests therefore carry an
+X-Forwarded-For address per seeded user (applied by uvicorn's proxy headers
+middleware, as behind a load balancer); --same-client turns this off to load
+the per-IP limit itself. Rate-limited and shed responses (429/503) are
+reported as "rejected", separately from errors.
+
+Usage:
+    python -m benchmarks.load --users 1000 --requests 2000 --concurrency 32 --save baseline.json
+    python -m benchmarks.load --users 1000 --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app import app
+from benchmarks.seed import user_ids
+
+RequestFactory = Callable[[random.Random, List[str]], Tuple[str, str, Dict[str, Any]]]
+
+# Admission control answers with these; they are expected under load, not failures
+REJECTED_STATUSES = (429, 503)
+
+SCENARIOS: Dict[str, RequestFactory] = {
+    "chat": lambda rng, users: (
+        "POST",
+        "/api/chat",
+        {"json": {"message": "I feel a bit stressed today", "user_id": rng.choice(users)}},
+    ),
+    "mood": lambda rng, users: (
+        "POST",
+        "/api/mood",
+        {
+            "json": {
+                "mood_level": rng.randint(1, 10),
+                "notes": "load test",
+                "user_id": rng.choice(users),
+            }
+        },
+    ),
+    "mood_history": lambda rng, users: (
+        "GET",
+        "/api/mood/history",
+        {"params": {"user_id": rng.choice(users), "days_back": rng.choice([7, 30, 90])}},
+    ),
+    "mood_statistics": lambda rng, users: (
+        "GET",
+        "/api/mood/statistics",
+        {"params": {"user_id": rng.choice(users), "days_back": 30}},
+    ),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def client_address(user_id: str) -> str:
+    """A stable private address per user, so per-IP limits see one client per virtual user."""
+    digest = zlib.crc32(user_id.encode())
+    return f"10.{digest >> 16 & 255}.{digest >> 8 & 255}.{digest & 255}"
+
+
+def summarize(
+    latencies: List[float], errors: int, rejected: int, elapsed: float
+) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors + rejected
+    return {
+        "requests": total,
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    factory: RequestFactory,
+    users: List[str],
+    requests: int,
+    concurrency: int,
+    seed: int,
+    same_client: bool = False,
+) -> Dict[str, float]:
+    """Issue ``requests`` calls from ``concurrency`` workers and summarize them."""
+    rng = random.Random(seed)
+    plan = [factory(rng, users) for _ in range(requests)]
+    if not same_client:
+        for _, _, kwargs in plan:
+            user_id = (kwargs.get("json") or kwargs.get("params"))["user_id"]
+            kwargs["headers"] = {"X-Forwarded-For": client_address(user_id)}
+    latencies: List[float] = []
+    errors = rejected = 0
+    cursor = iter(plan)
+
+    async def worker():
+        nonlocal errors, rejected
+        for method, url, kwargs in cursor:
+            started = time.perf_counter()
+            try:
+                status = (await client.request(method, url, **kwargs)).status_code
+            except httpx.HTTPError:
+                status = None
+            if status is not None and status < 400:
+                latencies.append(time.perf_counter() - started)
+            elif status in REJECTED_STATUSES:
+                rejected += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, rejected, time.perf_counter() - started)
+
+
+async def run(args) -> Dict[str, Any]:
+    users = user_ids(args.users, args.prefix)
+    # Count unhandled app exceptions as failed requests instead of aborting the run
+    # The transport's own client address (127.0.0.1) is the trusted proxy for X-Forwarded-For
+    transport = httpx.ASGITransport(app=ProxyHeadersMiddleware(app), raise_app_exceptions=False)
+    results = {}
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://loadtest", timeout=60
+    ) as client:
+        for name in args.endpoints:
+            factory = SCENARIOS[name]
+            # Warm up connection pools and caches before measuring
+            await run_scenario(
+                client,
+                factory,
+                users,
+                min(50, args.requests),
+                args.concurrency,
+                args.seed + 1,
+                args.same_client,
+            )
+            results[name] = await run_scenario(
+                client, factory, users, args.requests, args.concurrency, args.seed, args.same_client
+            )
+            stats = results[name]
+            print(
+                f"{name:16s} {stats['throughput_rps']:9.1f} req/s  p50 {stats['p50_ms']:8.2f}ms  "
+                f"p95 {stats['p95_ms']:8.2f}ms  p99 {stats['p99_ms']:8.2f}ms  errors {stats['errors']}  "
+                f"rejected {stats['rejected']}"
+            )
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "users": args.users,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "same_client": args.same_client,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return regressions where p95 latency or throughput worsened beyond ``threshold``."""
+    regressions = []
+    for name, stats in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and stats["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if stats["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {stats['throughput_rps']} req/s"
+            )
+        if stats["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {stats['errors']}")
+        if stats["rejected"] > previous.get("rejected", 0):
+            regressions.append(
+                f"{name}: rejected {previous.get('rejected', 0)} -> {stats['rejected']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Async in-process load test for the Mental Wellness API"
+    )
+    parser.add_argument("--users", type=int, default=1000, help="Seeded user count to sample from")
+    parser.add_argument("--prefix", default="bench_user_", help="Seeded user id prefix")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--same-client",
+        action="store_true",
+        help="Send every request from one client address (loads the per-IP limit)",
+    )
+    parser.add_argument("--save", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare results against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression ratio")
+    args = parser.parse_args()
+
+    # httpx logs every request at INFO, which would dominate the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Bulk seeding CLI for load testing.
+
+Builds on init_db.py's initialization, then writes N users x M mood entries
+(and optionally chat messages) with executemany batches. Timestamps follow a
+realistic pattern: each user has their own activity level, entries cluster
+around morning and evening check-ins, and mood levels drift around a
+per-user baseline.
+
+Rows bypass the ORM for speed, so the derived data the repositories and flush
+hooks would have written is written here too: each user lands on their shard
+(DATABASE_SHARDS), with version counters matching their row counts, sentiment
+columns, sync log rows and mood change-detection state. Outbox events are
+left out: the dataset is history, not news, and the dispatcher would
+otherwise have to drain one event per seeded row before a load test starts.
+Every batch of users is committed on its own.
+
+Usage:
+    python -m benchmarks.seed --users 1000 --entries 50 --days 90
+    DATABASE_URL=postgresql://... python -m benchmarks.seed --users 100000 --entries 500
+"""
+
+import argparse
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from models.database import ChatMessage, MoodChangeState, MoodEntry, SyncChange, User
+from services.change_detection import change_detector
+from services.database import db_config, init_db, iter_shard_sessions
+from services.sentiment import sentiment_columns
+from services.sync import UPSERT
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Hours of day weighted toward morning and evening check-ins
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 5, 9, 10, 6, 3, 3, 4, 3, 3, 3, 4, 5, 7, 9, 10, 8, 5, 2]
+NOTES = [
+    None,
+    None,
+    "Slept well",
+    "Busy day at work",
+    "Went for a walk",
+    "Feeling anxious about tomorrow",
+    "Good time with friends",
+    "Tired but okay",
+]
+
+
+def user_ids(count: int, prefix: str) -> List[str]:
+    return [f"{prefix}{i:07d}" for i in range(count)]
+
+
+def generate_mood_rows(
+    user_id: str, entries: int, days: int, now: datetime, rng: random.Random
+) -> List[Dict]:
+    """Generate time-ordered mood entries for one user."""
+    # Heavy users log several times a day, light users a few times a week
+    span_days = max(1, min(days, int(entries / rng.uniform(0.3, 3.0)) + 1))
+    start = now - timedelta(days=span_days)
+    baseline = rng.uniform(3.5, 7.5)
+    level = baseline
+
+    timestamps = []
+    for _ in range(entries):
+        day = start + timedelta(days=rng.randrange(span_days))
+        hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        timestamps.append(
+            day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        )
+    timestamps.sort()
+
+    rows = []
+    for timestamp in timestamps:
+        # Mean-reverting random walk around the user's baseline
+        level += 0.3 * (baseline - level) + rng.gauss(0, 1.2)
+        rows.append(
+            {
+                "user_id": user_id,
+                "mood_level": min(10, max(1, round(level))),
+                "notes": rng.choice(NOTES),
+                "timestamp": timestamp,
+            }
+        )
+    return rows
+
+
+def generate_chat_rows(
+    user_id: str, count: int, days: int, now: datetime, rng: random.Random
+) -> List[Dict]:
+    rows = []
+    for _ in range(count):
+        rows.append(
+            {
+                "user_id": user_id,
+                "message": "I've been feeling a bit overwhelmed lately",
+                "response": "I hear you. Try a few slow, deep breaths and be gentle with yourself.",
+                "ai_provider": "mock",
+                "ai_model": "mock-model",
+                "timestamp": now - timedelta(seconds=rng.randrange(days * 86400)),
+            }
+        )
+    return rows
+
+
+def _insert(session: Session, model, rows: List[Dict]) -> None:
+    """Insert ``rows`` and store each one's assigned id in it."""
+    table = model.__table__
+    result = session.execute(
+        insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+    )
+    for row, row_id in zip(rows, result.scalars()):
+        row["id"] = row_id
+
+
+def seed_users(
+    session: Session,
+    ids: List[str],
+    entries: int,
+    chats: int,
+    days: int,
+    now: datetime,
+    rng: random.Random,
+) -> Dict[str, int]:
+    """Write a group of users with their mood entries, chat messages and derived rows."""
+    sentiment: Dict[Optional[str], Dict] = {}
+
+    def with_sentiment(row: Dict, text_column: str) -> Dict:
+        value = row[text_column]
+        if value not in sentiment:
+            sentiment[value] = sentiment_columns(value)
+        return {**row, **sentiment[value]}
+
+    moods = [
+        with_sentiment(row, "notes")
+        for user_id in ids
+        for row in generate_mood_rows(user_id, entries, days, now, rng)
+    ]
+    messages = [
+        with_sentiment(row, "message")
+        for user_id in ids
+        for row in generate_chat_rows(user_id, chats, days, now, rng)
+    ]
+
+    # Counters as if every row had gone through the repositories, so ETags and cache keys cover the data
+    session.execute(
+        insert(User.__table__),
+        [
+            {
+                "user_id": user_id,
+                "mood_version": entries,
+                "chat_version": chats,
+                "mood_changed_at": now if entries else None,
+                "chat_changed_at": now if chats else None,
+            }
+            for user_id in ids
+        ],
+    )
+    if moods:
+        _insert(session, MoodEntry, moods)
+        session.execute(
+            insert(SyncChange.__table__),
+            [
+                {"user_id": row["user_id"], "entity": "mood", "row_id": row["id"], "op": UPSERT}
+                for row in moods
+            ],
+        )
+        # Each user's entries are generated in timestamp order; history is folded in without alerts
+        states = []
+        for user_id, user_rows in groupby(moods, key=lambda row: row["user_id"]):
+            user_rows = list(user_rows)
+            state, _ = change_detector.replay(row["mood_level"] for row in user_rows)
+            states.append(
+                {
+                    "user_id": user_id,
+                    "observations": state.observations,
+                    "baseline": state.baseline,
+                    "statistic": state.statistic,
+                    "last_entry_id": user_rows[-1]["id"],
+                }
+            )
+        session.execute(insert(MoodChangeState.__table__), states)
+    if messages:
+        _insert(session, ChatMessage, messages)
+    return {"users": len(ids), "mood_entries": len(moods), "chat_messages": len(messages)}
+
+
+def seed(
+    users: int, entries: int, chats: int, days: int, batch_size: int, prefix: str, seed_value: int
+) -> Dict[str, int]:
+    """Insert users, mood entries and chat messages shard by shard, committing each executemany batch."""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    by_shard: Dict[str, List[str]] = {}
+    for user_id in user_ids(users, prefix):
+        by_shard.setdefault(db_config.shard_for(user_id), []).append(user_id)
+    # Whole users per batch, about batch_size rows each
+    users_per_batch = max(1, batch_size // max(1, entries + chats))
+    counts = Counter({"users": 0, "mood_entries": 0, "chat_messages": 0})
+
+    for shard, session in iter_shard_sessions():
+        ids = by_shard.get(shard, [])
+        if session.get_bind().dialect.name == "sqlite":
+            # Trade durability for speed while bulk loading a throwaway dataset
+            session.execute(text("PRAGMA synchronous=OFF"))
+        for start in range(0, len(ids), users_per_batch):
+            counts.update(
+                seed_users(
+                    session, ids[start : start + users_per_batch], entries, chats, days, now, rng
+                )
+            )
+            session.commit()
+            if (start // users_per_batch + 1) % 100 == 0:
+                logger.info(f"... {counts['mood_entries']:,} mood entries")
+        logger.info(f"Shard {shard}: {len(ids):,} users")
+
+    return dict(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Seed the database with a synthetic load-test dataset"
+    )
+    parser.add_argument("--users", type=int, default=1000, help="Number of users")
+    parser.add_argument("--entries", type=int, default=50, help="Mood entries per user")
+    parser.add_argument("--chats", type=int, default=0, help="Chat messages per user")
+    parser.add_argument("--days", type=int, default=90, help="Maximum history span in days")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per executemany batch")
+    parser.add_argument("--prefix", default="bench_user_", help="User id prefix")
+    parser.add_argument(
+        "--seed", type=int, default=42, help="Random seed for reproducible datasets"
+    )
+    args = parser.parse_args()
+
+    init_db()
+    target = (
+        db_config.database_url
+        if db_config.router is None
+        else f"shards {', '.join(db_config.engines)}"
+    )
+    logger.info(f"Seeding {args.users:,} users x {args.entries:,} entries into {target}")
+
+    started = time.perf_counter()
+    counts = seed(
+        args.users, args.entries, args.chats, args.days, args.batch_size, args.prefix, args.seed
+    )
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    logger.info(
+        f"Inserted {counts['users']:,} users, {counts['mood_entries']:,} mood entries and "
+        f"{counts['chat_messages']:,} chat messages in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
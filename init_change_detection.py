@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Change-detection initialization script for Mental Wellness API.
+
+Replays every user's mood history once to seed the per-user mood drop
+detector state; afterwards each new mood entry updates it online.
+"""
+import argparse
+import logging
+from collections import Counter
+
+from services.change_detection import initialize_states
+from services.database import init_db, iter_shard_sessions
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Initialize mood change detection state."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Users per committed batch")
+    parser.add_argument(
+        "--alerts",
+        action="store_true",
+        help="Also record alerts for drops found in history (replaces existing alerts)",
+    )
+    args = parser.parse_args()
+
+    try:
+        logger.info("Applying schema upgrades...")
+        init_db()
+
+        report = Counter()
+        for shard, session in iter_shard_sessions():
+            logger.info(f"Shard {shard}...")
+            report.update(
+                initialize_states(session, batch_size=args.batch_size, record_alerts=args.alerts)
+            )
+
+        logger.info(
+            f"Replayed {report['entries']} entries for {report['users']} users; {report['alerts']} drops found"
+        )
+        return 0
+
+    except Exception as e:
+        logger.error(f"Change detection initialization failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
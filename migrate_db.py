@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Database migration script for Mental Wellness API.
+
+Applies schema upgrades, moves legacy per-message mood context JSON into
+deduplicated mood context snapshots (reporting the storage saved) and logs
+rows written before the /api/sync change log existed.
+"""
+import argparse
+import logging
+from collections import Counter
+
+from services.database import init_db, iter_shard_sessions
+from services.migrations import migrate_chat_mood_contexts
+from services.sync import seed_sync_changes
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Migrate the database."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500, help="Chat rows per committed batch")
+    args = parser.parse_args()
+
+    try:
+        logger.info("Applying schema upgrades...")
+        init_db()
+
+        logger.info("Migrating chat mood contexts to snapshots...")
+        report = Counter()
+        for shard, session in iter_shard_sessions():
+            logger.info(f"Shard {shard}...")
+            report.update(migrate_chat_mood_contexts(session, batch_size=args.batch_size))
+
+        logger.info(f"Rows migrated: {report['rows_migrated']} (skipped: {report['rows_skipped']})")
+        logger.info(f"Snapshots created: {report['snapshots_created']}")
+        logger.info(f"Legacy JSON bytes: {report['legacy_bytes']}")
+        logger.info(
+            f"Snapshot bytes: {report['snapshot_bytes']} + references: {report['reference_bytes']}"
+        )
+        logger.info(f"Storage saved: {report['bytes_saved']} bytes")
+
+        logger.info("Logging existing rows for delta sync...")
+        seeded = Counter()
+        for _shard, session in iter_shard_sessions():
+            seeded.update(seed_sync_changes(session))
+        logger.info(f"Sync log rows seeded: {dict(seeded)}")
+        return 0
+
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,6 +1,7 @@
 """
 SQLAlchemy database models for the Mental Wellness API.
 """
+
 from datetime import datetime
 from typing import Optional
 from sqlalchemy import (
@@ -12,8 +13,11 @@ from sqlalchemy import (
     ForeignKey,
     Boolean,
     Float,
+    Index,
+    JSON,
     create_engine,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy.sql import func
@@ -23,79 +27,116 @@ Base = declarative_base()
 
 class User(Base):
     """User model for storing user information."""
-    
+
     __tablename__ = "users"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), unique=True, index=True, nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=True)
     display_name = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    
+    # Write counters bumped with every mood/chat insert or delete; used for ETags
+    mood_version = Column(Integer, nullable=False, server_default="0")
+    chat_version = Column(Integer, nullable=False, server_default="0")
+    mood_changed_at = Column(DateTime(timezone=True), nullable=True)
+    chat_changed_at = Column(DateTime(timezone=True), nullable=True)
+
     # Relationships
     mood_entries = relationship("MoodEntry", back_populates="user", cascade="all, delete-orphan")
     chat_messages = relationship("ChatMessage", back_populates="user", cascade="all, delete-orphan")
-    journal_entries = relationship("JournalEntry", back_populates="user", cascade="all, delete-orphan")
+    journal_entries = relationship(
+        "JournalEntry", back_populates="user", cascade="all, delete-orphan"
+    )
 
 
 class MoodEntry(Base):
     """Model for storing user mood entries."""
-    
+
     __tablename__ = "mood_entries"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
     mood_level = Column(Integer, nullable=False)  # 1-10 scale
     notes = Column(Text, nullable=True)
+    sentiment_score = Column(Float, nullable=True)  # Lexicon score of notes, -1..1
+    emotion = Column(String(20), nullable=True)  # Dominant emotion in notes
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     # Relationships
     user = relationship("User", back_populates="mood_entries")
 
 
 class ChatMessage(Base):
     """Model for storing chat conversations."""
-    
+
     __tablename__ = "chat_messages"
-    
+    __table_args__ = (
+        # Keyset pagination of a user's history on (timestamp, id)
+        Index("ix_chat_messages_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
     message = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
-    mood_context = Column(Text, nullable=True)  # JSON string of mood context used
+    sentiment_score = Column(Float, nullable=True)  # Lexicon score of the user's message, -1..1
+    emotion = Column(String(20), nullable=True)
+    mood_context = Column(
+        Text, nullable=True
+    )  # Legacy JSON string; superseded by mood_context_snapshot_id
+    mood_context_snapshot_id = Column(
+        Integer, ForeignKey("mood_context_snapshots.id"), nullable=True, index=True
+    )
     ai_provider = Column(String(100), nullable=False)
     ai_model = Column(String(100), nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     # Relationships
     user = relationship("User", back_populates="chat_messages")
+    mood_context_snapshot = relationship("MoodContextSnapshot")
+
+
+class MoodContextSnapshot(Base):
+    """Content-addressed mood context shared by every chat message that used it."""
+
+    __tablename__ = "mood_context_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(
+        String(64), unique=True, index=True, nullable=False
+    )  # SHA-256 of canonical JSON
+    context = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    size_bytes = Column(Integer, nullable=False)  # Length of the canonical JSON encoding
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class JournalEntry(Base):
     """Model for storing private journal entries."""
-    
+
     __tablename__ = "journal_entries"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
     title = Column(String(500), nullable=True)
     content = Column(Text, nullable=False)
     ai_summary = Column(Text, nullable=True)  # Optional AI-generated summary
+    sentiment_score = Column(Float, nullable=True)  # Lexicon score of content, -1..1
+    emotion = Column(String(20), nullable=True)
     is_private = Column(Boolean, default=True, nullable=False)
     tags = Column(String(500), nullable=True)  # Comma-separated tags
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    
+
     # Relationships
     user = relationship("User", back_populates="journal_entries")
 
 
 class ExerciseSession(Base):
     """Model for tracking guided exercise sessions."""
-    
+
     __tablename__ = "exercise_sessions"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
     exercise_type = Column(String(100), nullable=False)  # breathing, meditation, etc.
@@ -104,20 +145,22 @@ class ExerciseSession(Base):
     completion_status = Column(String(50), default="completed")  # completed, partial, skipped
     notes = Column(Text, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     # Relationships
     user = relationship("User", back_populates="exercise_sessions")
 
 
 # Add the relationship to User model
-User.exercise_sessions = relationship("ExerciseSession", back_populates="user", cascade="all, delete-orphan")
+User.exercise_sessions = relationship(
+    "ExerciseSession", back_populates="user", cascade="all, delete-orphan"
+)
 
 
 class MusicSession(Base):
     """Model for tracking music/piano learning sessions."""
-    
+
     __tablename__ = "music_sessions"
-    
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
     session_type = Column(String(100), nullable=False)  # practice, lesson, free_play
@@ -128,10 +171,95 @@ class MusicSession(Base):
     ai_feedback = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     # Relationships
     user = relationship("User", back_populates="music_sessions")
 
 
 # Add the relationship to User model
-User.music_sessions = relationship("MusicSession", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
+User.music_sessions = relationship(
+    "MusicSession", back_populates="user", cascade="all, delete-orphan"
+)
+
+
+class MoodChangeState(Base):
+    """Online change-point detector state per user (see services/change_detection.py)."""
+
+    __tablename__ = "mood_change_states"
+
+    user_id = Column(String(255), ForeignKey("users.user_id"), primary_key=True)
+    observations = Column(
+        Integer, nullable=False, default=0
+    )  # Entries since the baseline was (re)started
+    baseline = Column(Float, nullable=True)  # In-control mean mood level
+    statistic = Column(Float, nullable=False, default=0.0)  # Lower CUSUM, <= 0
+    last_entry_id = Column(Integer, nullable=True)  # Latest mood entry folded into the state
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class MoodAlert(Base):
+    """Sudden mood changes raised by the change-point detector."""
+
+    __tablename__ = "mood_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False, index=True)
+    kind = Column(String(50), nullable=False)  # mood_drop
+    mood_entry_id = Column(Integer, nullable=True)  # Entry that crossed the threshold
+    mood_level = Column(Integer, nullable=False)
+    baseline = Column(Float, nullable=False)
+    statistic = Column(Float, nullable=False)
+    acknowledged = Column(Boolean, default=False, nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+User.mood_change_state = relationship(
+    "MoodChangeState", uselist=False, cascade="all, delete-orphan"
+)
+User.mood_alerts = relationship("MoodAlert", cascade="all, delete-orphan")
+
+
+class SyncChange(Base):
+    """Change log behind /api/sync: one row per insert, update or delete of a synced row."""
+
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        # Delta reads: WHERE user_id = ? AND id > cursor ORDER BY id
+        Index("ix_sync_changes_user_id_id", "user_id", "id"),
+        # Sequences are never reused, even after the newest rows are deleted
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)  # Change sequence, increasing per database
+    user_id = Column(String(255), nullable=False)  # No FK: tombstones outlive their rows
+    entity = Column(String(20), nullable=False)  # mood, journal, exercise, music
+    row_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert, delete
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxEvent(Base):
+    """Domain events written in the same transaction as the change (see services/outbox.py)."""
+
+    __tablename__ = "outbox_events"
+    # Never reuse ids of pruned events: checkpoints only move forward
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)  # Delivery order, increasing per database
+    topic = Column(String(50), nullable=False)  # <entity>.<created|updated|deleted>
+    user_id = Column(String(255), nullable=False, index=True)
+    entity_id = Column(Integer, nullable=False)
+    payload = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class OutboxCheckpoint(Base):
+    """Last event delivered to each consumer, and which dispatcher currently holds it."""
+
+    __tablename__ = "outbox_checkpoints"
+
+    consumer = Column(String(100), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)  # Highest delivered outbox_events.id
+    owner = Column(String(100), nullable=True)  # Dispatcher holding the lease
+    leased_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -13,6 +13,7 @@ class ChatResponse(BaseModel):
     reply: str
     provider: str
     model: str
+    crisis: bool = False  # True when the message was answered on the crisis safe-response path
 
 
 class MoodEntry(BaseModel):
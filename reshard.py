@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Resharding script for Mental Wellness API.
+
+Moves users between databases when the shard set changes: every user whose
+consistent-hash shard differs between --from and --to is copied to the new
+shard and then deleted from the old one. Pause writes while it runs, then
+deploy with DATABASE_SHARDS set to the --to value. Re-running is safe.
+"""
+import argparse
+import logging
+
+from services.config import settings
+from services.database import get_database_url
+from services.sharding import parse_shard_urls, reshard
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Move users to their shards under a new shard set."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--from",
+        dest="source",
+        default=settings.DATABASE_SHARDS,
+        help="Current shard set (DATABASE_SHARDS format; default: DATABASE_SHARDS, "
+        "or the single DATABASE_URL when unsharded)",
+    )
+    parser.add_argument(
+        "--to", dest="target", required=True, help="New shard set (DATABASE_SHARDS format)"
+    )
+    parser.add_argument(
+        "--vnodes", type=int, default=settings.SHARD_VNODES, help="Ring points per shard"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count the users that would move"
+    )
+    args = parser.parse_args()
+
+    try:
+        source = parse_shard_urls(args.source) or {"default": get_database_url()}
+        target = parse_shard_urls(args.target)
+        if not target:
+            logger.error("--to names no shards")
+            return 1
+
+        report = reshard(source, target, vnodes=args.vnodes, dry_run=args.dry_run)
+
+        verb = "would move" if args.dry_run else "moved"
+        logger.info(
+            f"Checked {report['users_checked']} users; {verb} {report['users_moved']} "
+            f"({report['rows_moved']} rows copied)"
+        )
+        return 0
+
+    except Exception as e:
+        logger.error(f"Resharding failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
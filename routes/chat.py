@@ -1,12 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
 from sqlalchemy.orm import Session
 
 from agents.ai_agent import MentalWellnessAgent
 from models.schemas import ChatRequest, ChatResponse
+from services.admission import AdmissionRejected, admission
+from services.cache import cache
+from services.conditional import (
+    etag_matches,
+    get_user_versions,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 from services.config import settings
+from services.conversation import conversations
+from services.crisis import screen_message
+from services.metrics import stage
 from services.mood_context import MoodContextService
+from services.mood_trends import DEFAULT_WINDOWS
+from services.pagination import decode_cursor, encode_cursor
 from services.database import get_db
-from services.repositories import MoodRepository, ChatRepository, convert_mood_entry_to_schema
+from services.idempotency import idempotency
+from services.repositories import MoodRepository, ChatRepository
+from services.negotiation import negotiate_media_type, negotiated_response, representation_headers
+from services.serialization import (
+    MSGPACK_MEDIA_TYPE,
+    encode_chat_history,
+    encode_chat_history_msgpack,
+)
 
 router = APIRouter()
 
@@ -14,66 +37,167 @@ router = APIRouter()
 agent = MentalWellnessAgent(provider=settings.MODEL_PROVIDER, model=settings.MODEL_NAME)
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
-    if not request.message or not request.message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+def _build_mood_context(db: Session, user_id: str):
+    mood_repo = MoodRepository(db)
+    # Only (timestamp, mood_level) pairs and the latest note are needed for context;
+    # the longest trend window is fetched so one pass covers the 7/30/90-day trends
+    with stage("mood_query"):
+        mood_series = mood_repo.get_mood_series_by_user(user_id, days_back=max(DEFAULT_WINDOWS))
+    if not mood_series:
+        return None
+    with stage("mood_context"):
+        context = MoodContextService.get_mood_context(mood_series)
+    # Older entries alone only feed the long windows; chat behaves as with no mood data
+    return context if context["status"] == "available" else None
+
 
+def _cached_mood_context(db: Session, user_id: str, mood_version: int):
+    # Keyed by the mood version like the history bodies: a context built from rows read before a
+    # mood write can still be stored after the write's invalidation, but never under the new version
+    return cache.get_or_set_json(
+        user_id,
+        "mood_context",
+        (mood_version, 7, max(DEFAULT_WINDOWS)),
+        lambda: _build_mood_context(db, user_id),
+    )
+
+
+def _respond(db: Session, request: ChatRequest):
     # Get mood context if user_id is provided
     mood_context = None
+    history = None
     if request.user_id:
-        mood_repo = MoodRepository(db)
-        # Get recent mood entries for this user
-        db_moods = mood_repo.get_mood_entries_by_user(request.user_id, days_back=7)
-        if db_moods:
-            # Convert to schema objects for mood context service
-            user_moods = [convert_mood_entry_to_schema(mood) for mood in db_moods]
-            mood_context = MoodContextService.get_mood_context(user_moods)
+        versions = get_user_versions(db, request.user_id)
+        mood_context = _cached_mood_context(db, request.user_id, versions["mood_version"])
+
+        # Recent turns come from the in-memory window; only the first turn per user reads the database
+        with stage("conversation"):
+            history = conversations.get_turns(
+                request.user_id,
+                versions["chat_version"],
+                lambda limit: ChatRepository(db).get_recent_turns(request.user_id, limit),
+            )
 
     # Generate mood-aware response
-    reply = agent.generate_response(
-        message=request.message, 
-        user_id=request.user_id,
-        mood_context=mood_context
+    with stage("agent"):
+        reply = agent.generate_response(
+            message=request.message,
+            user_id=request.user_id,
+            mood_context=mood_context,
+            history=history,
+        )
+    return reply, mood_context
+
+
+@router.post("/chat", response_model=ChatResponse)
+def chat(
+    request: ChatRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+) -> ChatResponse:
+    """Reply to a message; a retry with the same ``Idempotency-Key`` header replays the first reply."""
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    # Replays are answered before admission control, so retries neither spend rate limit tokens nor agent slots
+    return idempotency.run(
+        "chat", idempotency_key, request, db, lambda: _chat(db, request, http_request)
     )
-    
+
+
+def _chat(db: Session, request: ChatRequest, http_request: Request) -> ChatResponse:
+    with stage("crisis_screen"):
+        crisis = screen_message(request.message)
+
+    client_ip = http_request.client.host if http_request.client else None
+    try:
+        # Rate limits and the agent slot are taken before any database work, so shed requests cost nothing
+        admission.check(request.user_id, client_ip, crisis=crisis is not None)
+        if crisis is not None:
+            # Flagged messages never wait for the model: answer at once with safety resources
+            reply, mood_context = agent.generate_crisis_response(crisis.category), None
+        else:
+            with admission.agent_slot():
+                reply, mood_context = _respond(db, request)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=(
+                "Too many requests."
+                if e.status_code == 429
+                else "Service is busy, please retry shortly."
+            ),
+            headers={"Retry-After": e.retry_after_header},
+        ) from None
+
     # Store chat message in database if user_id is provided
     if request.user_id:
         chat_repo = ChatRepository(db)
-        chat_repo.create_chat_message(
-            user_id=request.user_id,
-            message=request.message,
-            response=reply,
-            ai_provider=agent.provider,
-            ai_model=agent.model,
-            mood_context=mood_context
-        )
-    
+        with stage("chat_insert"):
+            chat_repo.create_chat_message(
+                user_id=request.user_id,
+                message=request.message,
+                response=reply,
+                ai_provider=agent.provider,
+                ai_model=agent.model,
+                mood_context=mood_context,
+            )
+
     return ChatResponse(
         reply=reply,
         provider=agent.provider,
         model=agent.model,
+        crisis=crisis is not None,
     )
 
 
 @router.get("/chat/history")
-async def get_chat_history(user_id: str, limit: int = 20, db: Session = Depends(get_db)):
-    """Get chat history for a user."""
+def get_chat_history(
+    request: Request,
+    user_id: str,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    compact: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Get chat history for a user, newest first; pass ``next_cursor`` back as ``cursor`` for older pages."""
     chat_repo = ChatRepository(db)
-    
-    messages = chat_repo.get_chat_history_by_user(user_id, limit)
-    
-    return {
-        "user_id": user_id,
-        "messages": [
-            {
-                "id": msg.id,
-                "message": msg.message,
-                "response": msg.response,
-                "timestamp": msg.timestamp,
-                "ai_provider": msg.ai_provider,
-                "ai_model": msg.ai_model
-            }
-            for msg in messages
-        ]
-    }
+
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.") from None
+
+    media_type = negotiate_media_type(request)
+    versions = get_user_versions(db, user_id)
+    etag = make_etag("chat_history", versions["chat_version"], limit, cursor or "", int(compact))
+    headers = representation_headers(
+        validator_headers(etag, versions["chat_changed_at"]), media_type
+    )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified("chat_history", headers)
+
+    encode = (
+        encode_chat_history_msgpack if media_type == MSGPACK_MEDIA_TYPE else encode_chat_history
+    )
+
+    def load_page() -> bytes:
+        # One extra row tells whether an older page exists
+        rows = chat_repo.get_chat_history_rows(user_id, limit + 1, before=before, compact=compact)
+        next_cursor = (
+            encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id)
+            if len(rows) > limit
+            else None
+        )
+        return encode(user_id, rows[:limit], compact=compact, next_cursor=next_cursor)
+
+    # Keyed by the version in the ETag: a page stored by a read that raced a write never gets a newer ETag
+    content = cache.get_or_set_bytes(
+        user_id,
+        "chat_history",
+        (versions["chat_version"], limit, cursor or "", int(compact), media_type),
+        load_page,
+    )
+
+    return negotiated_response(request, content, media_type, headers)
@@ -0,0 +1,267 @@
+"""
+WebSocket chat with per-connection session state.
+
+The user is identified once per connection; their mood context and recent
+turns are then held by the connection instead of being looked up for every
+message, replies stream as delta frames, and turns are saved in batches.
+
+Frames (JSON):
+    client  {"type": "hello", "user_id": "...", "token": "..."}  first frame, unless ?user_id= is given
+    server  {"type": "ready", "user_id": "..."}
+    client  {"type": "message", "message": "..."}
+    server  {"type": "start"}, {"type": "delta", "text": "..."} ..., {"type": "end", "reply": "...", "crisis": false, ...}
+    server  {"type": "error", "status": 400 | 429 | 503, "detail": "...", "retry_after": 1}
+
+Unsaved turns are written every WS_CHAT_BATCH_SIZE messages, WS_CHAT_FLUSH_MS
+after the first unsaved one and when the socket closes.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from anyio import CancelScope, from_thread
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.websockets import WebSocketState
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from routes.chat import _cached_mood_context, agent
+from services.admission import AdmissionRejected, admission
+from services.conditional import get_user_versions
+from services.config import settings
+from services.conversation import conversations
+from services.crisis import screen_message
+from services.database import get_db_session
+from services.metrics import metrics
+from services.repositories import ChatRepository
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+metrics.describe("ws_chat_connections", "gauge", "Open /ws/chat connections.")
+metrics.describe("ws_chat_messages_total", "counter", "Messages answered over /ws/chat.")
+metrics.describe(
+    "ws_chat_reply_seconds", "histogram", "Time from a /ws/chat message to its end frame."
+)
+metrics.describe("ws_chat_saved_turns_total", "counter", "Turns written by /ws/chat batch saves.")
+
+# Policy violation: bad or missing credentials
+CLOSE_POLICY_VIOLATION = 1008
+
+_connections_lock = threading.Lock()
+_open_connections = 0
+
+
+def _track_connection(delta: int) -> None:
+    global _open_connections
+    with _connections_lock:
+        _open_connections += delta
+        metrics.set_gauge("ws_chat_connections", _open_connections)
+
+
+def _authorized(token: Optional[str]) -> bool:
+    """Without an API_KEY every client is accepted, as on the REST endpoints."""
+    if not settings.API_KEY:
+        return True
+    return token is not None and hmac.compare_digest(token, settings.API_KEY)
+
+
+class ChatConnection:
+    """State for one socket: the user, their mood context, recent turns and unsaved turns."""
+
+    def __init__(self, user_id: str, client_ip: Optional[str] = None):
+        self.user_id = user_id
+        self.client_ip = client_ip
+        self.mood_context: Optional[Dict[str, Any]] = None
+        self.context_loaded_at = 0.0
+        self.history: Deque[Tuple[str, str]] = deque(maxlen=settings.CONVERSATION_TURNS)
+        self.pending: List[Tuple[str, str, Optional[Dict[str, Any]]]] = []
+        self.pending_since: Optional[float] = None
+
+    def load(self) -> None:
+        """Read the mood context and recent turns once, in one session."""
+        with get_db_session() as db:
+            versions = get_user_versions(db, self.user_id)
+            self._load_mood_context(db, versions["mood_version"])
+            self.history.extend(
+                conversations.get_turns(
+                    self.user_id,
+                    versions["chat_version"],
+                    lambda limit: ChatRepository(db).get_recent_turns(self.user_id, limit),
+                )
+            )
+
+    def _load_mood_context(self, db: Session, mood_version: int) -> None:
+        # Same cache entry as POST /api/chat, so mood writes invalidate both
+        self.mood_context = _cached_mood_context(db, self.user_id, mood_version)
+        self.context_loaded_at = time.monotonic()
+
+    def _refresh_mood_context(self) -> None:
+        if time.monotonic() - self.context_loaded_at < settings.WS_CHAT_CONTEXT_SECONDS:
+            return
+        with get_db_session() as db:
+            self._load_mood_context(db, get_user_versions(db, self.user_id)["mood_version"])
+
+    def reply(self, message: str, emit: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Screen, admit and answer one message, emitting delta frames; runs in a worker thread."""
+        crisis = screen_message(message)
+        admission.check(self.user_id, self.client_ip, crisis=crisis is not None)
+
+        parts = []
+        if crisis is not None:
+            # Flagged messages never wait for the model: answer at once with safety resources
+            mood_context = None
+            emit({"type": "start"})
+            for chunk in agent.chunk_text(agent.generate_crisis_response(crisis.category)):
+                parts.append(chunk)
+                emit({"type": "delta", "text": chunk})
+        else:
+            with admission.agent_slot():
+                self._refresh_mood_context()
+                mood_context = self.mood_context
+                emit({"type": "start"})
+                for chunk in agent.stream_response(
+                    message, self.user_id, mood_context, list(self.history)
+                ):
+                    parts.append(chunk)
+                    emit({"type": "delta", "text": chunk})
+
+        reply = "".join(parts)
+        self.history.append((message, reply))
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append((message, reply, mood_context))
+        if len(self.pending) >= settings.WS_CHAT_BATCH_SIZE:
+            self.flush()
+        return {
+            "type": "end",
+            "reply": reply,
+            "provider": agent.provider,
+            "model": agent.model,
+            "crisis": crisis is not None,
+        }
+
+    def flush_timeout(self) -> Optional[float]:
+        """Seconds until the unsaved turns are due, or None when there are none."""
+        if not self.pending:
+            return None
+        return max(0.0, self.pending_since + settings.WS_CHAT_FLUSH_MS / 1000 - time.monotonic())
+
+    def flush(self) -> None:
+        """Save unsaved turns in one transaction; on failure they are kept for the next attempt."""
+        if not self.pending:
+            return
+        turns, self.pending = self.pending, []
+        try:
+            with get_db_session() as db:
+                chat_repo = ChatRepository(db)
+                for message, reply, mood_context in turns:
+                    chat_repo.create_chat_message(
+                        user_id=self.user_id,
+                        message=message,
+                        response=reply,
+                        ai_provider=agent.provider,
+                        ai_model=agent.model,
+                        mood_context=mood_context,
+                    )
+        except Exception as e:
+            logger.error(f"Saving {len(turns)} chat turns for user {self.user_id} failed: {e}")
+            self.pending = turns + self.pending
+            self.pending_since = time.monotonic()  # Retry after another flush interval
+            return
+        self.pending_since = time.monotonic() if self.pending else None
+        metrics.inc("ws_chat_saved_turns_total", amount=len(turns))
+
+
+async def _identify(websocket: WebSocket) -> Optional[str]:
+    """User id from the query string or the hello frame, if the credentials check out.
+
+    None also when the client disconnects before sending the hello frame.
+    """
+    user_id = websocket.query_params.get("user_id")
+    token = websocket.query_params.get("token")
+    if not user_id:
+        try:
+            hello = json.loads(await websocket.receive_text())
+        except (ValueError, WebSocketDisconnect):
+            return None
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            return None
+        user_id, token = hello.get("user_id"), hello.get("token", token)
+    if not isinstance(user_id, str) or not user_id.strip() or not _authorized(token):
+        return None
+    return user_id
+
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    await websocket.accept()
+    user_id = await _identify(websocket)
+    if user_id is None:
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(
+                code=CLOSE_POLICY_VIOLATION, reason="A valid hello frame with user_id is required."
+            )
+        return
+
+    connection = ChatConnection(user_id, websocket.client.host if websocket.client else None)
+    _track_connection(1)
+    try:
+        await run_in_threadpool(connection.load)
+        await websocket.send_json({"type": "ready", "user_id": user_id})
+
+        def emit(frame: Dict[str, Any]) -> None:
+            from_thread.run(websocket.send_json, frame)
+
+        while True:
+            try:
+                raw = await asyncio.wait_for(websocket.receive_text(), connection.flush_timeout())
+            except asyncio.TimeoutError:
+                await run_in_threadpool(connection.flush)
+                continue
+
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                frame = None
+            message = frame.get("message") if isinstance(frame, dict) else None
+            if not isinstance(message, str) or not message.strip():
+                await websocket.send_json(
+                    {"type": "error", "status": 400, "detail": "Message cannot be empty."}
+                )
+                continue
+
+            started = time.perf_counter()
+            try:
+                end = await run_in_threadpool(connection.reply, message, emit)
+            except AdmissionRejected as e:
+                await websocket.send_json(
+                    {
+                        "type": "error",
+                        "status": e.status_code,
+                        "detail": (
+                            "Too many requests."
+                            if e.status_code == 429
+                            else "Service is busy, please retry shortly."
+                        ),
+                        "retry_after": int(e.retry_after_header),
+                    }
+                )
+                continue
+            await websocket.send_json(end)
+            metrics.inc("ws_chat_messages_total")
+            metrics.observe("ws_chat_reply_seconds", time.perf_counter() - started)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _track_connection(-1)
+        # Shielded: a server shutting down (or a test client closing) cancels the handler, not the last save
+        with CancelScope(shield=True):
+            await run_in_threadpool(connection.flush)
@@ -1,58 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from models.schemas import MoodEntry, MoodResponse
+from services.cache import cache
+from services.conditional import (
+    etag_matches,
+    get_user_versions,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
 from services.database import get_db
+from services.idempotency import idempotency
 from services.repositories import MoodRepository, convert_mood_entry_to_schema
+from services.negotiation import negotiate_media_type, negotiated_response, representation_headers
+from services.serialization import (
+    MSGPACK_MEDIA_TYPE,
+    encode_mood_history,
+    encode_mood_history_msgpack,
+)
+from services.singleflight import singleflight
 
 router = APIRouter()
 
+# Windowed results change as entries age out, so their ETags also roll over every minute
+WINDOW_ETAG_SECONDS = 60
+
+
+def _mood_validators(db: Session, user_id: str, kind: str, days_back: int):
+    """Validator headers plus the (version, window) they were built from.
+
+    Cache keys include the same pair, so a body stored by a read that raced a
+    write can only ever be served with the ETag of the data it was built from.
+    """
+    versions = get_user_versions(db, user_id)
+    window = int(time.time() // WINDOW_ETAG_SECONDS)
+    etag = make_etag(kind, versions["mood_version"], days_back, window)
+    return validator_headers(etag, versions["mood_changed_at"]), (versions["mood_version"], window)
+
 
 @router.post("/mood", response_model=MoodEntry)
-async def log_mood(entry: MoodEntry, db: Session = Depends(get_db)):
-    """Log a mood entry for a user."""
+def log_mood(
+    entry: MoodEntry, db: Session = Depends(get_db), idempotency_key: Optional[str] = Header(None)
+):
+    """Log a mood entry for a user.
+
+    A retry sent with the same ``Idempotency-Key`` header returns the first
+    response instead of logging the mood twice.
+    """
+    return idempotency.run("mood", idempotency_key, entry, db, lambda: _log_mood(db, entry))
+
+
+def _log_mood(db: Session, entry: MoodEntry) -> MoodEntry:
     mood_repo = MoodRepository(db)
-    
+
     # Use a default user_id if none provided (for backward compatibility)
     user_id = entry.user_id or "anonymous_user"
-    
+
     # Create mood entry in database
     db_mood = mood_repo.create_mood_entry(
-        user_id=user_id,
-        mood_level=entry.mood_level,
-        notes=entry.notes,
-        timestamp=entry.timestamp
+        user_id=user_id, mood_level=entry.mood_level, notes=entry.notes, timestamp=entry.timestamp
     )
-    
+
     # Convert to schema and return
     return convert_mood_entry_to_schema(db_mood)
 
 
 @router.get("/mood/history", response_model=MoodResponse)
-async def get_mood_history(user_id: Optional[str] = None, days_back: int = 7, db: Session = Depends(get_db)):
+def get_mood_history(
+    request: Request,
+    user_id: Optional[str] = None,
+    days_back: int = 7,
+    db: Session = Depends(get_db),
+):
     """Get mood history for a specific user or all users."""
     mood_repo = MoodRepository(db)
-    
+    headers = None
+
+    # Column tuples are encoded straight to JSON (or MessagePack) bytes; the response_model only documents the shape
+    media_type = negotiate_media_type(request)
+    encode = (
+        encode_mood_history_msgpack if media_type == MSGPACK_MEDIA_TYPE else encode_mood_history
+    )
     if user_id:
+        validators, etag_state = _mood_validators(db, user_id, "mood_history", days_back)
+        headers = representation_headers(validators, media_type)
+        if etag_matches(request, headers["ETag"]):
+            return not_modified("mood_history", headers)
         # Get moods for specific user
-        db_moods = mood_repo.get_mood_entries_by_user(user_id, days_back=days_back)
-        mood_schemas = [convert_mood_entry_to_schema(mood) for mood in db_moods]
-        return MoodResponse(user_id=user_id, moods=mood_schemas)
+        content = cache.get_or_set_bytes(
+            user_id,
+            "mood_history",
+            (days_back, media_type, *etag_state),
+            lambda: encode(user_id, mood_repo.get_mood_rows_by_user(user_id, days_back=days_back)),
+        )
     else:
         # Return ALL users' moods if no user_id provided (for backward compatibility)
-        db_moods = mood_repo.get_all_mood_entries(days_back=days_back)
-        mood_schemas = [convert_mood_entry_to_schema(mood) for mood in db_moods]
-        return MoodResponse(user_id=None, moods=mood_schemas)
+        content = singleflight.do(
+            f"mood_history:*:{days_back}:{media_type}",
+            lambda: encode(user_id, mood_repo.get_all_mood_rows(days_back=days_back)),
+            kind="mood_history_all",
+        )
+
+    return negotiated_response(request, content, media_type, headers)
 
 
 @router.get("/mood/statistics")
-async def get_mood_statistics(user_id: str, days_back: int = 30, db: Session = Depends(get_db)):
+def get_mood_statistics(
+    request: Request,
+    response: Response,
+    user_id: str,
+    days_back: int = 30,
+    db: Session = Depends(get_db),
+):
     """Get mood statistics for a user."""
     mood_repo = MoodRepository(db)
-    
-    stats = mood_repo.get_user_mood_statistics(user_id, days_back)
+
+    headers, etag_state = _mood_validators(db, user_id, "mood_stats", days_back)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified("mood_stats", headers)
+    response.headers.update(headers)
+
+    stats = cache.get_or_set_json(
+        user_id,
+        "mood_stats",
+        (days_back, *etag_state),
+        lambda: mood_repo.get_user_mood_statistics(user_id, days_back),
+    )
+    return {"user_id": user_id, "statistics": stats}
+
+
+@router.get("/mood/alerts")
+def get_mood_alerts(
+    user_id: str, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)
+):
+    """Get sudden mood drops detected for a user, newest first."""
+    alerts = MoodRepository(db).get_mood_alerts_by_user(user_id, limit=limit)
     return {
         "user_id": user_id,
-        "statistics": stats
+        "alerts": [
+            {
+                "id": alert.id,
+                "kind": alert.kind,
+                "mood_entry_id": alert.mood_entry_id,
+                "mood_level": alert.mood_level,
+                "baseline": alert.baseline,
+                "detected_at": alert.detected_at,
+                "acknowledged": alert.acknowledged,
+            }
+            for alert in alerts
+        ],
     }
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from services.database import db_config, get_db
+from services.pagination import decode_sync_cursor, encode_sync_cursor
+from services.sync import read_changes
+
+router = APIRouter()
+
+
+@router.get("/sync")
+def sync(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Get mood, journal, exercise and music changes since ``cursor`` (everything when omitted).
+
+    Pass the returned ``cursor`` back on the next call; keep calling while
+    ``has_more`` is true. ``reset`` means the cursor no longer applies (the
+    user's data moved to another database) and the client should replace its
+    local copy with the changes that follow.
+    """
+    shard = db_config.shard_for(user_id)
+    after, reset = 0, False
+    if cursor:
+        try:
+            cursor_shard, after = decode_sync_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.") from None
+        if cursor_shard != shard:
+            after, reset = 0, True
+
+    changes, last_sequence, has_more = read_changes(db, user_id, after, limit, shard)
+    return {
+        "user_id": user_id,
+        "changes": changes,
+        "cursor": encode_sync_cursor(shard, last_sequence),
+        "has_more": has_more,
+        "reset": reset,
+    }
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Production launcher for Mental Wellness API.
+
+Runs N uvicorn worker processes (default: one per CPU core) sharing one
+listening socket. Each worker imports the app and builds its own engine and
+connection pool in the lifespan startup; nothing database-related is created
+in the supervisor.
+
+Signals (Unix):
+    SIGHUP   rolling restart: each worker is replaced only after its successor is up
+    SIGTTIN  add a worker
+    SIGTTOU  remove a worker
+    SIGTERM / SIGINT  graceful shutdown
+"""
+import argparse
+import logging
+import os
+import time
+
+import uvicorn
+from uvicorn.supervisors.multiprocess import Multiprocess, Process
+
+from services.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class RollingMultiprocess(Multiprocess):
+    """Multiprocess supervisor whose SIGHUP restart never drops below N live workers."""
+
+    def __init__(self, *args, restart_grace: float = 2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.restart_grace = restart_grace
+
+    def restart_all(self) -> None:
+        for idx, old_process in enumerate(list(self.processes)):
+            new_process = Process(self.config, self.target, self.sockets)
+            new_process.start()
+
+            # Give the replacement time to finish its lifespan warm-up before retiring the old worker
+            deadline = time.monotonic() + self.restart_grace
+            while time.monotonic() < deadline and not self.should_exit.is_set():
+                time.sleep(0.1)
+            if not new_process.is_alive():
+                logger.error(
+                    f"Replacement for worker [{old_process.pid}] failed to start; keeping it"
+                )
+                continue
+
+            old_process.terminate()  # SIGTERM: finishes in-flight requests within the graceful timeout
+            old_process.join()
+            self.processes[idx] = new_process
+            logger.info(f"Replaced worker [{old_process.pid}] with [{new_process.pid}]")
+
+
+def default_workers() -> int:
+    return settings.WEB_CONCURRENCY or os.cpu_count() or 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_workers(),
+        help="Worker processes (default: CPU cores)",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=30, help="Seconds to finish in-flight requests"
+    )
+    parser.add_argument(
+        "--restart-grace",
+        type=float,
+        default=settings.STARTUP_TARGET_MS / 1000,
+        help="Seconds a new worker gets to start before its predecessor is stopped",
+    )
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    config = uvicorn.Config(
+        "app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+    server = uvicorn.Server(config)
+
+    if args.workers <= 1:
+        server.run()
+        return 0
+
+    sock = config.bind_socket()
+    supervisor = RollingMultiprocess(
+        config, target=server.run, sockets=[sock], restart_grace=args.restart_grace
+    )
+    supervisor.run()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,220 @@
+"""
+Admission control for expensive agent calls.
+
+Requests are rate limited per user and per client IP with token buckets
+(stored in GCRA form: one "theoretical arrival time" per key), and in-flight
+agent calls are capped by a semaphore. A request that cannot get an agent
+slot within the queue-wait budget is shed with a 503 instead of piling up
+behind the others. Messages flagged by the crisis detector bypass every limit.
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from services.config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "admission_rejections_total", "counter", "Requests rejected by admission control, by reason."
+)
+metrics.describe(
+    "admission_crisis_bypass_total", "counter", "Crisis messages admitted without limits."
+)
+metrics.describe("agent_inflight", "gauge", "Agent calls currently running.")
+metrics.describe("agent_queue_wait_seconds", "histogram", "Time spent waiting for an agent slot.")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is rate limited (429) or shed under load (503)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, int(self.retry_after + 0.999)))
+
+
+class RateLimiter(ABC):
+    """Token bucket per key: ``rate`` tokens per second, at most ``burst`` stored."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+
+    @abstractmethod
+    def acquire(self, key: str) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available."""
+
+    def _decide(self, tat: Optional[float], now: float):
+        """Return (retry_after, new_tat) for a key whose stored arrival time is ``tat``."""
+        tat = max(tat or now, now)
+        retry_after = tat - now - self.tolerance
+        if retry_after > 0:
+            return retry_after, None
+        return 0.0, tat + self.interval
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Per-process limiter; keys whose bucket has refilled are pruned when the table grows."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        super().__init__(rate, burst)
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._tats: Dict[str, float] = {}
+
+    def acquire(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            retry_after, new_tat = self._decide(self._tats.get(key), now)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+                if len(self._tats) > self.max_keys:
+                    self._prune(now)
+        return retry_after
+
+    def _prune(self, now: float) -> None:
+        # A key whose arrival time has passed has a full bucket, the same as a missing key
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+
+class RedisRateLimiter(RateLimiter):
+    """Limiter shared by all workers; updates use WATCH/MULTI so concurrent takes don't overspend."""
+
+    def __init__(self, client, rate: float, burst: int, prefix: str = "mw:ratelimit"):
+        super().__init__(rate, burst)
+        self.client = client
+        self.prefix = prefix
+
+    def acquire(self, key: str) -> float:
+        import redis
+
+        redis_key = f"{self.prefix}:{key}"
+        ttl_ms = int((self.tolerance + self.interval) * 1000) + 1
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(redis_key)
+                    stored = pipe.get(redis_key)
+                    retry_after, new_tat = self._decide(
+                        float(stored) if stored else None, time.time()
+                    )
+                    if new_tat is None:
+                        pipe.unwatch()
+                        return retry_after
+                    pipe.multi()
+                    pipe.set(redis_key, repr(new_tat), px=ttl_ms)
+                    pipe.execute()
+                    return 0.0
+                except redis.WatchError:
+                    continue
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent agent calls; waiting longer than ``max_wait`` seconds sheds the request."""
+
+    def __init__(self, max_concurrent: int, max_wait: float):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.inflight = 0
+
+    @contextmanager
+    def slot(self, bypass: bool = False) -> Iterator[None]:
+        acquired = False
+        if not bypass:
+            started = time.perf_counter()
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+            metrics.observe("agent_queue_wait_seconds", time.perf_counter() - started)
+            if not acquired:
+                metrics.inc("admission_rejections_total", (("reason", "overloaded"),))
+                raise AdmissionRejected(503, "overloaded", self.max_wait)
+
+        self._track(1)
+        try:
+            yield
+        finally:
+            self._track(-1)
+            if acquired:
+                self._semaphore.release()
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self.inflight += delta
+            metrics.set_gauge("agent_inflight", self.inflight)
+
+
+class AdmissionController:
+    """Per-user and per-IP rate limits plus the agent concurrency cap."""
+
+    def __init__(
+        self, user_limiter: RateLimiter, ip_limiter: RateLimiter, concurrency: ConcurrencyLimiter
+    ):
+        self.user_limiter = user_limiter
+        self.ip_limiter = ip_limiter
+        self.concurrency = concurrency
+
+    def check(self, user_id: Optional[str], client_ip: Optional[str], crisis: bool = False) -> None:
+        """Apply rate limits unless the message was flagged as a crisis message."""
+        if crisis:
+            metrics.inc("admission_crisis_bypass_total")
+            return
+
+        for scope, limiter, key in (
+            ("user", self.user_limiter, user_id),
+            ("ip", self.ip_limiter, client_ip),
+        ):
+            if not key:
+                continue
+            try:
+                retry_after = limiter.acquire(f"{scope}:{key}")
+            except Exception as e:
+                # Fail open: a limiter outage must not take chat down with it
+                logger.warning(f"Rate limiter unavailable ({scope}): {e}")
+                continue
+            if retry_after:
+                metrics.inc("admission_rejections_total", (("reason", f"{scope}_rate"),))
+                raise AdmissionRejected(429, f"{scope}_rate", retry_after)
+
+    def agent_slot(self, bypass: bool = False):
+        return self.concurrency.slot(bypass=bypass)
+
+
+def create_admission_controller() -> AdmissionController:
+    if settings.RATE_LIMIT_BACKEND.lower() == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        client = redis.Redis.from_url(settings.REDIS_URL)
+        user_limiter: RateLimiter = RedisRateLimiter(
+            client, settings.CHAT_USER_RATE, settings.CHAT_USER_BURST
+        )
+        ip_limiter: RateLimiter = RedisRateLimiter(
+            client, settings.CHAT_IP_RATE, settings.CHAT_IP_BURST
+        )
+    else:
+        user_limiter = MemoryRateLimiter(settings.CHAT_USER_RATE, settings.CHAT_USER_BURST)
+        ip_limiter = MemoryRateLimiter(settings.CHAT_IP_RATE, settings.CHAT_IP_BURST)
+
+    concurrency = ConcurrencyLimiter(
+        settings.AGENT_MAX_CONCURRENCY, settings.AGENT_QUEUE_TIMEOUT_MS / 1000
+    )
+    return AdmissionController(user_limiter, ip_limiter, concurrency)
+
+
+# Global admission controller for /api/chat
+admission = create_admission_controller()
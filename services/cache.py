@@ -0,0 +1,263 @@
+"""
+Shared cache for per-user derived data (mood contexts, statistics, history pages).
+
+Two backends implement the same small interface: an in-process LRU for single
+workers and development, and a Redis backend so that every worker sees the
+same entries and invalidations. Keys are namespaced per user
+(``mw:{user_id}:<kind>:<params>``); repository writes mark the user as
+changed and the whole namespace is dropped when the session commits.
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from services.config import settings
+from services.metrics import metrics
+from services.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("cache_requests_total", "counter", "Cache lookups by kind and result (hit/miss).")
+metrics.describe("cache_invalidations_total", "counter", "Per-user cache namespaces invalidated.")
+
+
+class CacheBackend(ABC):
+    """Byte-value store with TTLs and namespace-wide deletion."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int, namespace: str) -> None: ...
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class NullBackend(CacheBackend):
+    """Backend that never stores anything (CACHE_BACKEND=none)."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int, namespace: str) -> None:
+        pass
+
+    def delete_namespace(self, namespace: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe in-process LRU with per-entry TTLs."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, bytes, str]] = OrderedDict()
+        self._namespaces: Dict[str, Set[str]] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, namespace = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, namespace)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int, namespace: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, self._entries[key][2])
+            self._entries[key] = (time.monotonic() + ttl, value, namespace)
+            self._namespaces.setdefault(namespace, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key, (_, _, oldest_namespace) = next(iter(self._entries.items()))
+                self._remove(oldest_key, oldest_namespace)
+
+    def delete_namespace(self, namespace: str) -> None:
+        with self._lock:
+            for key in self._namespaces.pop(namespace, ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._namespaces.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str, namespace: str) -> None:
+        self._entries.pop(key, None)
+        keys = self._namespaces.get(namespace)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[namespace]
+
+
+class RedisBackend(CacheBackend):
+    """Redis-protocol backend; each namespace keeps an index set of its keys."""
+
+    def __init__(self, client):
+        self.client = client
+        self._index_ttl = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        return cls(redis.Redis.from_url(url))
+
+    @staticmethod
+    def _index_key(namespace: str) -> str:
+        return f"{namespace}:__keys__"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int, namespace: str) -> None:
+        index_key = self._index_key(namespace)
+        # The index must outlive every entry it lists, so use the longest TTL seen
+        self._index_ttl = max(self._index_ttl, ttl)
+        pipe = self.client.pipeline()
+        pipe.set(key, value, ex=ttl)
+        pipe.sadd(index_key, key)
+        pipe.expire(index_key, self._index_ttl)
+        pipe.execute()
+
+    def delete_namespace(self, namespace: str) -> None:
+        index_key = self._index_key(namespace)
+        keys = self.client.smembers(index_key)
+        self.client.delete(index_key, *keys)
+
+    def clear(self) -> None:
+        self.client.flushdb()
+
+
+class Cache:
+    """Per-user namespaced cache with JSON helpers and hit-rate metrics."""
+
+    def __init__(self, backend: CacheBackend, prefix: str = "mw", default_ttl: int = 60):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def namespace(self, user_id: str) -> str:
+        # Braces make the user a Redis Cluster hash tag, keeping a user's keys on one node
+        return f"{self.prefix}:{{{user_id}}}"
+
+    def key(self, user_id: str, kind: str, *params: Any) -> str:
+        return ":".join([self.namespace(user_id), kind, *map(str, params)])
+
+    def get_or_set_bytes(
+        self,
+        user_id: str,
+        kind: str,
+        params: Tuple[Any, ...],
+        compute: Callable[[], bytes],
+        ttl: Optional[int] = None,
+    ) -> bytes:
+        """Return cached bytes for (user, kind, params), computing and storing them on a miss.
+
+        Concurrent misses for the same key are coalesced into one computation.
+        """
+        key = self.key(user_id, kind, *params)
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {kind}: {e}")
+            cached = None
+
+        if cached is not None:
+            metrics.inc("cache_requests_total", (("kind", kind), ("result", "hit")))
+            return cached
+
+        metrics.inc("cache_requests_total", (("kind", kind), ("result", "miss")))
+
+        def compute_and_store() -> bytes:
+            value = compute()
+            try:
+                self.backend.set(key, value, ttl or self.default_ttl, self.namespace(user_id))
+            except Exception as e:
+                logger.warning(f"Cache set failed for {kind}: {e}")
+            return value
+
+        return singleflight.do(key, compute_and_store, kind=kind)
+
+    def get_or_set_json(
+        self,
+        user_id: str,
+        kind: str,
+        params: Tuple[Any, ...],
+        compute: Callable[[], Any],
+        ttl: Optional[int] = None,
+    ) -> Any:
+        """JSON-encoded variant of ``get_or_set_bytes``."""
+        encoded = self.get_or_set_bytes(
+            user_id, kind, params, lambda: json.dumps(compute(), default=str).encode("utf-8"), ttl
+        )
+        return json.loads(encoded)
+
+    def invalidate_user(self, user_id: str) -> None:
+        try:
+            self.backend.delete_namespace(self.namespace(user_id))
+            metrics.inc("cache_invalidations_total")
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for user {user_id}: {e}")
+
+    def hit_ratio(self, kind: str) -> Optional[float]:
+        hits = metrics.get_counter("cache_requests_total", (("kind", kind), ("result", "hit")))
+        misses = metrics.get_counter("cache_requests_total", (("kind", kind), ("result", "miss")))
+        return hits / (hits + misses) if hits + misses else None
+
+
+def create_backend(name: str) -> CacheBackend:
+    name = name.lower()
+    if name == "memory":
+        return MemoryBackend(max_entries=settings.CACHE_MAX_ENTRIES)
+    if name == "redis":
+        return RedisBackend.from_url(settings.REDIS_URL)
+    if name == "none":
+        return NullBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+
+# Global cache
+cache = Cache(create_backend(settings.CACHE_BACKEND), default_ttl=settings.CACHE_TTL_SECONDS)
+
+
+def mark_user_changed(session: Session, user_id: str) -> None:
+    """Invalidate the user's cached data once the session's transaction commits."""
+    session.info.setdefault("changed_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_users", ()):
+        cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop("changed_users", None)
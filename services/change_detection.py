@@ -0,0 +1,271 @@
+"""
+Online change-point detection for sudden mood drops.
+
+Each user has a lower one-sided CUSUM over their mood levels: after a short
+warm-up the baseline is the in-control mean, every entry adds
+``level - baseline + drift`` to a statistic clamped at zero, and a statistic
+below ``-threshold`` raises a ``mood_drop`` alert. The baseline follows slow
+changes only while no drop is accumulating, and restarts at the new level
+after an alert.
+
+The state is three numbers per user, persisted in ``mood_change_states`` and
+updated in the same transaction as the mood entry, so restarts never reprocess
+history. ``initialize_states`` replays all history once to seed the table.
+Both fold a user's entries in the order they were logged (entry id), so a
+backdated entry counts as the newest observation either way and the replayed
+state always equals the online one.
+"""
+
+import logging
+from itertools import groupby
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Insert, exists, insert, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.database import MoodAlert, MoodChangeState, MoodEntry
+from services.config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("mood_change_alerts_total", "counter", "Mood change-points detected, by kind.")
+
+# Baseline smoothing while no drop is accumulating
+BASELINE_ALPHA = 0.1
+
+
+class CusumState:
+    """Detector state for one user."""
+
+    __slots__ = ("observations", "baseline", "statistic")
+
+    def __init__(
+        self, observations: int = 0, baseline: Optional[float] = None, statistic: float = 0.0
+    ):
+        self.observations = observations
+        self.baseline = baseline
+        self.statistic = statistic
+
+
+class ChangeDetector:
+    """Lower CUSUM with warm-up, adaptive baseline and restart after each alarm."""
+
+    def __init__(self, drift: float = 1.0, threshold: float = 5.0, warmup: int = 3):
+        self.drift = drift
+        self.threshold = threshold
+        self.warmup = max(1, warmup)
+
+    def step(self, state: CusumState, level: int) -> Optional[Tuple[float, float]]:
+        """Fold one mood level into ``state``; returns (baseline, statistic) when it signals a drop."""
+        if state.observations < self.warmup or state.baseline is None:
+            state.observations += 1
+            previous = state.baseline if state.baseline is not None else float(level)
+            state.baseline = previous + (level - previous) / state.observations
+            return None
+
+        state.observations += 1
+        state.statistic = min(0.0, state.statistic + level - state.baseline + self.drift)
+        if state.statistic < -self.threshold:
+            alarm = (state.baseline, state.statistic)
+            state.observations, state.baseline, state.statistic = 1, float(level), 0.0
+            return alarm
+        if state.statistic == 0.0:
+            state.baseline += BASELINE_ALPHA * (level - state.baseline)
+        return None
+
+    def replay(
+        self, levels: Iterable[int], state: Optional[CusumState] = None
+    ) -> Tuple[CusumState, List[Tuple[int, float, float]]]:
+        """Run a whole series; returns the final state and (index, baseline, statistic) per alarm."""
+        state = state or CusumState()
+        step = self.step
+        alarms = []
+        for index, level in enumerate(levels):
+            alarm = step(state, level)
+            if alarm is not None:
+                alarms.append((index, alarm[0], alarm[1]))
+        return state, alarms
+
+    def observe(self, session: Session, entry: MoodEntry) -> Optional[MoodAlert]:
+        """Update the user's persisted state with a new (flushed) entry, adding an alert on a drop."""
+        row = self._locked_state(session, entry.user_id)
+        created = row is None and self._insert_state(session, entry)
+        if row is None:
+            row = self._locked_state(session, entry.user_id)
+        if created:
+            # First entry since the detector existed: fold earlier history once, without alerting on it
+            history = (
+                session.query(MoodEntry.mood_level)
+                .filter(MoodEntry.user_id == entry.user_id, MoodEntry.id != entry.id)
+                .order_by(MoodEntry.id)
+            )
+            state, _ = self.replay(level for (level,) in history)
+        else:
+            state = CusumState(row.observations, row.baseline, row.statistic)
+
+        alarm = self.step(state, entry.mood_level)
+        row.observations, row.baseline, row.statistic = (
+            state.observations,
+            state.baseline,
+            state.statistic,
+        )
+        row.last_entry_id = entry.id
+        if alarm is None:
+            return None
+
+        alert = MoodAlert(
+            user_id=entry.user_id,
+            kind="mood_drop",
+            mood_entry_id=entry.id,
+            mood_level=entry.mood_level,
+            baseline=round(alarm[0], 2),
+            statistic=round(alarm[1], 2),
+        )
+        session.add(alert)
+        metrics.inc("mood_change_alerts_total", (("kind", "mood_drop"),))
+        logger.info(
+            f"Mood drop detected for user {entry.user_id}: level {entry.mood_level}, baseline {alarm[0]:.1f}"
+        )
+        return alert
+
+    @staticmethod
+    def _locked_state(session: Session, user_id: str) -> Optional[MoodChangeState]:
+        return (
+            session.query(MoodChangeState)
+            .filter(MoodChangeState.user_id == user_id)
+            .with_for_update()
+            .first()
+        )
+
+    @staticmethod
+    def _insert_state(session: Session, entry: MoodEntry) -> bool:
+        """Create an empty state row for the entry's user; False if a concurrent entry already did.
+
+        FOR UPDATE locks nothing while the row does not exist, so two first
+        entries can both get here; the primary key arbitrates and the loser
+        waits for the winner's commit instead of failing on a duplicate insert.
+        """
+        shard = inspect(entry).identity_token
+        bind_arguments = (
+            {"shard_id": shard} if shard is not None else {"mapper": MoodChangeState.__mapper__}
+        )
+        connection = session.connection(bind_arguments=bind_arguments)
+        values = {"user_id": entry.user_id, "observations": 0, "statistic": 0.0}
+        return connection.execute(_insert_missing_states(connection).values(**values)).rowcount == 1
+
+
+def _insert_missing_states(connection) -> Insert:
+    """INSERT into mood_change_states that skips users who already have a row, where the dialect supports it."""
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        return dialect_insert(MoodChangeState).on_conflict_do_nothing(index_elements=["user_id"])
+    return insert(MoodChangeState)
+
+
+def initialize_states(
+    session: Session, batch_size: int = 1000, record_alerts: bool = False
+) -> dict:
+    """Rebuild every user's detector state from their full mood history.
+
+    Users are processed ``batch_size`` at a time, each batch in its own
+    transaction: the batch's existing state rows are locked, one scan ordered
+    by (user, id) is replayed in memory, locked rows are updated in place and
+    missing ones inserted (and, optionally, the batch's historical alerts
+    replaced). Nothing is deleted up front, so mood entries logged while the
+    rebuild runs keep working: they wait on the locked rows and then step the
+    rebuilt state, and a row a first entry creates meanwhile has replayed the
+    full history itself and is kept. States of users without entries are
+    dropped at the end.
+    """
+    report = {"users": 0, "entries": 0, "alerts": 0}
+    bind_arguments = {"mapper": MoodChangeState.__mapper__}
+    last_user_id = ""
+    while True:
+        user_ids = [
+            user_id
+            for (user_id,) in session.query(MoodEntry.user_id)
+            .filter(MoodEntry.user_id > last_user_id)
+            .distinct()
+            .order_by(MoodEntry.user_id)
+            .limit(batch_size)
+        ]
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        existing = {
+            user_id
+            for (user_id,) in session.query(MoodChangeState.user_id)
+            .filter(MoodChangeState.user_id.in_(user_ids))
+            .with_for_update()
+        }
+        rows = (
+            session.query(MoodEntry.user_id, MoodEntry.id, MoodEntry.mood_level)
+            .filter(MoodEntry.user_id.in_(user_ids))
+            .order_by(MoodEntry.user_id, MoodEntry.id)
+            .all()
+        )
+        states, alerts = [], []
+        for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+            user_rows = list(user_rows)
+            state, alarms = change_detector.replay(row[2] for row in user_rows)
+            states.append(
+                {
+                    "user_id": user_id,
+                    "observations": state.observations,
+                    "baseline": state.baseline,
+                    "statistic": state.statistic,
+                    "last_entry_id": user_rows[-1][1],
+                }
+            )
+            if record_alerts:
+                alerts.extend(
+                    {
+                        "user_id": user_id,
+                        "kind": "mood_drop",
+                        "mood_entry_id": user_rows[index][1],
+                        "mood_level": user_rows[index][2],
+                        "baseline": round(baseline, 2),
+                        "statistic": round(statistic, 2),
+                    }
+                    for index, baseline, statistic in alarms
+                )
+            report["entries"] += len(user_rows)
+            report["alerts"] += len(alarms)
+
+        session.bulk_update_mappings(
+            MoodChangeState, [state for state in states if state["user_id"] in existing]
+        )
+        missing = [state for state in states if state["user_id"] not in existing]
+        if missing:
+            connection = session.connection(bind_arguments=bind_arguments)
+            connection.execute(_insert_missing_states(connection), missing)
+        if record_alerts:
+            session.query(MoodAlert).filter(MoodAlert.user_id.in_(user_ids)).delete(
+                synchronize_session=False
+            )
+            if alerts:
+                session.bulk_insert_mappings(MoodAlert, alerts)
+        session.commit()
+        report["users"] += len(states)
+        logger.info(f"Change detection: {report['users']} users initialized")
+
+    has_entries = exists().where(MoodEntry.user_id == MoodChangeState.user_id)
+    session.query(MoodChangeState).filter(~has_entries).delete(synchronize_session=False)
+    if record_alerts:
+        session.query(MoodAlert).filter(
+            ~exists().where(MoodEntry.user_id == MoodAlert.user_id)
+        ).delete(synchronize_session=False)
+    session.commit()
+    return report
+
+
+# Global detector instance
+change_detector = ChangeDetector(
+    drift=settings.MOOD_CHANGE_DRIFT,
+    threshold=settings.MOOD_CHANGE_THRESHOLD,
+    warmup=settings.MOOD_CHANGE_WARMUP,
+)
@@ -0,0 +1,83 @@
+"""
+Conditional GET support for per-user read endpoints.
+
+Each user row carries write counters for mood and chat data. Validators are
+derived from those counters, read with a one-row primary-key lookup, which
+lets an ``If-None-Match`` request be answered with 304 before any rows are
+loaded or serialized. The counters are deliberately not cached: a read that
+loaded them just before a write commits could store them after the write's
+invalidation and keep serving the old ETag.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from services.metrics import metrics
+from services.repositories import UserRepository
+
+metrics.describe(
+    "http_not_modified_total", "counter", "Conditional GETs answered with 304, by kind."
+)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def _epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # SQLite returns naive UTC
+    return value.timestamp()
+
+
+def get_user_versions(db: Session, user_id: str) -> Dict[str, Any]:
+    """Current write counters and change times (epoch seconds) for a user."""
+    row = UserRepository(db).get_data_versions(user_id)
+    if row is None:
+        return {
+            "mood_version": 0,
+            "chat_version": 0,
+            "mood_changed_at": None,
+            "chat_changed_at": None,
+        }
+    return {
+        "mood_version": row.mood_version,
+        "chat_version": row.chat_version,
+        "mood_changed_at": _epoch(row.mood_changed_at),
+        "chat_changed_at": _epoch(row.chat_changed_at),
+    }
+
+
+def make_etag(*parts: Any) -> str:
+    return 'W/"' + "-".join(map(str, parts)) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of ``etag`` against the request's If-None-Match header."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def validator_headers(etag: str, last_modified: Optional[float]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            datetime.fromtimestamp(last_modified, tz=timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def not_modified(kind: str, headers: Dict[str, str]) -> Response:
+    metrics.inc("http_not_modified_total", (("kind", kind),))
+    return Response(status_code=304, headers=headers)
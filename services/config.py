@@ -16,5 +16,102 @@ class Settings:
     # Optional API key (not required for mock)
     API_KEY: str | None = os.getenv("API_KEY")
 
+    ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
+
+    # Startup: production schemas are managed by migrate_db.py, so create_all is skipped there
+    DB_CREATE_TABLES: bool = (
+        os.getenv("DB_CREATE_TABLES", "false" if ENVIRONMENT == "production" else "true").lower()
+        == "true"
+    )
+    DB_WARM_CONNECTIONS: int = int(os.getenv("DB_WARM_CONNECTIONS", "2"))
+    STARTUP_TARGET_MS: float = float(os.getenv("STARTUP_TARGET_MS", "2000"))
+
+    # User sharding: "name=url,name=url" (or bare URLs); empty keeps the single DATABASE_URL.
+    # Users are placed by consistent hashing with SHARD_VNODES ring points per shard
+    DATABASE_SHARDS: str = os.getenv("DATABASE_SHARDS", "")
+    SHARD_VNODES: int = int(os.getenv("SHARD_VNODES", "256"))
+
+    # Worker processes for serve.py; 0 means one per CPU core
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+
+    # Cache for per-user derived data: "memory" (per worker), "redis" (shared) or "none"
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Per-user conversation windows held in memory for multi-turn agent context
+    CONVERSATION_TURNS: int = int(os.getenv("CONVERSATION_TURNS", "10"))
+    CONVERSATION_MAX_USERS: int = int(os.getenv("CONVERSATION_MAX_USERS", "10000"))
+    CONVERSATION_MAX_BYTES: int = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # /ws/chat: turns are saved every WS_CHAT_BATCH_SIZE messages or WS_CHAT_FLUSH_MS after the first
+    # unsaved one; the connection's mood context is refreshed after WS_CHAT_CONTEXT_SECONDS
+    WS_CHAT_BATCH_SIZE: int = int(os.getenv("WS_CHAT_BATCH_SIZE", "10"))
+    WS_CHAT_FLUSH_MS: int = int(os.getenv("WS_CHAT_FLUSH_MS", "1000"))
+    WS_CHAT_CONTEXT_SECONDS: float = float(os.getenv("WS_CHAT_CONTEXT_SECONDS", "60"))
+
+    # Outbox dispatcher: runs in the app lifespan (OUTBOX_DISPATCH), delivers up to OUTBOX_BATCH_SIZE events
+    # per consumer batch, polls every OUTBOX_POLL_MS when idle (commits wake it sooner), holds a consumer for
+    # OUTBOX_LEASE_SECONDS per renewal, backs off failing consumers up to OUTBOX_RETRY_MAX_SECONDS and deletes
+    # delivered events after OUTBOX_RETENTION_HOURS
+    OUTBOX_DISPATCH: bool = os.getenv("OUTBOX_DISPATCH", "true").lower() == "true"
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    OUTBOX_POLL_MS: int = int(os.getenv("OUTBOX_POLL_MS", "500"))
+    OUTBOX_LEASE_SECONDS: float = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+    OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "60"))
+    OUTBOX_RETENTION_HOURS: float = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+    # Readers of outbox_events and sync_changes wait this long for a missing id (a transaction that flushed but has not
+    # committed yet) before treating it as rolled back; keep it above the longest write transaction
+    SEQUENCE_GAP_SECONDS: float = float(os.getenv("SEQUENCE_GAP_SECONDS", "30"))
+
+    # History responses at least this large are gzip/brotli compressed when the client accepts it
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+    # Crisis phrase lexicon compiled at startup; empty uses services/crisis_lexicon.txt
+    CRISIS_LEXICON_PATH: str = os.getenv("CRISIS_LEXICON_PATH", "")
+
+    # Mood drop detection (lower CUSUM): slack per entry and alarm threshold in mood points,
+    # entries averaged into a baseline before alarms are possible
+    MOOD_CHANGE_DRIFT: float = float(os.getenv("MOOD_CHANGE_DRIFT", "1.0"))
+    MOOD_CHANGE_THRESHOLD: float = float(os.getenv("MOOD_CHANGE_THRESHOLD", "5.0"))
+    MOOD_CHANGE_WARMUP: int = int(os.getenv("MOOD_CHANGE_WARMUP", "3"))
+
+    # Admission control for /api/chat: token buckets (requests/second, burst) per user and per IP,
+    # a cap on concurrent agent calls and how long a request may wait for one before a 503
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    CHAT_USER_RATE: float = float(os.getenv("CHAT_USER_RATE", "1"))
+    CHAT_USER_BURST: int = int(os.getenv("CHAT_USER_BURST", "10"))
+    CHAT_IP_RATE: float = float(os.getenv("CHAT_IP_RATE", "20"))
+    CHAT_IP_BURST: int = int(os.getenv("CHAT_IP_BURST", "100"))
+    AGENT_MAX_CONCURRENCY: int = int(os.getenv("AGENT_MAX_CONCURRENCY", "16"))
+    AGENT_QUEUE_TIMEOUT_MS: int = int(os.getenv("AGENT_QUEUE_TIMEOUT_MS", "2000"))
+
+    # Idempotency-Key support for POST /api/mood and /api/chat: how long responses are replayed,
+    # how long a claimed key is held if its request dies, and how long a duplicate waits for the first
+    IDEMPOTENCY_BACKEND: str = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    IDEMPOTENCY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LOCK_SECONDS: float = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+    IDEMPOTENCY_WAIT_MS: int = int(os.getenv("IDEMPOTENCY_WAIT_MS", "10000"))
+    IDEMPOTENCY_MAX_KEYS: int = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+    # Logging: LOG_FORMAT is "text" or "json"; LOG_ASYNC writes from a background thread.
+    # LOG_SAMPLING ("services.repositories=0.1") keeps a fraction of sub-WARNING records per logger;
+    # LOG_RATE_LIMIT ("httpx=20/s", fractions such as "0.2/s" allowed) caps records per second per logger.
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "false").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+    LOG_RATE_LIMIT: str = os.getenv("LOG_RATE_LIMIT", "")
+
+    # Debug mode adds diagnostics such as per-request query counts to responses
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
+
+    # SQL profiling: log statements slower than this, flag statements repeated this often per request
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "100"))
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
 
 settings = Settings()
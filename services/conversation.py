@@ -0,0 +1,177 @@
+"""
+In-memory conversation windows for multi-turn agent context.
+
+Each user gets a ring buffer of their last N (message, response) turns. It is
+hydrated from ``chat_messages`` on first use and then appended to after every
+committed reply, so a chat turn reads no history from the database. Idle users
+are evicted least-recently-used first, bounded by a user count and a global
+byte budget.
+
+Windows are per worker process, and a turn committed by another worker (or
+while this one was still hydrating) never reaches the local window. Each
+window therefore remembers the user's ``chat_version`` it reflects: appends
+advance it by the one bump their commit made, and a window whose version no
+longer matches the user row is reloaded rather than served with a gap.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from services.config import settings
+from services.metrics import metrics
+
+metrics.describe(
+    "conversation_hydrations_total", "counter", "Conversation windows loaded from the database."
+)
+metrics.describe(
+    "conversation_evictions_total", "counter", "Conversation windows evicted to stay within limits."
+)
+metrics.describe("conversation_users", "gauge", "Conversation windows held in memory.")
+metrics.describe("conversation_bytes", "gauge", "Approximate memory held by conversation windows.")
+
+Turn = Tuple[str, str]
+
+# Rough per-turn overhead of the tuple and two str objects
+TURN_OVERHEAD_BYTES = 160
+
+
+def _turn_size(turn: Turn) -> int:
+    return len(turn[0]) + len(turn[1]) + TURN_OVERHEAD_BYTES
+
+
+class _Window:
+    __slots__ = ("turns", "size", "version")
+
+    def __init__(self, turns: Sequence[Turn], max_turns: int, version: int):
+        self.turns: Deque[Turn] = deque(turns, maxlen=max_turns)
+        self.size = sum(map(_turn_size, self.turns))
+        self.version = version
+
+
+class ConversationStore:
+    """Bounded per-user ring buffers of recent turns with LRU eviction."""
+
+    def __init__(
+        self, max_turns: int = 10, max_users: int = 10000, max_bytes: int = 64 * 1024 * 1024
+    ):
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._windows: OrderedDict[str, _Window] = OrderedDict()
+        self._bytes = 0
+
+    def get_turns(
+        self, user_id: str, version: int, load: Callable[[int], Sequence[Turn]]
+    ) -> List[Turn]:
+        """Return the user's recent turns, oldest first, hydrating with ``load(max_turns)`` when needed.
+
+        ``version`` is the user's current ``chat_version``, read before ``load``
+        can run; a window at any other version is missing turns and is reloaded.
+        """
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window is not None and window.version == version:
+                self._windows.move_to_end(user_id)
+                return list(window.turns)
+
+        turns = load(self.max_turns)
+        metrics.inc("conversation_hydrations_total")
+        with self._lock:
+            # Another request may have hydrated (and appended to) a newer window meanwhile; keep that one
+            window = self._windows.get(user_id)
+            if window is None or window.version < version:
+                if window is not None:
+                    self._bytes -= window.size
+                window = self._windows[user_id] = _Window(turns, self.max_turns, version)
+                self._bytes += window.size
+                self._windows.move_to_end(user_id)
+                self._evict()
+            return list(window.turns)
+
+    def append(self, user_id: str, message: str, response: str) -> None:
+        """Add a committed turn to a hydrated window; unknown users are hydrated on their next turn."""
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window is None:
+                return
+            if len(window.turns) == window.turns.maxlen:
+                window.size -= _turn_size(window.turns[0])
+                self._bytes -= _turn_size(window.turns[0])
+            turn = (message, response)
+            window.turns.append(turn)
+            window.size += _turn_size(turn)
+            window.version += 1
+            self._bytes += _turn_size(turn)
+            self._windows.move_to_end(user_id)
+            self._evict()
+
+    def forget(self, user_id: str) -> None:
+        with self._lock:
+            window = self._windows.pop(user_id, None)
+            if window is not None:
+                self._bytes -= window.size
+            self._update_gauges()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            self._bytes = 0
+            self._update_gauges()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _evict(self) -> None:
+        # The most recently used window is never evicted, even if it alone exceeds the budget
+        while len(self._windows) > 1 and (
+            len(self._windows) > self.max_users or self._bytes > self.max_bytes
+        ):
+            _, window = self._windows.popitem(last=False)
+            self._bytes -= window.size
+            metrics.inc("conversation_evictions_total")
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("conversation_users", len(self._windows))
+        metrics.set_gauge("conversation_bytes", self._bytes)
+
+
+# Global conversation store
+conversations = ConversationStore(
+    max_turns=settings.CONVERSATION_TURNS,
+    max_users=settings.CONVERSATION_MAX_USERS,
+    max_bytes=settings.CONVERSATION_MAX_BYTES,
+)
+
+
+def record_turn(session: Session, user_id: str, message: str, response: str) -> None:
+    """Append the turn to the user's window once the session's transaction commits."""
+    session.info.setdefault("conversation_turns", []).append((user_id, message, response))
+
+
+def forget_conversation(session: Session, user_id: str) -> None:
+    """Drop the user's window once the session commits (e.g. after deleting a message)."""
+    session.info.setdefault("conversation_forget", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_turns(session: Session) -> None:
+    for user_id in session.info.pop("conversation_forget", ()):
+        conversations.forget(user_id)
+    for user_id, message, response in session.info.pop("conversation_turns", ()):
+        conversations.append(user_id, message, response)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_turns(session: Session) -> None:
+    session.info.pop("conversation_turns", None)
+    session.info.pop("conversation_forget", None)
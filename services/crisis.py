@@ -0,0 +1,183 @@
+"""
+Detection of messages that indicate a user may be in crisis.
+
+Phrases from a lexicon file are compiled once into an Aho-Corasick automaton,
+so screening a message is a single pass over its characters regardless of
+how many phrases are listed. Messages and phrases go through the same
+normalization (case, accents, punctuation, digit look-alikes, stretched
+letters) and match on whole words.
+
+Crisis messages are answered on a dedicated safe-response path and are never
+delayed or rejected by admission control.
+"""
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from services.config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "crisis_detections_total", "counter", "Messages flagged by the crisis detector, by category."
+)
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "crisis_lexicon.txt")
+
+_LEET = str.maketrans(
+    {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+)
+_TOKEN = re.compile(r"[a-z0-9@$]+")
+_LOOKALIKE = re.compile(r"[0-9@$]")
+_HAS_LETTER = re.compile(r"[a-z]")
+_STRETCHED = re.compile(r"(.)\1{2,}")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _fix_token(match: "re.Match") -> str:
+    token = match.group()
+    # Only mixed tokens like "su1c1de" are look-alikes; "take 3 pills" keeps its digit
+    return token.translate(_LEET) if _HAS_LETTER.search(token) else token
+
+
+def normalize_text(text: str) -> str:
+    """Normalize for matching and pad with spaces so phrases match on word boundaries."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch)).replace("’", "")
+    text = text.lower().replace("'", "")  # "don't" -> "dont"
+    if _LOOKALIKE.search(text):
+        text = _TOKEN.sub(_fix_token, text)
+    text = _STRETCHED.sub(r"\1", text)  # "diiiie" -> "die"
+    return " " + _NON_WORD.sub(" ", text).strip() + " "
+
+
+class CrisisMatch(NamedTuple):
+    category: str
+    phrase: str
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over a goto/fail automaton."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[tuple] = [()]
+
+        for pattern, value in patterns:
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] += (value,)
+
+        # Breadth-first: each node's fail link points to its longest proper suffix in the trie
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[tuple]:
+        """Yield the tuple of values of every pattern ending at each position."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                yield out[state]
+
+
+def load_lexicon(path: str) -> List[CrisisMatch]:
+    """Read ``[category]`` sections of phrases, one per line."""
+    entries = []
+    category = "crisis"
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                category = line[1:-1].strip()
+                continue
+            entries.append(CrisisMatch(category, line))
+    return entries
+
+
+class CrisisDetector:
+    """Screens messages against a phrase lexicon in one pass."""
+
+    def __init__(self, entries: Iterable[CrisisMatch]):
+        entries = list(entries)
+        self.phrase_count = len(entries)
+        self._automaton = AhoCorasick((normalize_text(entry.phrase), entry) for entry in entries)
+
+    @classmethod
+    def from_file(cls, path: str) -> "CrisisDetector":
+        return cls(load_lexicon(path))
+
+    def scan(self, text: str) -> List[CrisisMatch]:
+        """All lexicon phrases found in the message, in order of where they end."""
+        found = []
+        for values in self._automaton.iter_matches(normalize_text(text)):
+            found.extend(value for value in values if value not in found)
+        return found
+
+    def first_match(self, text: str) -> Optional[CrisisMatch]:
+        for values in self._automaton.iter_matches(normalize_text(text)):
+            return values[0]
+        return None
+
+
+_detector: Optional[CrisisDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> CrisisDetector:
+    """The process-wide detector, compiled from CRISIS_LEXICON_PATH on first use."""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                path = settings.CRISIS_LEXICON_PATH or DEFAULT_LEXICON_PATH
+                _detector = CrisisDetector.from_file(path)
+                logger.info(
+                    f"Crisis detector compiled: {_detector.phrase_count} phrases from {path}"
+                )
+    return _detector
+
+
+def screen_message(text: str) -> Optional[CrisisMatch]:
+    """Return the first crisis phrase in the message, recording it in metrics."""
+    match = get_detector().first_match(text)
+    if match is not None:
+        metrics.inc("crisis_detections_total", (("category", match.category),))
+    return match
+
+
+def is_crisis_message(text: str) -> bool:
+    """Return True if the message contains any crisis phrase as whole words."""
+    return get_detector().first_match(text) is not None
@@ -1,117 +1,190 @@
 """
 Database configuration and session management.
 """
+
 import os
-from typing import Generator, Optional
-from sqlalchemy import create_engine
+import threading
+from typing import Dict, Generator, Optional, Tuple
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 import logging
 
 from models.database import Base
+from services.config import settings
+from services.metrics import stage
+from services.query_profiler import attach_query_profiler
+from services.sharding import HashRing, ShardRouter, parse_shard_urls
+
+# Imported to register the outbox and /api/sync change log flush hooks
+from services import outbox, sync  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseConfig:
     """Database configuration based on environment."""
-    
+
     def __init__(self):
         self.database_url = self._get_database_url()
         self.async_database_url = self._get_async_database_url()
         self.engine = None
+        self.engines: Dict[str, object] = {}
+        self.router = None
         self.async_engine = None
         self.SessionLocal = None
         self.AsyncSessionLocal = None
-        
+
     def _get_database_url(self) -> str:
         """Get database URL based on environment."""
         # Check for explicit database URL
         if os.getenv("DATABASE_URL"):
             return os.getenv("DATABASE_URL")
-        
+
         # Development: use SQLite
         if os.getenv("ENVIRONMENT", "development") == "development":
             db_path = os.path.join(os.getcwd(), "mental_wellness.db")
             return f"sqlite:///{db_path}"
-        
+
         # Production: use PostgreSQL
         db_host = os.getenv("DB_HOST", "localhost")
         db_port = os.getenv("DB_PORT", "5432")
         db_name = os.getenv("DB_NAME", "mental_wellness")
         db_user = os.getenv("DB_USER", "postgres")
         db_password = os.getenv("DB_PASSWORD", "")
-        
+
         return f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    
+
     def _get_async_database_url(self) -> str:
         """Get async database URL."""
         url = self._get_database_url()
-        
+
         if url.startswith("sqlite://"):
             return url.replace("sqlite://", "sqlite+aiosqlite://")
         elif url.startswith("postgresql://"):
             return url.replace("postgresql://", "postgresql+asyncpg://")
-        
+
         return url
-    
+
+    def _create_engine(self, url: str):
+        """Synchronous engine (for migrations and simple operations) with query profiling."""
+        echo = os.getenv("SQL_DEBUG", "false").lower() == "true"
+        if url.startswith("sqlite"):
+            engine = create_engine(url, connect_args={"check_same_thread": False}, echo=echo)
+        else:
+            engine = create_engine(url, echo=echo)
+        attach_query_profiler(engine)
+        return engine
+
     def initialize(self):
         """Initialize database engines and sessions."""
-        # Synchronous engine (for migrations and simple operations)
-        if self.database_url.startswith("sqlite"):
-            self.engine = create_engine(
-                self.database_url,
-                connect_args={"check_same_thread": False},
-                echo=os.getenv("SQL_DEBUG", "false").lower() == "true"
+        shard_urls = parse_shard_urls(settings.DATABASE_SHARDS)
+        if shard_urls:
+            self.engines = {name: self._create_engine(url) for name, url in shard_urls.items()}
+            # Single-engine callers (DDL helpers, diagnostics) see the first shard
+            self.engine = next(iter(self.engines.values()))
+            self.router = ShardRouter(HashRing(self.engines, settings.SHARD_VNODES))
+            self.SessionLocal = sessionmaker(
+                autocommit=False, autoflush=False, **self.router.session_kwargs(self.engines)
             )
-        else:
-            self.engine = create_engine(
-                self.database_url,
-                echo=os.getenv("SQL_DEBUG", "false").lower() == "true"
+            logger.info(
+                f"Database initialized with {len(self.engines)} shards: {', '.join(self.engines)}"
             )
-        
+            return
+
+        self.engine = self._create_engine(self.database_url)
+        self.engines = {"default": self.engine}
+        self.router = None
+
         # Session factory
-        self.SessionLocal = sessionmaker(
-            autocommit=False,
-            autoflush=False,
-            bind=self.engine
-        )
-        
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
         logger.info(f"Database initialized with URL: {self.database_url}")
-    
+
+    def shard_for(self, user_id: str) -> str:
+        """Name of the database holding ``user_id``'s rows ("default" when unsharded)."""
+        return self.router.shard_for(user_id) if self.router is not None else "default"
+
     def create_tables(self):
-        """Create all tables."""
-        Base.metadata.create_all(bind=self.engine)
+        """Create all tables and add columns/indexes missing from existing ones."""
+        from services.migrations import upgrade_schema
+
+        for engine in self.engines.values():
+            Base.metadata.create_all(bind=engine)
+            upgrade_schema(engine)
         logger.info("Database tables created")
-    
+
+    def warm_pool(self, connections: int) -> int:
+        """Open up to ``connections`` pooled connections per engine so first requests skip connect."""
+        warmed = 0
+        for engine in self.engines.values():
+            pool_size = getattr(engine.pool, "size", lambda: connections)()
+            opened = []
+            try:
+                for _ in range(min(connections, pool_size)):
+                    conn = engine.connect()
+                    conn.execute(text("SELECT 1"))
+                    opened.append(conn)
+            finally:
+                for conn in opened:
+                    conn.close()  # Returns the connection to the pool
+            warmed += len(opened)
+        return warmed
+
     def drop_tables(self):
         """Drop all tables (use with caution!)."""
-        Base.metadata.drop_all(bind=self.engine)
+        for engine in self.engines.values():
+            Base.metadata.drop_all(bind=engine)
         logger.info("Database tables dropped")
 
 
 # Global database configuration
 db_config = DatabaseConfig()
 
+_init_lock = threading.RLock()
+_initialized = False
+
+
+def _reset_pools_after_fork():
+    """Give a forked worker fresh pools instead of the parent's open connections."""
+    for engine in db_config.engines.values():
+        # close=False leaves the parent's connections untouched; the child just forgets them
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
 
 def get_database_url() -> str:
     """Get the current database URL."""
     return db_config.database_url
 
 
-def init_db():
+def init_db(create_tables: bool = True):
     """Initialize the database."""
-    db_config.initialize()
-    db_config.create_tables()
+    global _initialized
+    with _init_lock:
+        db_config.initialize()
+        if create_tables:
+            db_config.create_tables()
+        _initialized = True
+
+
+def ensure_db():
+    """Initialize the database once, even when first requests arrive concurrently."""
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                init_db(create_tables=settings.DB_CREATE_TABLES)
 
 
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """Get a database session with automatic cleanup."""
-    if not db_config.SessionLocal:
-        init_db()
-    
+    ensure_db()
+
     session = db_config.SessionLocal()
     try:
         yield session
@@ -124,15 +197,32 @@ def get_db_session() -> Generator[Session, None, None]:
         session.close()
 
 
+def iter_shard_sessions() -> Generator[Tuple[str, Session], None, None]:
+    """Yield (shard name, plain session) for every database, committing each after use.
+
+    Maintenance jobs scan whole tables; running them shard by shard keeps their
+    batching and keyset cursors on one database. Unsharded setups yield one session.
+    """
+    ensure_db()
+
+    for name, engine in db_config.engines.items():
+        session = Session(bind=engine, autoflush=False)
+        try:
+            yield name, session
+            session.commit()
+        finally:
+            session.close()
+
+
 def get_db() -> Generator[Session, None, None]:
     """FastAPI dependency for getting database sessions."""
-    if not db_config.SessionLocal:
-        init_db()
-    
+    ensure_db()
+
     session = db_config.SessionLocal()
     try:
         yield session
-        session.commit()  # Ensure changes are committed
+        with stage("db_commit"):
+            session.commit()  # Ensure changes are committed
     except Exception as e:
         session.rollback()
         raise
@@ -142,14 +232,14 @@ def get_db() -> Generator[Session, None, None]:
 
 class DatabaseManager:
     """High-level database management utilities."""
-    
+
     @staticmethod
     def reset_database():
         """Reset the database (drop and recreate all tables)."""
         logger.warning("Resetting database - all data will be lost!")
         db_config.drop_tables()
         db_config.create_tables()
-    
+
     @staticmethod
     def get_connection_info() -> dict:
         """Get database connection information."""
@@ -157,14 +247,15 @@ class DatabaseManager:
             "database_url": db_config.database_url,
             "engine_info": str(db_config.engine.url) if db_config.engine else None,
             "is_sqlite": db_config.database_url.startswith("sqlite"),
-            "is_postgresql": db_config.database_url.startswith("postgresql")
+            "is_postgresql": db_config.database_url.startswith("postgresql"),
         }
-    
+
     @staticmethod
     def health_check() -> bool:
         """Check if database is accessible."""
         try:
             from sqlalchemy import text
+
             with get_db_session() as session:
                 session.execute(text("SELECT 1"))
                 return True
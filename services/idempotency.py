@@ -0,0 +1,283 @@
+"""
+Idempotency keys for retried POSTs (/api/mood, /api/chat).
+
+A client that times out and retries with the same ``Idempotency-Key`` header
+gets the first response back instead of a second agent call and a duplicate
+row. The first request claims the key with a short-lived pending marker, runs,
+commits and then stores its response body for IDEMPOTENCY_TTL_SECONDS.
+Duplicates arriving while it runs wait for that body; a request that fails
+releases the key so a retry executes again. Records are compact byte strings:
+a state byte, a 16-byte fingerprint of the request body and the response JSON.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from services.config import settings
+from services.metrics import metrics
+from services.serialization import JSON_MEDIA_TYPE, dumps
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "idempotency_requests_total",
+    "counter",
+    "Requests with an Idempotency-Key by route and result (executed/replayed/mismatch/in_progress).",
+)
+
+PENDING = b"P"
+DONE = b"D"
+FINGERPRINT_BYTES = 16
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# How often a duplicate re-checks a key held by another worker
+POLL_SECONDS = 0.05
+
+
+class IdempotencyStore(ABC):
+    """Byte-value store with TTLs and an atomic create-if-absent."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store ``value`` only if ``key`` is absent; return whether it was stored."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Per-process store; the least recently written keys are evicted beyond ``max_keys``."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key, time.monotonic())
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, value, now + ttl)
+            return True
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _live(self, key: str, now: float) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _store(self, key: str, value: bytes, expires_at: float) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Store shared by all workers; claims use SET NX."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+def fingerprint(body: BaseModel) -> bytes:
+    """Digest of the request body; reusing a key for a different body is rejected.
+
+    Only fields the client sent count: defaults such as a mood's server-side
+    timestamp differ between a request and its retry.
+    """
+    sent = body.model_dump(mode="json", exclude_unset=True)
+    return hashlib.blake2b(dumps(sent), digest_size=FINGERPRINT_BYTES).digest()
+
+
+class IdempotencyGuard:
+    """Runs a handler at most once per key and replays its stored response to duplicates."""
+
+    def __init__(
+        self,
+        store: IdempotencyStore,
+        ttl: float,
+        lock_ttl: float,
+        wait: float,
+        prefix: str = "mw:idem",
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._running: Dict[str, threading.Event] = {}
+
+    def run(
+        self,
+        route: str,
+        key: Optional[str],
+        body: BaseModel,
+        db: Session,
+        handler: Callable[[], BaseModel],
+    ) -> Any:
+        """Return ``handler()``'s response for ``key``, executing it only for the first request.
+
+        Without a key the handler simply runs. With one, the session is
+        committed before the response is stored, so a replayed response always
+        describes rows that exist. Errors are not stored: the key is released
+        and a retry runs the handler again.
+        """
+        if key is None:
+            return handler()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters."
+            )
+
+        store_key = f"{self.prefix}:{route}:{key}"
+        digest = fingerprint(body)
+        try:
+            stored = self._claim_or_wait(route, store_key, digest)
+        except HTTPException:
+            raise
+        except Exception as e:
+            # Fail open: a store outage must not take the endpoint down with it
+            logger.warning(f"Idempotency store unavailable ({route}): {e}")
+            return handler()
+        if stored is not None:
+            metrics.inc("idempotency_requests_total", (("route", route), ("result", "replayed")))
+            return Response(
+                content=stored, media_type=JSON_MEDIA_TYPE, headers={REPLAYED_HEADER: "true"}
+            )
+
+        done = threading.Event()
+        with self._lock:
+            self._running[store_key] = done
+        try:
+            result = handler()
+            db.commit()
+            content = dumps(result.model_dump(mode="json"))
+        except BaseException:
+            self._release(store_key, lambda: self.store.delete(store_key))
+            raise
+        else:
+            self._release(
+                store_key, lambda: self.store.set(store_key, DONE + digest + content, self.ttl)
+            )
+        finally:
+            with self._lock:
+                self._running.pop(store_key, None)
+            done.set()
+        metrics.inc("idempotency_requests_total", (("route", route), ("result", "executed")))
+        return Response(content=content, media_type=JSON_MEDIA_TYPE)
+
+    def _claim_or_wait(self, route: str, store_key: str, digest: bytes) -> Optional[bytes]:
+        """Claim the key (None) or return the stored body of the request that owns it."""
+        deadline = time.monotonic() + self.wait
+        while True:
+            record = self.store.get(store_key)
+            if record is None:
+                if self.store.add(store_key, PENDING + digest, self.lock_ttl):
+                    return None
+                continue
+            if record[1 : 1 + FINGERPRINT_BYTES] != digest:
+                metrics.inc(
+                    "idempotency_requests_total", (("route", route), ("result", "mismatch"))
+                )
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request body.",
+                )
+            if record[:1] == DONE:
+                return record[1 + FINGERPRINT_BYTES :]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.inc(
+                    "idempotency_requests_total", (("route", route), ("result", "in_progress"))
+                )
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress.",
+                    headers={"Retry-After": "1"},
+                )
+            # Same-process duplicates wake as soon as the first request finishes; others poll
+            with self._lock:
+                running = self._running.get(store_key)
+            if running is not None:
+                running.wait(min(remaining, self.lock_ttl))
+            else:
+                time.sleep(min(remaining, POLL_SECONDS))
+
+    @staticmethod
+    def _release(store_key: str, write: Callable[[], None]) -> None:
+        try:
+            write()
+        except Exception as e:
+            logger.warning(f"Idempotency store write failed for {store_key}: {e}")
+
+
+def create_store(name: str) -> IdempotencyStore:
+    name = name.lower()
+    if name == "memory":
+        return MemoryIdempotencyStore(max_keys=settings.IDEMPOTENCY_MAX_KEYS)
+    if name == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("IDEMPOTENCY_BACKEND=redis requires the 'redis' package") from e
+        return RedisIdempotencyStore(redis.Redis.from_url(settings.REDIS_URL))
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {name}")
+
+
+# Global guard for POST /api/mood and /api/chat
+idempotency = IdempotencyGuard(
+    create_store(settings.IDEMPOTENCY_BACKEND),
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_ttl=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait=settings.IDEMPOTENCY_WAIT_MS / 1000,
+)
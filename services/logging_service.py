@@ -1,12 +1,187 @@
+import atexit
+import json
 import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO, Tuple
 
+from services.config import settings
+from services.metrics import metrics
+
+metrics.describe(
+    "log_records_dropped_total",
+    "counter",
+    "Log records discarded before output, by reason (sampled/rate_limited/queue_full).",
+)
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_installed_handler: Optional[logging.Handler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def _matching_prefix(rules: Dict[str, float], name: str) -> Optional[str]:
+    """Return the most specific configured logger prefix for ``name``."""
+    while name not in rules:
+        if "." not in name:
+            return "" if "" in rules else None
+        name = name.rsplit(".", 1)[0]
+    return name
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records below WARNING for configured loggers."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = _matching_prefix(self.rates, record.name)
+        if prefix is None or random.random() < self.rates[prefix]:
+            return True
+        metrics.inc("log_records_dropped_total", (("reason", "sampled"),))
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per configured logger prefix; notes how many records were dropped.
+
+    Buckets hold at least one token, so rates below 1/s ("0.2/s") let one record through every 1/rate seconds.
+    """
+
+    def __init__(self, limits: Dict[str, float]):
+        super().__init__()
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float, int]] = (
+            {}
+        )  # prefix -> (tokens, updated, suppressed)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        prefix = _matching_prefix(self.limits, record.name)
+        if prefix is None:
+            return True
+
+        per_second = self.limits[prefix]
+        capacity = max(per_second, 1.0)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(prefix, (capacity, now, 0))
+            tokens = min(capacity, tokens + (now - updated) * per_second)
+            if tokens < 1:
+                self._buckets[prefix] = (tokens, now, suppressed + 1)
+                metrics.inc("log_records_dropped_total", (("reason", "rate_limited"),))
+                return False
+            self._buckets[prefix] = (tokens - 1, now, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+            metrics.inc("log_records_dropped_total", (("reason", "queue_full"),))
+
+
+def parse_rules(spec: str, rate_suffix: bool = False) -> Dict[str, float]:
+    """Parse ``"logger=value,other.logger=value"``; ``root`` or ``*`` targets every logger."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if rate_suffix:
+            value = value.removesuffix("/s")
+        name = name.strip()
+        rules["" if name in ("root", "*") else name] = float(value)
+    return rules
+
+
+def shutdown_logging() -> None:
+    """Stop the background log writer, flushing records still queued."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> None:
+    """Install the root handler for LOG_FORMAT/LOG_ASYNC, with sampling and rate limits in every mode."""
+    global _installed_handler, _listener
+
+    level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
+    use_json = settings.LOG_FORMAT.lower() == "json"
+
+    shutdown_logging()
+    root = logging.getLogger()
+    if _installed_handler is not None:
+        root.removeHandler(_installed_handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if use_json else logging.Formatter(TEXT_FORMAT))
+
+    if settings.LOG_ASYNC:
+        # The event loop only enqueues; encoding and I/O happen on the listener thread
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        handler: logging.Handler = DroppingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+
+    sampling = parse_rules(settings.LOG_SAMPLING)
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+    rate_limits = parse_rules(settings.LOG_RATE_LIMIT, rate_suffix=True)
+    if rate_limits:
+        handler.addFilter(RateLimitFilter(rate_limits))
+
+    root.addHandler(handler)
+    root.setLevel(level)
+    _installed_handler = handler
 
-def configure_logging() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    )
     # Quiet uvicorn logs a bit; adjust as needed
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("uvicorn.error").setLevel(logging.WARNING)
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+
+atexit.register(shutdown_logging)
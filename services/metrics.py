@@ -0,0 +1,237 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Recording is a bucket increment under an uncontended lock; formatting only
+happens when /metrics is scraped, so the cost is negligible when nobody reads
+them. Stage timers attribute time inside a request (mood query, agent call,
+commit, ...) to the route that is being served.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Stage timings of the request being served; None outside of a request
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "request_stages", default=None
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters, gauges and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        """Register HELP/TYPE metadata for a metric family."""
+        self._help[name] = (metric_type, help_text)
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[labels] = value
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(value)
+
+    def get_counter(self, name: str, labels: Labels = ()) -> float:
+        return self._counters.get(name, {}).get(labels, 0.0)
+
+    def get_gauge(self, name: str, labels: Labels = ()) -> Optional[float]:
+        return self._gauges.get(name, {}).get(labels)
+
+    def get_histogram(self, name: str, labels: Labels = ()) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Format all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for kind, families in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(families.items()):
+                    self._render_header(lines, name, kind)
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                self._render_header(lines, name, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    bucket_labels = labels + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {histogram.count}")
+                    lines.append(
+                        f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}"
+                    )
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _render_header(self, lines: List[str], name: str, default_type: str) -> None:
+        metric_type, help_text = self._help.get(name, (default_type, name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return (
+        repr(float(value))
+        if isinstance(value, float) and not value.is_integer()
+        else str(int(value))
+    )
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+metrics.describe(
+    "http_requests_total", "counter", "HTTP requests by method, route and status code."
+)
+metrics.describe(
+    "http_request_errors_total", "counter", "HTTP requests that failed with a 5xx or an exception."
+)
+metrics.describe("http_request_duration_seconds", "histogram", "End-to-end HTTP request latency.")
+metrics.describe(
+    "http_request_stage_duration_seconds", "histogram", "Latency of named stages within a request."
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a named stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+        else:
+            metrics.observe(
+                "http_request_stage_duration_seconds", elapsed, (("route", "none"), ("stage", name))
+            )
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, errors and latency per route and stage."""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: List[Tuple[str, float]] = []
+        token = _request_stages.set(stages)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stages.reset(token)
+            self._record(scope, status_code, elapsed, stages)
+
+    def _record(
+        self, scope, status_code: int, elapsed: float, stages: List[Tuple[str, float]]
+    ) -> None:
+        # Label by route template, never the raw path, to keep cardinality bounded
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+        labels = (("method", method), ("route", route_path))
+
+        self.registry.inc("http_requests_total", labels + (("status", str(status_code)),))
+        if status_code >= 500:
+            self.registry.inc("http_request_errors_total", labels)
+        self.registry.observe("http_request_duration_seconds", elapsed, labels)
+        for name, duration in stages:
+            self.registry.observe(
+                "http_request_stage_duration_seconds",
+                duration,
+                (("route", route_path), ("stage", name)),
+            )
@@ -0,0 +1,225 @@
+"""
+Lightweight schema and data migrations.
+
+``Base.metadata.create_all`` only creates missing tables, so columns and indexes
+added to existing models are applied here in place.
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.database import Base, ChatMessage, JournalEntry, MoodContextSnapshot, MoodEntry
+from services.cache import mark_user_changed
+from services.repositories import MoodContextSnapshotRepository, UserRepository
+from services.sentiment import score_batch
+
+logger = logging.getLogger(__name__)
+
+# Approximate on-disk cost of the integer reference that replaces each JSON blob
+REFERENCE_BYTES = 4
+
+
+def _add_column_ddl(table_name: str, column, engine: Engine) -> str:
+    """Render an ALTER TABLE ... ADD COLUMN statement for a model column."""
+    preparer = engine.dialect.identifier_preparer
+    ddl = (
+        f"ALTER TABLE {preparer.quote(table_name)} "
+        f"ADD COLUMN {preparer.quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+    )
+
+    if column.server_default is not None:
+        default = column.server_default.arg
+        default_sql = str(default.text) if hasattr(default, "text") else f"'{default}'"
+        ddl += f" DEFAULT {default_sql}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        ddl += f" REFERENCES {preparer.quote(target.table.name)} ({preparer.quote(target.name)})"
+
+    return ddl
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """Add model columns and indexes that are missing from existing tables."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    applied = []
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                conn.execute(text(_add_column_ddl(table.name, column, engine)))
+                applied.append(f"add column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                applied.append(f"create index {index.name}")
+
+    for change in applied:
+        logger.info(f"Schema upgrade: {change}")
+    return applied
+
+
+def migrate_chat_mood_contexts(session: Session, batch_size: int = 500) -> Dict[str, Any]:
+    """Move legacy per-message JSON mood contexts into deduplicated snapshots.
+
+    Commits after every batch so large tables can be migrated incrementally;
+    re-running only touches rows that still carry legacy JSON.
+    """
+    snapshot_repo = MoodContextSnapshotRepository(session)
+    snapshots_before = session.query(MoodContextSnapshot.id).count()
+    report = {
+        "rows_migrated": 0,
+        "rows_skipped": 0,
+        "legacy_bytes": 0,
+        "snapshot_bytes": 0,
+        "reference_bytes": 0,
+        "bytes_saved": 0,
+    }
+    referenced_snapshot_ids = set()
+    last_id = 0
+
+    while True:
+        rows = (
+            session.query(ChatMessage)
+            .filter(
+                ChatMessage.id > last_id,
+                ChatMessage.mood_context.isnot(None),
+                ChatMessage.mood_context_snapshot_id.is_(None),
+            )
+            .order_by(ChatMessage.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            try:
+                context = json.loads(row.mood_context)
+            except ValueError:
+                logger.warning(f"Skipping chat message {row.id}: mood context is not valid JSON")
+                report["rows_skipped"] += 1
+                continue
+            if not isinstance(context, dict):
+                report["rows_skipped"] += 1
+                continue
+
+            snapshot = snapshot_repo.get_or_create_snapshot(context)
+            referenced_snapshot_ids.add(snapshot.id)
+            report["legacy_bytes"] += len(row.mood_context.encode("utf-8"))
+            row.mood_context_snapshot_id = snapshot.id
+            row.mood_context = None
+            report["rows_migrated"] += 1
+
+        session.commit()
+
+    if referenced_snapshot_ids:
+        report["snapshot_bytes"] = (
+            session.query(func.sum(MoodContextSnapshot.size_bytes))
+            .filter(MoodContextSnapshot.id.in_(referenced_snapshot_ids))
+            .scalar()
+            or 0
+        )
+    report["snapshots_created"] = session.query(MoodContextSnapshot.id).count() - snapshots_before
+    report["reference_bytes"] = report["rows_migrated"] * REFERENCE_BYTES
+    report["bytes_saved"] = (
+        report["legacy_bytes"] - report["snapshot_bytes"] - report["reference_bytes"]
+    )
+    return report
+
+
+# Tables with free text scored by services.sentiment, the column scored, and the user write counter it feeds
+SENTIMENT_SOURCES = (
+    (MoodEntry, MoodEntry.notes, "mood"),
+    (JournalEntry, JournalEntry.content, None),
+    (ChatMessage, ChatMessage.message, "chat"),
+)
+
+
+def backfill_sentiment(
+    session: Session, batch_size: int = 2000, workers: Optional[int] = None
+) -> Dict[str, int]:
+    """Score existing rows that have text but no ``sentiment_score``.
+
+    Each batch is split across a process pool (``workers`` processes; 0 or 1
+    scores in-process), written back with one bulk update and committed, so
+    the backfill can be interrupted and resumed. The bulk update bypasses the
+    repositories, so the touched users' write counters are bumped (or, for
+    journals, their cached data invalidated) in the same transaction. Returns
+    rows scored per table.
+    """
+    pool_size = workers if workers is not None else (os.cpu_count() or 1)
+    executor: Optional[Executor] = (
+        ProcessPoolExecutor(max_workers=pool_size) if pool_size > 1 else None
+    )
+    report = {}
+    try:
+        for model, text_column, kind in SENTIMENT_SOURCES:
+            scored = 0
+            last_id = 0
+            while True:
+                rows = (
+                    session.query(model.id, model.user_id, text_column)
+                    .filter(
+                        model.id > last_id, text_column.isnot(None), model.sentiment_score.is_(None)
+                    )
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                texts = [row[2] for row in rows]
+                if executor is not None:
+                    chunk = max(1, len(texts) // (pool_size * 4))
+                    chunks = [texts[i : i + chunk] for i in range(0, len(texts), chunk)]
+                    scores = [score for part in executor.map(score_batch, chunks) for score in part]
+                else:
+                    scores = score_batch(texts)
+
+                scored_rows = [
+                    (row, score) for row, score in zip(rows, scores) if score is not None
+                ]
+                session.bulk_update_mappings(
+                    model,
+                    [
+                        {"id": row[0], "sentiment_score": score.score, "emotion": score.emotion}
+                        for row, score in scored_rows
+                    ],
+                )
+                user_repo = UserRepository(session)
+                for user_id in sorted({row[1] for row, _ in scored_rows}):
+                    if kind is not None:
+                        user_repo.record_data_change(user_id, kind)
+                    else:
+                        mark_user_changed(session, user_id)
+                session.commit()
+                scored += len(scored_rows)
+            report[model.__tablename__] = scored
+            logger.info(f"Sentiment backfill: {scored} rows scored in {model.__tablename__}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report
@@ -1,37 +1,109 @@
-from typing import Optional, List, Dict, Any
+import math
+from array import array
+from bisect import bisect_left
+from typing import Optional, List, Dict, Any, Sequence, Union
 from datetime import datetime, timedelta
 from models.schemas import MoodEntry
+from services.mood_trends import DEFAULT_WINDOWS, TrendState
+
+
+class MoodSeries:
+    """Compact time-ordered mood levels plus the notes of the latest entry.
+
+    Parallel arrays avoid building one object per row on the chat path.
+    ``sentiments`` holds the stored notes sentiment per entry (NaN when unscored).
+    """
+
+    __slots__ = ("timestamps", "levels", "latest_notes", "sentiments", "latest_emotion")
+
+    def __init__(
+        self,
+        timestamps: Optional[List[datetime]] = None,
+        levels: Optional[Sequence[int]] = None,
+        latest_notes: Optional[str] = None,
+        sentiments: Optional[Sequence[Optional[float]]] = None,
+        latest_emotion: Optional[str] = None,
+    ):
+        self.timestamps = timestamps if timestamps is not None else []
+        self.levels = array("b", levels or ())
+        self.latest_notes = latest_notes
+        if sentiments is None:
+            sentiments = [None] * len(self.levels)
+        self.sentiments = array("f", (math.nan if value is None else value for value in sentiments))
+        self.latest_emotion = latest_emotion
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    @classmethod
+    def from_entries(cls, entries: List[MoodEntry]) -> "MoodSeries":
+        """Build a series from mood schema objects, keeping their order."""
+        return cls(
+            timestamps=[entry.timestamp for entry in entries],
+            levels=[entry.mood_level for entry in entries],
+            latest_notes=entries[-1].notes if entries else None,
+            sentiments=[getattr(entry, "sentiment_score", None) for entry in entries],
+            latest_emotion=getattr(entries[-1], "emotion", None) if entries else None,
+        )
+
+    def since(self, cutoff: datetime) -> "MoodSeries":
+        """Return the suffix of the series at or after ``cutoff``."""
+        start = bisect_left(self.timestamps, cutoff)
+        if start == 0:
+            return self
+        latest_notes = self.latest_notes if start < len(self) else None
+        latest_emotion = self.latest_emotion if start < len(self) else None
+        return MoodSeries(
+            self.timestamps[start:],
+            self.levels[start:],
+            latest_notes,
+            [None if math.isnan(value) else value for value in self.sentiments[start:]],
+            latest_emotion,
+        )
+
+    def notes_sentiment(self) -> Optional[float]:
+        """Mean stored sentiment of the scored notes in the series."""
+        scored = [value for value in self.sentiments if not math.isnan(value)]
+        return sum(scored) / len(scored) if scored else None
 
 
 class MoodContextService:
     """Service for analyzing mood patterns and providing context for AI responses."""
 
     @staticmethod
-    def get_mood_context(user_moods: List[MoodEntry], days_back: int = 7) -> Dict[str, Any]:
-        """Analyze recent mood entries and return context for AI responses."""
+    def get_mood_context(
+        user_moods: Union[List[MoodEntry], MoodSeries], days_back: int = 7
+    ) -> Dict[str, Any]:
+        """Analyze recent mood entries and return context for AI responses.
+
+        Accepts either mood schema objects or a time-ordered ``MoodSeries``.
+        """
         if not user_moods:
             return {"status": "no_data", "message": "No mood history available"}
 
-        # Filter to recent moods (last N days)
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-        recent_moods = [
-            mood for mood in user_moods 
-            if mood.timestamp >= cutoff_date
-        ]
+        # One pass over the whole series yields every window; the recent one drives the context
+        if not isinstance(user_moods, MoodSeries):
+            user_moods = MoodSeries.from_entries(
+                sorted(user_moods, key=lambda mood: mood.timestamp)
+            )
+        now = datetime.utcnow()
+        recent_moods = user_moods.since(now - timedelta(days=days_back))
 
         if not recent_moods:
             return {"status": "no_recent_data", "message": "No recent mood data available"}
 
-        # Calculate mood statistics
-        mood_levels = [mood.mood_level for mood in recent_moods]
-        avg_mood = sum(mood_levels) / len(mood_levels)
-        latest_mood = recent_moods[-1].mood_level
-        trend = MoodContextService._calculate_trend(recent_moods)
+        trends = TrendState.from_series(
+            user_moods.timestamps, user_moods.levels, sorted({days_back, *DEFAULT_WINDOWS})
+        )
+        recent_stats = trends.window(days_back, now)
+        avg_mood = recent_stats["average"]
+        latest_mood = recent_moods.levels[-1]
+        trend = recent_stats["trend"]
 
         # Determine mood category
         mood_category = MoodContextService._categorize_mood(avg_mood, latest_mood)
 
-        return {
+        context = {
             "status": "available",
             "average_mood": round(avg_mood, 1),
             "latest_mood": latest_mood,
@@ -39,28 +111,18 @@ class MoodContextService:
             "category": mood_category,
             "entry_count": len(recent_moods),
             "days_analyzed": days_back,
-            "latest_notes": recent_moods[-1].notes if recent_moods[-1].notes else None
+            "latest_notes": recent_moods.latest_notes if recent_moods.latest_notes else None,
+            "trends": trends.summary(now),
+            "ewma": round(trends.ewma, 2),
         }
 
-    @staticmethod
-    def _calculate_trend(moods: List[MoodEntry]) -> str:
-        """Calculate mood trend (improving, declining, stable)."""
-        if len(moods) < 2:
-            return "insufficient_data"
-
-        # Compare first half vs second half of mood entries
-        mid_point = len(moods) // 2
-        first_half_avg = sum(mood.mood_level for mood in moods[:mid_point]) / mid_point
-        second_half_avg = sum(mood.mood_level for mood in moods[mid_point:]) / (len(moods) - mid_point)
-
-        diff = second_half_avg - first_half_avg
-
-        if diff > 0.5:
-            return "improving"
-        elif diff < -0.5:
-            return "declining"
-        else:
-            return "stable"
+        # Scores were stored when the notes were written; nothing is re-scored here
+        notes_sentiment = recent_moods.notes_sentiment()
+        if notes_sentiment is not None:
+            context["notes_sentiment"] = round(notes_sentiment, 2)
+        if recent_moods.latest_emotion:
+            context["latest_emotion"] = recent_moods.latest_emotion
+        return context
 
     @staticmethod
     def _categorize_mood(avg_mood: float, latest_mood: int) -> str:
@@ -96,13 +158,21 @@ class MoodContextService:
         mood_context += f"- Recent average: {context['average_mood']}/10\n"
         mood_context += f"- Trend: {trend}\n"
         mood_context += f"- Overall state: {category}\n"
-        
+
+        for window in ("30d", "90d"):
+            stats = context.get("trends", {}).get(window)
+            if stats and stats["count"] > context["entry_count"]:
+                mood_context += f"- {window} average: {stats['average']}/10 ({stats['trend']})\n"
         if latest_notes:
             mood_context += f"- Latest notes: '{latest_notes}'\n"
+        if context.get("notes_sentiment") is not None:
+            mood_context += f"- Sentiment of recent notes: {context['notes_sentiment']} (-1 to 1)\n"
+        if context.get("latest_emotion"):
+            mood_context += f"- Emotion in latest notes: {context['latest_emotion']}\n"
 
         # Add guidance for response tone
         response_guidance = MoodContextService._get_response_guidance(category, trend)
-        
+
         return f"{mood_context}\n{response_guidance}\n\nUser message: {user_message}"
 
     @staticmethod
@@ -113,7 +183,7 @@ class MoodContextService:
             "positive": "User is in a good mood. Be supportive and positive. Share tips for maintaining well-being.",
             "neutral": "User has a neutral mood. Be gently encouraging and offer practical wellness suggestions.",
             "low": "User is experiencing low mood. Be extra compassionate and supportive. Offer gentle, practical suggestions and validate their feelings.",
-            "very_low": "User is experiencing very low mood. Be very gentle, compassionate, and supportive. Focus on immediate coping strategies and emphasize professional help if needed."
+            "very_low": "User is experiencing very low mood. Be very gentle, compassionate, and supportive. Focus on immediate coping strategies and emphasize professional help if needed.",
         }
 
         base_guidance = guidance_map.get(category, "Be supportive and helpful.")
@@ -121,6 +191,8 @@ class MoodContextService:
         if trend == "declining":
             base_guidance += " Note that their mood has been declining recently - be extra gentle and offer specific coping strategies."
         elif trend == "improving":
-            base_guidance += " Their mood has been improving recently - acknowledge this positive trend."
+            base_guidance += (
+                " Their mood has been improving recently - acknowledge this positive trend."
+            )
 
-        return f"Response guidance: {base_guidance}"
\ No newline at end of file
+        return f"Response guidance: {base_guidance}"
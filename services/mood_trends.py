@@ -0,0 +1,167 @@
+"""
+Multi-window mood trend engine.
+
+``TrendState`` keeps running prefix sums of mood levels and of the time
+terms needed for a least-squares slope, so adding an entry is O(1) and the
+average, slope and trend of any trailing window (7/30/90 days) are O(1) reads
+once each window's start pointer has caught up (amortized O(1), pointers only
+move forward). Building the state from a time-ordered series is therefore a
+single pass, and the same state can be updated as new entries arrive.
+
+The trend category compares the averages of the first and second halves of
+the window's entries by count (``trend_category``).
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_WINDOWS = (7, 30, 90)
+EWMA_HALF_LIFE_DAYS = 7.0
+TREND_THRESHOLD = 0.5
+SECONDS_PER_DAY = 86400.0
+
+
+def trend_category(first_sum: float, first_count: int, second_sum: float, second_count: int) -> str:
+    """Improving/declining/stable from the averages of the two halves of a window."""
+    if first_count < 1 or second_count < 1:
+        return "insufficient_data"
+    diff = second_sum / second_count - first_sum / first_count
+    if diff > TREND_THRESHOLD:
+        return "improving"
+    elif diff < -TREND_THRESHOLD:
+        return "declining"
+    return "stable"
+
+
+class TrendState:
+    """Incremental aggregates over a time-ordered stream of (timestamp, mood_level)."""
+
+    def __init__(
+        self, windows: Sequence[int] = DEFAULT_WINDOWS, half_life_days: float = EWMA_HALF_LIFE_DAYS
+    ):
+        self.windows = tuple(sorted(windows))
+        self.half_life_days = half_life_days
+        self.origin: Optional[datetime] = None
+        self.last_timestamp: Optional[datetime] = None
+        self.ewma: Optional[float] = None
+        self._timestamps: List[datetime] = []
+        # Cumulative sums with a leading zero: _cum[i] covers entries [0, i)
+        self._times: List[float] = []
+        self._levels: List[int] = []
+        self._cum_y: List[float] = [0.0]
+        self._cum_t: List[float] = [0.0]
+        self._cum_tt: List[float] = [0.0]
+        self._cum_ty: List[float] = [0.0]
+        self._starts: Dict[int, int] = {days: 0 for days in self.windows}
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    def add(self, timestamp: datetime, level: int) -> bool:
+        """Append an entry in O(1); returns False (and ignores it) if it is older than the last one."""
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return False
+        if self.origin is None:
+            self.origin = timestamp
+        t = (timestamp - self.origin).total_seconds() / SECONDS_PER_DAY
+
+        if self.ewma is None:
+            self.ewma = float(level)
+        else:
+            elapsed = t - self._times[-1]
+            alpha = 1.0 - 0.5 ** (elapsed / self.half_life_days) if elapsed > 0 else 0.0
+            # Same-instant entries still count, as a plain running update
+            alpha = alpha or 1.0 / (len(self._levels) + 1)
+            self.ewma += alpha * (level - self.ewma)
+
+        self._timestamps.append(timestamp)
+        self._times.append(t)
+        self._levels.append(level)
+        self._cum_y.append(self._cum_y[-1] + level)
+        self._cum_t.append(self._cum_t[-1] + t)
+        self._cum_tt.append(self._cum_tt[-1] + t * t)
+        self._cum_ty.append(self._cum_ty[-1] + t * level)
+        self.last_timestamp = timestamp
+        return True
+
+    def _window_start(self, days: int, now: datetime) -> int:
+        # Datetime comparison keeps the window boundary identical to MoodSeries.since
+        cutoff = now - timedelta(days=days)
+        start = self._starts[days]
+        while start < len(self._timestamps) and self._timestamps[start] < cutoff:
+            start += 1
+        self._starts[days] = start
+        return start
+
+    def window(self, days: int, now: Optional[datetime] = None) -> Dict[str, object]:
+        """Average, entry count, slope (mood points per day) and trend for the trailing window.
+
+        Window starts only move forward, so ``now`` must not go backwards between calls.
+        """
+        now = now or datetime.utcnow()
+        start, end = self._window_start(days, now), len(self._levels)
+        n = end - start
+        if n == 0:
+            return {
+                "count": 0,
+                "average": None,
+                "slope_per_day": None,
+                "trend": "insufficient_data",
+            }
+
+        sum_y = self._cum_y[end] - self._cum_y[start]
+        mid = start + n // 2
+        trend = trend_category(
+            self._cum_y[mid] - self._cum_y[start],
+            mid - start,
+            self._cum_y[end] - self._cum_y[mid],
+            end - mid,
+        )
+        return {
+            "count": n,
+            "average": sum_y / n,
+            "slope_per_day": self._slope(start, end, sum_y),
+            "trend": trend,
+        }
+
+    def _slope(self, start: int, end: int, sum_y: float) -> Optional[float]:
+        n = end - start
+        if n < 2:
+            return None
+        sum_t = self._cum_t[end] - self._cum_t[start]
+        sum_tt = self._cum_tt[end] - self._cum_tt[start]
+        sum_ty = self._cum_ty[end] - self._cum_ty[start]
+        denominator = n * sum_tt - sum_t * sum_t
+        # All entries at (nearly) the same instant: no time axis to fit against
+        if denominator <= 1e-12 * max(1.0, n * sum_tt):
+            return None
+        return (n * sum_ty - sum_t * sum_y) / denominator
+
+    def summary(self, now: Optional[datetime] = None) -> Dict[str, object]:
+        """Every window's statistics, rounded for display."""
+        now = now or datetime.utcnow()
+        result: Dict[str, object] = {}
+        for days in self.windows:
+            stats = self.window(days, now)
+            result[f"{days}d"] = {
+                "count": stats["count"],
+                "average": None if stats["average"] is None else round(stats["average"], 2),
+                "slope_per_day": (
+                    None if stats["slope_per_day"] is None else round(stats["slope_per_day"], 3)
+                ),
+                "trend": stats["trend"],
+            }
+        return result
+
+    @classmethod
+    def from_series(
+        cls,
+        timestamps: Sequence[datetime],
+        levels: Sequence[int],
+        windows: Sequence[int] = DEFAULT_WINDOWS,
+    ) -> "TrendState":
+        """Build the state in one pass over a time-ordered series."""
+        state = cls(windows)
+        for timestamp, level in zip(timestamps, levels):
+            state.add(timestamp, level)
+        return state
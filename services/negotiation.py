@@ -0,0 +1,136 @@
+"""
+Content negotiation and compression for history endpoints.
+
+``Accept`` picks JSON or MessagePack (see services/serialization.py);
+``Accept-Encoding`` picks brotli or gzip for bodies of at least
+COMPRESSION_MIN_BYTES. Brotli needs the optional ``brotli`` package and is
+skipped when it is not installed.
+"""
+
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from services.config import settings
+from services.metrics import metrics
+from services.serialization import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+metrics.describe(
+    "http_compressed_responses_total",
+    "counter",
+    "Responses compressed by content negotiation, by encoding.",
+)
+
+MSGPACK_ALIASES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+VARY = "Accept, Accept-Encoding"
+# Dynamic responses: favour speed over the last few percent of ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _parse_header(header: str) -> List[Tuple[str, float]]:
+    """(token, q) pairs of an Accept-style header; malformed q-values count as 0."""
+    parsed = []
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        parsed.append((token.strip().lower(), q))
+    return parsed
+
+
+def _media_quality(
+    accepted: List[Tuple[str, float]], media_types: Tuple[str, ...]
+) -> Tuple[float, int]:
+    """(q, specificity) of the most specific Accept entry matching any of ``media_types``."""
+    best = (0.0, -1)
+    for token, q in accepted:
+        for media_type in media_types:
+            if token == media_type:
+                specificity = 2
+            elif token == media_type.split("/")[0] + "/*":
+                specificity = 1
+            elif token == "*/*":
+                specificity = 0
+            else:
+                continue
+            if specificity > best[1]:
+                best = (q, specificity)
+    return best
+
+
+def negotiate_media_type(request: Request) -> str:
+    """MessagePack when the client names it at least as preferred as JSON; JSON otherwise.
+
+    Wildcards never select MessagePack, so browsers and ``*/*`` clients keep getting JSON.
+    """
+    header = request.headers.get("accept")
+    if not header:
+        return JSON_MEDIA_TYPE
+    accepted = _parse_header(header)
+    msgpack_q, specificity = _media_quality(accepted, MSGPACK_ALIASES)
+    if (
+        specificity == 2
+        and msgpack_q > 0
+        and msgpack_q >= _media_quality(accepted, (JSON_MEDIA_TYPE,))[0]
+    ):
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    """``br`` or ``gzip`` as accepted by the client, or None for identity."""
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return None
+    qualities: Dict[str, float] = {}
+    for token, q in _parse_header(header):
+        qualities[token] = q
+    wildcard = qualities.get("*", 0.0)
+    candidates = [("br", qualities.get("br", wildcard))] if brotli is not None else []
+    candidates.append(("gzip", qualities.get("gzip", wildcard)))
+    encoding, q = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if q > 0 else None
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def representation_headers(headers: Dict[str, str], media_type: str) -> Dict[str, str]:
+    """Validator headers for one representation: MessagePack gets its own ETag, both vary on Accept."""
+    headers = dict(headers, Vary=VARY)
+    if media_type != JSON_MEDIA_TYPE:
+        headers["ETag"] = headers["ETag"][:-1] + '-msgpack"'
+    return headers
+
+
+def negotiated_response(
+    request: Request, content: bytes, media_type: str, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Response for an already encoded body, compressed when it is large enough and the client allows it."""
+    headers = dict(headers or {})
+    headers["Vary"] = VARY
+    if len(content) >= settings.COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(request)
+        if encoding is not None:
+            content = compress(content, encoding)
+            headers["Content-Encoding"] = encoding
+            metrics.inc("http_compressed_responses_total", (("encoding", encoding),))
+    return Response(content=content, media_type=media_type, headers=headers)
@@ -0,0 +1,451 @@
+"""
+Transactional outbox and in-process event bus.
+
+Every flush that inserts, updates or deletes a mood entry, chat message,
+journal entry, exercise session or music session also inserts one
+``outbox_events`` row per changed row on the flush's own connection, so an
+event exists exactly when its change committed. Derived data (rollups,
+indexes, notifications) subscribes to ``event_bus`` instead of hooking into
+each repository.
+
+``OutboxDispatcher`` runs in the app lifespan. It reads events in id order
+and hands them in batches to each registered async consumer. Each consumer's
+position is kept per database in ``outbox_checkpoints`` and only advanced
+after the consumer returns, so delivery is at least once and consumers must
+tolerate repeats. Reads stop at the commit watermark (services/watermark.py),
+so a position never passes an id whose transaction may still commit. A failing consumer is retried with backoff without holding
+up the others. A time-limited lease on the checkpoint row keeps several
+workers from dispatching the same consumer at once.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, or_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models.database import (
+    ChatMessage,
+    ExerciseSession,
+    JournalEntry,
+    MoodEntry,
+    MusicSession,
+    OutboxCheckpoint,
+    OutboxEvent,
+)
+from services.config import settings
+from services.metrics import metrics
+from services.sharding import RESHARD_COPY
+from services.watermark import CommitWatermark
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "outbox_events_written_total", "counter", "Outbox events written with their change, by topic."
+)
+metrics.describe(
+    "outbox_events_delivered_total", "counter", "Outbox events handed to consumers, by consumer."
+)
+metrics.describe(
+    "outbox_delivery_failures_total", "counter", "Consumer batches that raised and will be retried."
+)
+metrics.describe(
+    "outbox_lag_events", "gauge", "Events written but not yet delivered, by consumer and shard."
+)
+metrics.describe(
+    "outbox_lag_seconds", "gauge", "Age of the oldest undelivered event, by consumer and shard."
+)
+metrics.describe("outbox_batch_seconds", "histogram", "Time consumers take to handle one batch.")
+
+OUTBOX_MODELS = {
+    MoodEntry: "mood",
+    ChatMessage: "chat",
+    JournalEntry: "journal",
+    ExerciseSession: "exercise",
+    MusicSession: "music",
+}
+# Legacy JSON copies stay out of payloads; consumers can load the row if they need it
+PAYLOAD_EXCLUDE = frozenset({"mood_context"})
+# Session.info flag: this transaction wrote events, wake the dispatcher after commit
+PENDING_EVENTS = "outbox_pending"
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class Event(NamedTuple):
+    id: int
+    topic: str
+    user_id: str
+    entity_id: int
+    payload: Dict[str, Any]
+    created_at: Optional[datetime]
+    shard: str
+
+
+Handler = Callable[[List[Event]], Awaitable[None]]
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _payload(instance: Any, deleted: bool) -> Dict[str, Any]:
+    if deleted:
+        return {"id": instance.id, "user_id": instance.user_id}
+    state = inspect(instance)
+    # Only loaded values: server defaults (timestamps) are not re-selected in the middle of a flush
+    return {
+        attr.key: _json_value(state.dict[attr.key])
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict and attr.key not in PAYLOAD_EXCLUDE
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _write_outbox_events(session: Session, flush_context) -> None:
+    if session.info.get(RESHARD_COPY):
+        return
+    events: Dict[Optional[str], List[dict]] = {}
+    for instances, verb in (
+        (session.new, "created"),
+        (session.dirty, "updated"),
+        (session.deleted, "deleted"),
+    ):
+        for instance in instances:
+            entity = OUTBOX_MODELS.get(type(instance))
+            if entity is None or instance.id is None:
+                continue
+            if verb == "updated" and not session.is_modified(instance, include_collections=False):
+                continue
+            events.setdefault(inspect(instance).identity_token, []).append(
+                {
+                    "topic": f"{entity}.{verb}",
+                    "user_id": instance.user_id,
+                    "entity_id": instance.id,
+                    "payload": _payload(instance, deleted=verb == "deleted"),
+                }
+            )
+    for shard, rows in events.items():
+        bind_arguments = (
+            {"shard_id": shard} if shard is not None else {"mapper": OutboxEvent.__mapper__}
+        )
+        session.connection(bind_arguments=bind_arguments).execute(
+            insert(OutboxEvent.__table__), rows
+        )
+        for row in rows:
+            metrics.inc("outbox_events_written_total", (("topic", row["topic"]),))
+    if events:
+        session.info[PENDING_EVENTS] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session: Session) -> None:
+    if session.info.pop(PENDING_EVENTS, False):
+        dispatcher.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS, None)
+
+
+class Consumer:
+    """A named async handler for batches of events, optionally limited to topics ("mood.created", "chat.*")."""
+
+    __slots__ = ("name", "handler", "topics")
+
+    def __init__(self, name: str, handler: Handler, topics: Optional[Iterable[str]] = None):
+        self.name = name
+        self.handler = handler
+        self.topics = tuple(topics or ())
+
+    def wants(self, topic: str) -> bool:
+        if not self.topics:
+            return True
+        return any(
+            topic == t or (t.endswith(".*") and topic.startswith(t[:-1])) for t in self.topics
+        )
+
+
+class EventBus:
+    """Registry of outbox consumers."""
+
+    def __init__(self):
+        self.consumers: Dict[str, Consumer] = {}
+
+    def subscribe(
+        self, name: str, handler: Handler, topics: Optional[Iterable[str]] = None
+    ) -> Consumer:
+        """Register ``handler``; the name keys its checkpoint, so keep it stable across deploys."""
+        if not asyncio.iscoroutinefunction(handler):
+            raise TypeError(f"Outbox consumer {name} must be an async function")
+        consumer = self.consumers[name] = Consumer(name, handler, topics)
+        return consumer
+
+    def unsubscribe(self, name: str) -> None:
+        self.consumers.pop(name, None)
+
+    def consumer(self, name: str, topics: Optional[Iterable[str]] = None):
+        """Decorator form of ``subscribe``."""
+
+        def register(handler: Handler) -> Handler:
+            self.subscribe(name, handler, topics)
+            return handler
+
+        return register
+
+
+class OutboxDispatcher:
+    """Background task delivering outbox events to every consumer on every database."""
+
+    def __init__(
+        self,
+        bus: EventBus,
+        engines: Optional[Dict[str, Engine]] = None,
+        owner: Optional[str] = None,
+    ):
+        self.bus = bus
+        self._engines = engines
+        self._owner = owner
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._retry_at: Dict[Tuple[str, str], float] = {}
+        self._last_prune = time.monotonic()
+        self._watermark = CommitWatermark(OutboxEvent.__table__, "created_at")
+
+    @property
+    def owner(self) -> str:
+        # Computed per call: worker processes forked from one parent must not share a lease owner
+        return self._owner or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+
+    @property
+    def engines(self) -> Dict[str, Engine]:
+        if self._engines is not None:
+            return self._engines
+        from services.database import db_config
+
+        return db_config.engines
+
+    def start(self) -> None:
+        """Start dispatching on the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+        logger.info(f"Outbox dispatcher started ({len(self.bus.consumers)} consumers)")
+
+    async def stop(self) -> None:
+        """Stop the task and release this dispatcher's leases so another worker can take over at once."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task, self._loop, self._wake = None, None, None
+        for engine in self.engines.values():
+            await run_in_threadpool(self._release, engine)
+
+    def wake(self) -> None:
+        """Deliver without waiting for the next poll; safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                delivered = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+                delivered = 0
+            if delivered == 0:
+                # Caught up: sleep until a commit wakes us or the poll interval passes
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), settings.OUTBOX_POLL_MS / 1000)
+                self._wake.clear()
+
+    async def dispatch_once(self) -> int:
+        """Deliver at most one batch per consumer and database; returns events consumed."""
+        delivered = 0
+        consumers = list(self.bus.consumers.values())
+        for shard, engine in list(self.engines.items()):
+            for consumer in consumers:
+                delivered += await self._deliver(shard, engine, consumer)
+        if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self._last_prune = time.monotonic()
+            for engine in self.engines.values():
+                await run_in_threadpool(
+                    self._prune, engine, [consumer.name for consumer in consumers]
+                )
+        return delivered
+
+    async def _deliver(self, shard: str, engine: Engine, consumer: Consumer) -> int:
+        key = (consumer.name, shard)
+        if self._retry_at.get(key, 0.0) > time.monotonic():
+            return 0
+        claimed = await run_in_threadpool(self._claim_batch, engine, consumer.name)
+        if claimed is None:
+            return 0  # Another dispatcher holds this consumer's lease
+        position, rows, newest = claimed
+        self._record_lag(consumer.name, shard, rows, position, newest)
+        if not rows:
+            return 0
+
+        events = [Event(*row, shard=shard) for row in rows]
+        wanted = [item for item in events if consumer.wants(item.topic)]
+        started = time.perf_counter()
+        if wanted:
+            try:
+                await consumer.handler(wanted)
+            except Exception as e:
+                failures = self._failures[key] = self._failures.get(key, 0) + 1
+                delay = min(settings.OUTBOX_RETRY_MAX_SECONDS, 0.5 * 2 ** (failures - 1))
+                self._retry_at[key] = time.monotonic() + delay
+                metrics.inc("outbox_delivery_failures_total", (("consumer", consumer.name),))
+                logger.warning(
+                    f"Outbox consumer {consumer.name} failed on events {events[0].id}-{events[-1].id}: {e}; "
+                    f"retrying in {delay:.1f}s"
+                )
+                return 0
+            metrics.observe(
+                "outbox_batch_seconds",
+                time.perf_counter() - started,
+                (("consumer", consumer.name),),
+            )
+            metrics.inc(
+                "outbox_events_delivered_total", (("consumer", consumer.name),), amount=len(wanted)
+            )
+        self._failures.pop(key, None)
+        self._retry_at.pop(key, None)
+
+        if not await run_in_threadpool(
+            self._advance, engine, consumer.name, position, events[-1].id
+        ):
+            logger.warning(
+                f"Outbox consumer {consumer.name} lost its lease on {shard}; the batch may be delivered again"
+            )
+        return len(events)
+
+    def _lease_until(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+
+    def _claim_batch(self, engine: Engine, name: str) -> Optional[Tuple[int, list, int]]:
+        """Take (or renew) the consumer's lease and read its next batch: (position, rows, newest id)."""
+        with Session(bind=engine) as session:
+            if session.get(OutboxCheckpoint, name) is None:
+                try:
+                    # New consumers start from the oldest retained event
+                    session.add(OutboxCheckpoint(consumer=name, position=0))
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()  # Another dispatcher created it first
+            claimed = session.execute(
+                update(OutboxCheckpoint)
+                .where(
+                    OutboxCheckpoint.consumer == name,
+                    or_(
+                        OutboxCheckpoint.owner == self.owner,
+                        OutboxCheckpoint.owner.is_(None),
+                        OutboxCheckpoint.leased_until < datetime.utcnow(),
+                    ),
+                )
+                .values(owner=self.owner, leased_until=self._lease_until())
+            ).rowcount
+            if not claimed:
+                session.rollback()
+                return None
+            position = (
+                session.query(OutboxCheckpoint.position)
+                .filter(OutboxCheckpoint.consumer == name)
+                .scalar()
+            )
+            # Events above the watermark may still have lower ids committing after them; leave them for later
+            horizon = self._watermark.horizon(session.connection())
+            rows = (
+                session.query(
+                    OutboxEvent.id,
+                    OutboxEvent.topic,
+                    OutboxEvent.user_id,
+                    OutboxEvent.entity_id,
+                    OutboxEvent.payload,
+                    OutboxEvent.created_at,
+                )
+                .filter(OutboxEvent.id > position, OutboxEvent.id <= horizon)
+                .order_by(OutboxEvent.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .all()
+            )
+            newest = session.query(func.max(OutboxEvent.id)).scalar() or 0
+            session.commit()
+            return position, rows, newest
+
+    def _advance(self, engine: Engine, name: str, position: int, new_position: int) -> bool:
+        """Move the checkpoint past a delivered batch, unless the lease (and so the batch) went to someone else."""
+        with Session(bind=engine) as session:
+            advanced = session.execute(
+                update(OutboxCheckpoint)
+                .where(
+                    OutboxCheckpoint.consumer == name,
+                    OutboxCheckpoint.owner == self.owner,
+                    OutboxCheckpoint.position == position,
+                )
+                .values(position=new_position, leased_until=self._lease_until())
+            ).rowcount
+            session.commit()
+            return bool(advanced)
+
+    def _release(self, engine: Engine) -> None:
+        with Session(bind=engine) as session:
+            session.execute(
+                update(OutboxCheckpoint)
+                .where(OutboxCheckpoint.owner == self.owner)
+                .values(owner=None, leased_until=None)
+            )
+            session.commit()
+
+    def _prune(self, engine: Engine, consumer_names: List[str]) -> int:
+        """Delete events older than OUTBOX_RETENTION_HOURS that every registered consumer has seen."""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+        with Session(bind=engine) as session:
+            statement = delete(OutboxEvent).where(OutboxEvent.created_at < cutoff)
+            if consumer_names:
+                positions = (
+                    session.query(OutboxCheckpoint.position)
+                    .filter(OutboxCheckpoint.consumer.in_(consumer_names))
+                    .all()
+                )
+                delivered = (
+                    min(p for (p,) in positions) if len(positions) == len(consumer_names) else 0
+                )
+                statement = statement.where(OutboxEvent.id <= delivered)
+            pruned = session.execute(statement).rowcount
+            session.commit()
+        if pruned:
+            logger.info(f"Outbox: pruned {pruned} delivered events")
+        return pruned
+
+    def _record_lag(self, name: str, shard: str, rows: list, position: int, newest: int) -> None:
+        labels = (("consumer", name), ("shard", shard))
+        metrics.set_gauge("outbox_lag_events", max(0, newest - position), labels)
+        age = 0.0
+        if rows and rows[0].created_at is not None:
+            oldest = rows[0].created_at
+            now = datetime.now(timezone.utc) if oldest.tzinfo else datetime.utcnow()
+            age = max(0.0, (now - oldest).total_seconds())
+        metrics.set_gauge("outbox_lag_seconds", age, labels)
+
+
+# Global event bus and dispatcher
+event_bus = EventBus()
+dispatcher = OutboxDispatcher(event_bus)
@@ -0,0 +1,49 @@
+"""
+Opaque keyset cursors.
+
+A cursor is the (timestamp, id) of the last row a client has seen (or, for
+/api/sync, the database and change sequence it has synced up to), encoded as
+URL-safe base64 so clients treat it as a token rather than building their own.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Tuple
+
+
+def _encode(values: List[Any]) -> str:
+    payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def _decode(cursor: str) -> Any:
+    return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    return _encode([timestamp.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor; raises ValueError if it is malformed."""
+    try:
+        timestamp, row_id = _decode(cursor)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_sync_cursor(shard: str, sequence: int) -> str:
+    return _encode([shard, sequence])
+
+
+def decode_sync_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a sync cursor into (shard, sequence); raises ValueError if it is malformed."""
+    try:
+        shard, sequence = _decode(cursor)
+        if not isinstance(shard, str):
+            raise ValueError("Invalid cursor")
+        return shard, int(sequence)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,150 @@
+"""
+SQL query profiling via SQLAlchemy cursor events.
+
+Counts queries and database time per request, flags statements repeated
+within one request (likely N+1 patterns), logs slow statements with their
+parameter values redacted, and, in debug mode, reports the counts in
+response headers.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from services.config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("db_queries_total", "counter", "SQL statements executed.")
+metrics.describe("db_query_duration_seconds", "histogram", "SQL statement execution latency.")
+metrics.describe("db_slow_queries_total", "counter", "SQL statements slower than SLOW_QUERY_MS.")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    """Queries executed while serving one request."""
+
+    __slots__ = ("count", "total_time", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter = Counter()
+
+    def repeated_statements(self, threshold: int) -> list:
+        """Statements executed at least ``threshold`` times, most frequent first."""
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Stats of the request being served, if any."""
+    return _current_stats.get()
+
+
+def normalize_statement(statement: str) -> str:
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def _describe_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def normalize_parameters(parameters: Any, executemany: bool = False) -> str:
+    """Describe bound parameters by type and size only, never by value."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = normalize_parameters(parameters[0]) if parameters else "()"
+        return f"{len(parameters)} x {first}"
+    if isinstance(parameters, dict):
+        return (
+            "{"
+            + ", ".join(f"{key}: {_describe_value(value)}" for key, value in parameters.items())
+            + "}"
+        )
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(_describe_value(value) for value in parameters) + ")"
+    return _describe_value(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    metrics.inc("db_queries_total")
+    metrics.observe("db_query_duration_seconds", elapsed)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.total_time += elapsed
+        stats.statements[statement] += 1
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        metrics.inc("db_slow_queries_total")
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms): {normalize_statement(statement)} "
+            f"params={normalize_parameters(parameters, executemany)}"
+        )
+
+
+def attach_query_profiler(engine: Engine) -> None:
+    """Instrument an engine; safe to call more than once."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware collecting per-request query stats.
+
+    Statements repeated ``N_PLUS_ONE_THRESHOLD`` times within a request are
+    logged as possible N+1 patterns. With ``DEBUG`` enabled, query count and
+    database time are added to the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.total_time * 1000:.2f}".encode()))
+                repeated = stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD)
+                headers.append((b"x-db-repeated-statements", str(len(repeated)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            for statement, count in stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD):
+                logger.warning(
+                    f"Possible N+1: statement ran {count} times in {scope['method']} {scope['path']}: "
+                    f"{normalize_statement(statement)}"
+                )
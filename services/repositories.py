@@ -1,316 +1,573 @@
 """
 Repository pattern implementation for database operations.
 """
+
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
+from sqlalchemy import String, desc, and_, func, insert, literal, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+import hashlib
 import json
 import logging
 
-from models.database import User, MoodEntry, ChatMessage, JournalEntry, ExerciseSession, MusicSession
+from models.database import (
+    User,
+    MoodEntry,
+    ChatMessage,
+    JournalEntry,
+    ExerciseSession,
+    MusicSession,
+    MoodContextSnapshot,
+    MoodAlert,
+)
 from models.schemas import MoodEntry as MoodEntrySchema
+from services.cache import mark_user_changed
+from services.change_detection import change_detector
+from services.conversation import forget_conversation, record_turn
+from services.mood_context import MoodSeries
+from services.sentiment import sentiment_columns
+from services.sharding import route_to_user, scatter_gather
 
 logger = logging.getLogger(__name__)
 
+# Column projections for the history endpoints, in services.serialization field order
+MOOD_HISTORY_COLUMNS = (
+    MoodEntry.user_id,
+    MoodEntry.mood_level,
+    MoodEntry.notes,
+    MoodEntry.timestamp,
+)
+CHAT_HISTORY_COLUMNS = (
+    ChatMessage.id,
+    ChatMessage.message,
+    ChatMessage.response,
+    ChatMessage.timestamp,
+    ChatMessage.ai_provider,
+    ChatMessage.ai_model,
+)
+# Same columns without the (large) response bodies, for compact history pages
+CHAT_HISTORY_COMPACT_COLUMNS = tuple(
+    column for column in CHAT_HISTORY_COLUMNS if column is not ChatMessage.response
+)
+
 
 class UserRepository:
     """Repository for user operations."""
-    
+
     def __init__(self, session: Session):
         self.session = session
-    
-    def create_user(self, user_id: str, email: Optional[str] = None, display_name: Optional[str] = None) -> User:
+
+    def create_user(
+        self, user_id: str, email: Optional[str] = None, display_name: Optional[str] = None
+    ) -> User:
         """Create a new user or return existing one."""
         user = self.get_user_by_id(user_id)
         if user:
             return user
-        
-        user = User(
-            user_id=user_id,
-            email=email,
-            display_name=display_name
-        )
+
+        user = User(user_id=user_id, email=email, display_name=display_name)
         self.session.add(user)
         self.session.flush()  # Get the ID without committing
         return user
-    
+
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get user by user_id."""
         return self.session.query(User).filter(User.user_id == user_id).first()
-    
+
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email."""
         return self.session.query(User).filter(User.email == email).first()
-    
+
     def update_user(self, user_id: str, **kwargs) -> Optional[User]:
         """Update user information."""
         user = self.get_user_by_id(user_id)
         if not user:
             return None
-        
+
         for key, value in kwargs.items():
             if hasattr(user, key):
                 setattr(user, key, value)
-        
+
         return user
-    
+
+    def record_data_change(self, user_id: str, kind: str) -> None:
+        """Bump the user's ``mood`` or ``chat`` write counter and invalidate cached data on commit."""
+        version = getattr(User, f"{kind}_version")
+        self.session.query(User).filter(User.user_id == user_id).update(
+            {version: version + 1, getattr(User, f"{kind}_changed_at"): func.now()},
+            synchronize_session=False,
+        )
+        mark_user_changed(self.session, user_id)
+
+    def get_data_versions(self, user_id: str) -> Optional[tuple]:
+        """Get (mood_version, chat_version, mood_changed_at, chat_changed_at) for a user."""
+        return (
+            self.session.query(
+                User.mood_version, User.chat_version, User.mood_changed_at, User.chat_changed_at
+            )
+            .filter(User.user_id == user_id)
+            .first()
+        )
+
     def delete_user(self, user_id: str) -> bool:
         """Delete user and all associated data."""
         user = self.get_user_by_id(user_id)
         if not user:
             return False
-        
+
         self.session.delete(user)
         return True
 
 
 class MoodRepository:
     """Repository for mood entry operations."""
-    
+
     def __init__(self, session: Session):
         self.session = session
-    
-    def create_mood_entry(self, user_id: str, mood_level: int, notes: Optional[str] = None, timestamp: Optional[datetime] = None) -> MoodEntry:
+
+    def create_mood_entry(
+        self,
+        user_id: str,
+        mood_level: int,
+        notes: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> MoodEntry:
         """Create a new mood entry."""
         # Ensure user exists
         user_repo = UserRepository(self.session)
         user_repo.create_user(user_id)
-        
+
         mood_entry = MoodEntry(
-            user_id=user_id,
-            mood_level=mood_level,
-            notes=notes
+            user_id=user_id, mood_level=mood_level, notes=notes, **sentiment_columns(notes)
         )
-        
+
         if timestamp:
             mood_entry.timestamp = timestamp
-        
+
         self.session.add(mood_entry)
         self.session.flush()
+        user_repo.record_data_change(user_id, "mood")
+        change_detector.observe(self.session, mood_entry)
         return mood_entry
-    
-    def get_mood_entries_by_user(self, user_id: str, days_back: int = 7, limit: Optional[int] = None) -> List[MoodEntry]:
+
+    def get_mood_entries_by_user(
+        self, user_id: str, days_back: int = 7, limit: Optional[int] = None
+    ) -> List[MoodEntry]:
         """Get mood entries for a user within the last N days."""
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-        
+
         query = (
             self.session.query(MoodEntry)
-            .filter(
-                and_(
-                    MoodEntry.user_id == user_id,
-                    MoodEntry.timestamp >= cutoff_date
-                )
-            )
+            .filter(and_(MoodEntry.user_id == user_id, MoodEntry.timestamp >= cutoff_date))
             .order_by(MoodEntry.timestamp)
         )
-        
+
         if limit:
             query = query.limit(limit)
-        
+
         return query.all()
-    
-    def get_all_mood_entries(self, days_back: int = 7, limit: Optional[int] = None) -> List[MoodEntry]:
-        """Get mood entries for all users within the last N days."""
+
+    def get_mood_series_by_user(self, user_id: str, days_back: int = 7) -> MoodSeries:
+        """Get (timestamp, mood_level, sentiment_score) rows for a user plus only the latest entry's notes."""
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-        
+        window = and_(MoodEntry.user_id == user_id, MoodEntry.timestamp >= cutoff_date)
+
+        rows = (
+            self.session.query(MoodEntry.timestamp, MoodEntry.mood_level, MoodEntry.sentiment_score)
+            .filter(window)
+            .order_by(MoodEntry.timestamp, MoodEntry.id)
+            .all()
+        )
+        if not rows:
+            return MoodSeries()
+
+        latest_notes, latest_emotion = (
+            self.session.query(MoodEntry.notes, MoodEntry.emotion)
+            .filter(window)
+            .order_by(desc(MoodEntry.timestamp), desc(MoodEntry.id))
+            .limit(1)
+            .one()
+        )
+        return MoodSeries(
+            timestamps=[row.timestamp for row in rows],
+            levels=[row.mood_level for row in rows],
+            latest_notes=latest_notes,
+            sentiments=[row.sentiment_score for row in rows],
+            latest_emotion=latest_emotion,
+        )
+
+    def get_all_mood_entries(
+        self, days_back: int = 7, limit: Optional[int] = None
+    ) -> List[MoodEntry]:
+        """Get mood entries for all users within the last N days (merged across shards)."""
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+
         query = (
             self.session.query(MoodEntry)
             .filter(MoodEntry.timestamp >= cutoff_date)
             .order_by(MoodEntry.timestamp)
         )
-        
+
         if limit:
             query = query.limit(limit)
-        
+
+        return scatter_gather(query, key=lambda entry: entry.timestamp, limit=limit)
+
+    def get_mood_rows_by_user(
+        self, user_id: str, days_back: int = 7, limit: Optional[int] = None
+    ) -> List[tuple]:
+        """Get (user_id, mood_level, notes, timestamp) tuples for a user, skipping ORM objects."""
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+
+        query = (
+            self.session.query(*MOOD_HISTORY_COLUMNS)
+            .filter(and_(MoodEntry.user_id == user_id, MoodEntry.timestamp >= cutoff_date))
+            .order_by(MoodEntry.timestamp)
+        )
+
+        if limit:
+            query = query.limit(limit)
+
         return query.all()
-    
+
+    def get_all_mood_rows(self, days_back: int = 7, limit: Optional[int] = None) -> List[tuple]:
+        """Get (user_id, mood_level, notes, timestamp) tuples for all users (merged across shards)."""
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+
+        query = (
+            self.session.query(*MOOD_HISTORY_COLUMNS)
+            .filter(MoodEntry.timestamp >= cutoff_date)
+            .order_by(MoodEntry.timestamp)
+        )
+
+        if limit:
+            query = query.limit(limit)
+
+        return scatter_gather(query, key=lambda row: row.timestamp, limit=limit)
+
     def get_mood_entry_by_id(self, mood_id: int) -> Optional[MoodEntry]:
         """Get mood entry by ID."""
         return self.session.query(MoodEntry).filter(MoodEntry.id == mood_id).first()
-    
+
     def get_user_mood_statistics(self, user_id: str, days_back: int = 30) -> Dict[str, Any]:
         """Get mood statistics for a user."""
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-        
+
         result = (
             self.session.query(
-                func.count(MoodEntry.id).label('total_entries'),
-                func.avg(MoodEntry.mood_level).label('average_mood'),
-                func.min(MoodEntry.mood_level).label('min_mood'),
-                func.max(MoodEntry.mood_level).label('max_mood')
-            )
-            .filter(
-                and_(
-                    MoodEntry.user_id == user_id,
-                    MoodEntry.timestamp >= cutoff_date
-                )
+                func.count(MoodEntry.id).label("total_entries"),
+                func.avg(MoodEntry.mood_level).label("average_mood"),
+                func.min(MoodEntry.mood_level).label("min_mood"),
+                func.max(MoodEntry.mood_level).label("max_mood"),
             )
+            .filter(and_(MoodEntry.user_id == user_id, MoodEntry.timestamp >= cutoff_date))
             .first()
         )
-        
+
         return {
-            'total_entries': result.total_entries or 0,
-            'average_mood': float(result.average_mood) if result.average_mood else 0,
-            'min_mood': result.min_mood or 0,
-            'max_mood': result.max_mood or 0,
-            'days_analyzed': days_back
+            "total_entries": result.total_entries or 0,
+            "average_mood": float(result.average_mood) if result.average_mood else 0,
+            "min_mood": result.min_mood or 0,
+            "max_mood": result.max_mood or 0,
+            "days_analyzed": days_back,
         }
-    
+
     def delete_mood_entry(self, mood_id: int) -> bool:
         """Delete a mood entry."""
         mood_entry = self.get_mood_entry_by_id(mood_id)
         if not mood_entry:
             return False
-        
+
         self.session.delete(mood_entry)
+        UserRepository(self.session).record_data_change(mood_entry.user_id, "mood")
         return True
 
+    def get_mood_alerts_by_user(self, user_id: str, limit: int = 20) -> List[MoodAlert]:
+        """Get the latest mood change alerts for a user."""
+        return (
+            self.session.query(MoodAlert)
+            .filter(MoodAlert.user_id == user_id)
+            .order_by(desc(MoodAlert.id))
+            .limit(limit)
+            .all()
+        )
+
 
 class ChatRepository:
     """Repository for chat message operations."""
-    
+
     def __init__(self, session: Session):
         self.session = session
-    
+
     def create_chat_message(
-        self, 
-        user_id: str, 
-        message: str, 
-        response: str, 
-        ai_provider: str, 
+        self,
+        user_id: str,
+        message: str,
+        response: str,
+        ai_provider: str,
         ai_model: str,
-        mood_context: Optional[Dict[str, Any]] = None
+        mood_context: Optional[Dict[str, Any]] = None,
     ) -> ChatMessage:
         """Create a new chat message record."""
+        # The mood context snapshot carries no user_id; store it on this user's shard
+        route_to_user(self.session, user_id)
+
         # Ensure user exists
         user_repo = UserRepository(self.session)
         user_repo.create_user(user_id)
-        
+
+        snapshot = None
+        if mood_context:
+            snapshot = MoodContextSnapshotRepository(self.session).get_or_create_snapshot(
+                mood_context
+            )
+
         chat_message = ChatMessage(
             user_id=user_id,
             message=message,
             response=response,
             ai_provider=ai_provider,
             ai_model=ai_model,
-            mood_context=json.dumps(mood_context) if mood_context else None
+            mood_context_snapshot_id=snapshot.id if snapshot else None,
+            **sentiment_columns(message),
         )
-        
+
         self.session.add(chat_message)
         self.session.flush()
+        user_repo.record_data_change(user_id, "chat")
+        record_turn(self.session, user_id, message, response)
         return chat_message
-    
+
     def get_chat_history_by_user(self, user_id: str, limit: int = 50) -> List[ChatMessage]:
         """Get recent chat history for a user."""
         return (
             self.session.query(ChatMessage)
             .filter(ChatMessage.user_id == user_id)
-            .order_by(desc(ChatMessage.timestamp))
+            .order_by(desc(ChatMessage.timestamp), desc(ChatMessage.id))
+            .limit(limit)
+            .all()
+        )
+
+    def get_chat_history_rows(
+        self,
+        user_id: str,
+        limit: int = 50,
+        before: Optional[tuple] = None,
+        compact: bool = False,
+    ) -> List[tuple]:
+        """Get chat history newest first as (id, message, response, timestamp, ai_provider, ai_model) tuples.
+
+        ``before`` is the (timestamp, id) of the last row already seen; the page
+        continues strictly after it using the (user_id, timestamp, id) index, so
+        every page costs the same regardless of depth. ``compact`` omits ``response``.
+        """
+        query = self.session.query(
+            *(CHAT_HISTORY_COMPACT_COLUMNS if compact else CHAT_HISTORY_COLUMNS)
+        ).filter(ChatMessage.user_id == user_id)
+        if before is not None:
+            timestamp, message_id = before
+            bound = self._timestamp_bound(user_id, timestamp, message_id)
+            query = query.filter(
+                tuple_(ChatMessage.timestamp, ChatMessage.id) < tuple_(bound, message_id)
+            )
+        return query.order_by(desc(ChatMessage.timestamp), desc(ChatMessage.id)).limit(limit).all()
+
+    def _timestamp_bound(self, user_id: str, timestamp: datetime, message_id: int):
+        """Bind the cursor row's timestamp so it compares equal to the stored value."""
+        if self.session.get_bind(ChatMessage.__mapper__).dialect.name != "sqlite":
+            return timestamp
+        # SQLite stores DATETIME as text: values written from Python have six fraction digits, server
+        # defaults (CURRENT_TIMESTAMP) none. A whole-second timestamp may be stored either way, so ask the
+        # cursor row which one it holds
+        encoded = timestamp.replace(tzinfo=None).isoformat(sep=" ", timespec="microseconds")
+        if not timestamp.microsecond:
+            bare = literal(encoded[:-7], String)
+            stored_bare = (
+                self.session.query(ChatMessage.id)
+                .filter(
+                    ChatMessage.user_id == user_id,
+                    ChatMessage.id == message_id,
+                    ChatMessage.timestamp == bare,
+                )
+                .first()
+            )
+            if stored_bare is not None:
+                return bare
+        return literal(encoded, String)
+
+    def get_recent_turns(self, user_id: str, limit: int = 10) -> List[tuple]:
+        """Get the user's last ``limit`` (message, response) pairs, oldest first."""
+        rows = (
+            self.session.query(ChatMessage.message, ChatMessage.response)
+            .filter(ChatMessage.user_id == user_id)
+            .order_by(desc(ChatMessage.timestamp), desc(ChatMessage.id))
             .limit(limit)
             .all()
         )
-    
+        return [(row.message, row.response) for row in reversed(rows)]
+
     def get_chat_message_by_id(self, message_id: int) -> Optional[ChatMessage]:
         """Get chat message by ID."""
         return self.session.query(ChatMessage).filter(ChatMessage.id == message_id).first()
-    
+
+    def get_mood_context(self, chat_message: ChatMessage) -> Optional[Dict[str, Any]]:
+        """Get the mood context used for a chat message, including legacy JSON rows."""
+        if chat_message.mood_context_snapshot is not None:
+            return chat_message.mood_context_snapshot.context
+        if chat_message.mood_context:
+            return json.loads(chat_message.mood_context)
+        return None
+
     def delete_chat_message(self, message_id: int) -> bool:
         """Delete a chat message."""
         message = self.get_chat_message_by_id(message_id)
         if not message:
             return False
-        
+
         self.session.delete(message)
+        UserRepository(self.session).record_data_change(message.user_id, "chat")
+        forget_conversation(self.session, message.user_id)
         return True
-    
+
     def get_user_chat_statistics(self, user_id: str, days_back: int = 30) -> Dict[str, Any]:
         """Get chat statistics for a user."""
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-        
+
         result = (
             self.session.query(func.count(ChatMessage.id))
-            .filter(
-                and_(
-                    ChatMessage.user_id == user_id,
-                    ChatMessage.timestamp >= cutoff_date
-                )
-            )
+            .filter(and_(ChatMessage.user_id == user_id, ChatMessage.timestamp >= cutoff_date))
             .scalar()
         )
-        
-        return {
-            'total_messages': result or 0,
-            'days_analyzed': days_back
+
+        return {"total_messages": result or 0, "days_analyzed": days_back}
+
+
+class MoodContextSnapshotRepository:
+    """Repository for content-addressed mood context snapshots."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @staticmethod
+    def canonical_json(context: Dict[str, Any]) -> str:
+        """Encode a context deterministically so equal contexts hash equally."""
+        return json.dumps(
+            context, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+        )
+
+    def get_snapshot_by_hash(self, content_hash: str) -> Optional[MoodContextSnapshot]:
+        """Get snapshot by content hash."""
+        return (
+            self.session.query(MoodContextSnapshot)
+            .filter(MoodContextSnapshot.content_hash == content_hash)
+            .first()
+        )
+
+    def get_or_create_snapshot(self, context: Dict[str, Any]) -> MoodContextSnapshot:
+        """Return the snapshot for this context, storing it on first use."""
+        payload = self.canonical_json(context)
+        content_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+        snapshot = self.get_snapshot_by_hash(content_hash)
+        if snapshot:
+            return snapshot
+
+        values = {
+            "content_hash": content_hash,
+            "context": json.loads(payload),
+            "size_bytes": len(payload.encode("utf-8")),
         }
+        dialect = self.session.get_bind(MoodContextSnapshot.__mapper__).dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            # Concurrent writers may insert the same hash; let the unique index arbitrate
+            dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = (
+                dialect_insert(MoodContextSnapshot)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=["content_hash"])
+            )
+            self.session.execute(stmt)
+        else:
+            self.session.execute(insert(MoodContextSnapshot).values(**values))
+
+        return self.get_snapshot_by_hash(content_hash)
 
 
 class JournalRepository:
     """Repository for journal entry operations."""
-    
+
     def __init__(self, session: Session):
         self.session = session
-    
+
     def create_journal_entry(
-        self, 
-        user_id: str, 
-        content: str, 
+        self,
+        user_id: str,
+        content: str,
         title: Optional[str] = None,
         tags: Optional[str] = None,
-        is_private: bool = True
+        is_private: bool = True,
     ) -> JournalEntry:
         """Create a new journal entry."""
         # Ensure user exists
         user_repo = UserRepository(self.session)
         user_repo.create_user(user_id)
-        
+
         journal_entry = JournalEntry(
             user_id=user_id,
             content=content,
             title=title,
             tags=tags,
-            is_private=is_private
+            is_private=is_private,
+            **sentiment_columns(content),
         )
-        
+
         self.session.add(journal_entry)
         self.session.flush()
         return journal_entry
-    
-    def get_journal_entries_by_user(self, user_id: str, limit: Optional[int] = None) -> List[JournalEntry]:
+
+    def get_journal_entries_by_user(
+        self, user_id: str, limit: Optional[int] = None
+    ) -> List[JournalEntry]:
         """Get journal entries for a user."""
         query = (
             self.session.query(JournalEntry)
             .filter(JournalEntry.user_id == user_id)
             .order_by(desc(JournalEntry.timestamp))
         )
-        
+
         if limit:
             query = query.limit(limit)
-        
+
         return query.all()
-    
+
     def get_journal_entry_by_id(self, entry_id: int) -> Optional[JournalEntry]:
         """Get journal entry by ID."""
         return self.session.query(JournalEntry).filter(JournalEntry.id == entry_id).first()
-    
+
     def update_journal_entry(self, entry_id: int, **kwargs) -> Optional[JournalEntry]:
         """Update journal entry."""
         entry = self.get_journal_entry_by_id(entry_id)
         if not entry:
             return None
-        
+
         for key, value in kwargs.items():
             if hasattr(entry, key):
                 setattr(entry, key, value)
-        
+
+        if "content" in kwargs:
+            for key, value in sentiment_columns(entry.content).items():
+                setattr(entry, key, value)
+
         entry.updated_at = datetime.utcnow()
         return entry
-    
+
     def delete_journal_entry(self, entry_id: int) -> bool:
         """Delete a journal entry."""
         entry = self.get_journal_entry_by_id(entry_id)
         if not entry:
             return False
-        
+
         self.session.delete(entry)
         return True
 
@@ -321,5 +578,5 @@ def convert_mood_entry_to_schema(db_mood: MoodEntry) -> MoodEntrySchema:
         user_id=db_mood.user_id,
         mood_level=db_mood.mood_level,
         notes=db_mood.notes,
-        timestamp=db_mood.timestamp
-    )
\ No newline at end of file
+        timestamp=db_mood.timestamp,
+    )
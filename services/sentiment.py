@@ -0,0 +1,162 @@
+"""
+Local lexicon-based sentiment and emotion scoring for free text.
+
+Words from ``sentiment_lexicon.txt`` and their regular inflections are
+expanded once into a hash table of word -> (valence, emotion), so scoring a
+text is one tokenizer pass plus one dict probe per token. Negations flip the
+next few words and intensifiers scale the next one.
+
+Scores are in [-1, 1] (negative to positive); the emotion is the one with the
+most weight in the text, or None when no emotional words were found.
+"""
+
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "sentiment_lexicon.txt")
+
+NEGATIONS = frozenset(
+    {
+        "not",
+        "no",
+        "never",
+        "dont",
+        "didnt",
+        "doesnt",
+        "isnt",
+        "wasnt",
+        "cant",
+        "cannot",
+        "wont",
+        "nothing",
+        "hardly",
+    }
+)
+INTENSIFIERS = {
+    "very": 1.5,
+    "really": 1.4,
+    "so": 1.3,
+    "extremely": 1.8,
+    "too": 1.3,
+    "super": 1.5,
+    "slightly": 0.6,
+    "bit": 0.7,
+    "little": 0.7,
+}
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+# Normalization constant: total valence v maps to v / sqrt(v^2 + ALPHA)
+ALPHA = 15.0
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class SentimentScore(NamedTuple):
+    score: float
+    emotion: Optional[str]
+
+
+def _inflections(word: str) -> Iterable[str]:
+    yield word
+    yield word + "s"
+    yield word + "ly"
+    if word.endswith("e"):
+        yield word + "d"
+        yield word[:-1] + "ing"
+    else:
+        yield word + "ed"
+        yield word + "ing"
+
+
+def build_table(path: str = DEFAULT_LEXICON_PATH) -> Dict[str, Tuple[float, Optional[str]]]:
+    """Read the lexicon and expand it into the word -> (valence, emotion) lookup table."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            word, valence, emotion = line.split()
+            entries.append((word, float(valence), None if emotion == "-" else emotion))
+
+    table: Dict[str, Tuple[float, Optional[str]]] = {}
+    # Generated inflections first so explicitly listed forms always win
+    for word, valence, emotion in entries:
+        for form in _inflections(word):
+            table.setdefault(form, (valence, emotion))
+    for word, valence, emotion in entries:
+        table[word] = (valence, emotion)
+    return table
+
+
+_table: Optional[Dict[str, Tuple[float, Optional[str]]]] = None
+_table_lock = threading.Lock()
+
+
+def get_table() -> Dict[str, Tuple[float, Optional[str]]]:
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = build_table()
+    return _table
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.replace("'", "") for token in _TOKEN.findall(text.lower())]
+
+
+def score_text(
+    text: Optional[str], table: Optional[Dict[str, Tuple[float, Optional[str]]]] = None
+) -> Optional[SentimentScore]:
+    """Score one text; None for empty input."""
+    if not text:
+        return None
+    table = table if table is not None else get_table()
+
+    total = 0.0
+    emotions: Dict[str, float] = {}
+    negated = 0
+    boost = 1.0
+    for token in tokenize(text):
+        if token in NEGATIONS:
+            negated = NEGATION_SCOPE
+            continue
+        factor = INTENSIFIERS.get(token)
+        if factor is not None:
+            boost = factor
+            continue
+        entry = table.get(token)
+        if entry is not None:
+            valence = entry[0] * boost
+            if negated:
+                # "not happy" is negative, but a negated emotion word says little about the emotion felt
+                total += valence * NEGATION_FACTOR
+            else:
+                total += valence
+                if entry[1] is not None:
+                    emotions[entry[1]] = emotions.get(entry[1], 0.0) + abs(valence)
+        boost = 1.0
+        if negated:
+            negated -= 1
+
+    score = total / math.sqrt(total * total + ALPHA) if total else 0.0
+    emotion = max(emotions, key=emotions.get) if emotions else None
+    return SentimentScore(round(score, 4), emotion)
+
+
+def score_batch(texts: Sequence[Optional[str]]) -> List[Optional[SentimentScore]]:
+    """Score many texts with a single table lookup; picklable for process pools."""
+    table = get_table()
+    return [score_text(text, table) for text in texts]
+
+
+def sentiment_columns(text: Optional[str]) -> Dict[str, object]:
+    """Column values (``sentiment_score``, ``emotion``) for a row holding ``text``."""
+    result = score_text(text)
+    if result is None:
+        return {"sentiment_score": None, "emotion": None}
+    return {"sentiment_score": result.score, "emotion": result.emotion}
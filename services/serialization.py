@@ -0,0 +1,211 @@
+"""
+Fast JSON encoding for read-heavy endpoints.
+
+History endpoints select plain column tuples and encode them straight to bytes,
+skipping ORM objects and pydantic validation. Output matches what the pydantic
+and ``jsonable_encoder`` paths produce for the same rows.
+
+The same rows can also be encoded as MessagePack for clients that ask for it:
+field names are sent once (``fields``) with one array per row, and timestamps
+are epoch seconds instead of ISO strings.
+"""
+
+import json
+import struct
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised via monkeypatch in tests
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Column order of the row tuples selected by the repositories
+MOOD_HISTORY_FIELDS = ("user_id", "mood_level", "notes", "timestamp")
+CHAT_HISTORY_FIELDS = ("id", "message", "response", "timestamp", "ai_provider", "ai_model")
+CHAT_HISTORY_COMPACT_FIELDS = tuple(field for field in CHAT_HISTORY_FIELDS if field != "response")
+
+
+def _isoformat(value: datetime, utc_z: bool) -> str:
+    encoded = value.isoformat()
+    if utc_z and encoded.endswith("+00:00"):
+        return encoded[:-6] + "Z"
+    return encoded
+
+
+def dumps(obj: Any, utc_z: bool = False) -> bytes:
+    """Encode to compact UTF-8 JSON bytes.
+
+    ``utc_z`` renders UTC datetimes with a ``Z`` suffix like pydantic does;
+    without it they keep ``+00:00`` like FastAPI's ``jsonable_encoder``.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z if utc_z else 0)
+
+    def default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return _isoformat(value, utc_z)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def rows_to_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> list:
+    """Pair selected column tuples with their field names."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def encode_mood_history(user_id: Optional[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """Encode mood history rows in the ``MoodResponse`` shape."""
+    return dumps(
+        {"user_id": user_id, "moods": rows_to_dicts(MOOD_HISTORY_FIELDS, rows)},
+        utc_z=True,
+    )
+
+
+def encode_chat_history(
+    user_id: str,
+    rows: Iterable[Sequence[Any]],
+    compact: bool = False,
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """Encode chat history rows in the ``/api/chat/history`` shape."""
+    fields = CHAT_HISTORY_COMPACT_FIELDS if compact else CHAT_HISTORY_FIELDS
+    return dumps(
+        {"user_id": user_id, "messages": rows_to_dicts(fields, rows), "next_cursor": next_cursor}
+    )
+
+
+def _epoch(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)  # SQLite returns naive UTC
+        return value.timestamp()
+    return value
+
+
+def _pack_into(out: bytearray, obj: Any) -> None:
+    """Pure-Python MessagePack encoder, byte-for-byte what ``msgpack.packb`` produces for these types."""
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True or obj is False:
+        out.append(0xC3 if obj else 0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif obj >= 0:
+            for marker, fmt, limit in (
+                (0xCC, ">B", 0xFF),
+                (0xCD, ">H", 0xFFFF),
+                (0xCE, ">I", 0xFFFFFFFF),
+            ):
+                if obj <= limit:
+                    out += bytes((marker,)) + struct.pack(fmt, obj)
+                    break
+            else:
+                out += b"\xcf" + struct.pack(">Q", obj)
+        else:
+            for marker, fmt, limit in (
+                (0xD0, ">b", -0x80),
+                (0xD1, ">h", -0x8000),
+                (0xD2, ">i", -0x80000000),
+            ):
+                if obj >= limit:
+                    out += bytes((marker,)) + struct.pack(fmt, obj)
+                    break
+            else:
+                out += b"\xd3" + struct.pack(">q", obj)
+    elif isinstance(obj, float):
+        out += b"\xcb" + struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(0xA0 | size)
+        elif size <= 0xFF:
+            out += bytes((0xD9, size))
+        elif size <= 0xFFFF:
+            out += b"\xda" + struct.pack(">H", size)
+        else:
+            out += b"\xdb" + struct.pack(">I", size)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(out, len(obj), 0x90, 0xDC)
+        for item in obj:
+            _pack_into(out, item)
+    elif isinstance(obj, dict):
+        _pack_header(out, len(obj), 0x80, 0xDE)
+        for key, value in obj.items():
+            _pack_into(out, key)
+            _pack_into(out, value)
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+def _pack_header(out: bytearray, size: int, fix: int, marker16: int) -> None:
+    if size < 16:
+        out.append(fix | size)
+    elif size <= 0xFFFF:
+        out += bytes((marker16,)) + struct.pack(">H", size)
+    else:
+        out += bytes((marker16 + 1,)) + struct.pack(">I", size)
+
+
+def packb(obj: Any) -> bytes:
+    """Encode to MessagePack; uses the ``msgpack`` extension when it is installed."""
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack_into(out, obj)
+    return bytes(out)
+
+
+def _msgpack_rows(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> list:
+    timestamp = fields.index("timestamp")
+    packed = []
+    for row in rows:
+        row = list(row)
+        row[timestamp] = _epoch(row[timestamp])
+        packed.append(row)
+    return packed
+
+
+def encode_mood_history_msgpack(user_id: Optional[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """MessagePack mood history: ``fields`` once, one array per entry, epoch timestamps."""
+    return packb(
+        {
+            "user_id": user_id,
+            "fields": MOOD_HISTORY_FIELDS,
+            "moods": _msgpack_rows(MOOD_HISTORY_FIELDS, rows),
+        }
+    )
+
+
+def encode_chat_history_msgpack(
+    user_id: str,
+    rows: Iterable[Sequence[Any]],
+    compact: bool = False,
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """MessagePack chat history: ``fields`` once, one array per message, epoch timestamps."""
+    fields = CHAT_HISTORY_COMPACT_FIELDS if compact else CHAT_HISTORY_FIELDS
+    return packb(
+        {
+            "user_id": user_id,
+            "fields": fields,
+            "messages": _msgpack_rows(fields, rows),
+            "next_cursor": next_cursor,
+        }
+    )
@@ -0,0 +1,388 @@
+"""
+Consistent-hash user sharding across several databases.
+
+With DATABASE_SHARDS set ("a=sqlite:///a.db,b=postgresql://..."), every
+user_id is placed on a hash ring with SHARD_VNODES virtual nodes per shard and
+all of that user's rows live in that shard's database. Sessions are
+SQLAlchemy ``ShardedSession`` objects whose choosers route:
+
+- inserts and flushes by the instance's ``user_id``;
+- queries, updates and deletes by ``user_id == ...`` / ``user_id IN (...)``
+  criteria, falling back to every shard (scatter) when there are none;
+- rows without a user (mood context snapshots) to the shard of the user the
+  session was routed to with ``route_to_user``.
+
+Cross-user reads merge the per-shard ordered results (``scatter_gather``).
+``reshard`` moves users whose shard changes between two configurations.
+"""
+
+import hashlib
+import heapq
+import logging
+from bisect import bisect_right
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import operators, visitors
+
+from models.database import (
+    Base,
+    ChatMessage,
+    ExerciseSession,
+    JournalEntry,
+    MoodAlert,
+    MoodChangeState,
+    MoodContextSnapshot,
+    MoodEntry,
+    MusicSession,
+    SyncChange,
+    User,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-user tables in insert order (parents first); every one has a user_id column
+USER_TABLES = (
+    User,
+    MoodEntry,
+    JournalEntry,
+    ExerciseSession,
+    MusicSession,
+    ChatMessage,
+    MoodChangeState,
+    MoodAlert,
+)
+# Session.info keys: the user whose shard holds rows that carry no user_id, and all shard names
+ROUTED_USER = "shard_user_id"
+SHARD_IDS = "shard_ids"
+# Session.info flag: rows are being moved between shards, not changed; the outbox and sync log hooks skip them
+RESHARD_COPY = "shard_reshard_copy"
+
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """``name=url`` pairs (or bare URLs, named shard0, shard1, ...) separated by commas."""
+    shards: Dict[str, str] = {}
+    for index, item in enumerate(part.strip() for part in value.split(",")):
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        # URLs may contain "=" in their query string; a name never contains "://"
+        if not sep or "://" in name:
+            name, url = f"shard{index}", item
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring: adding or removing a shard moves only ~1/N of the users."""
+
+    def __init__(self, shard_names: Iterable[str], vnodes: int = 256):
+        self.shard_names = sorted(shard_names)
+        if not self.shard_names:
+            raise ValueError("A hash ring needs at least one shard")
+        points = sorted(
+            (_hash(f"{name}#{i}"), name) for name in self.shard_names for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, user_id: str) -> str:
+        index = bisect_right(self._hashes, _hash(user_id))
+        return self._names[index % len(self._names)]
+
+
+def _user_ids_in(statement: Any) -> Optional[Set[str]]:
+    """User ids a statement is restricted to by equality/IN criteria, or None when it is not."""
+    where = getattr(statement, "whereclause", None)
+    if where is None:
+        return None
+    found: Set[str] = set()
+    unroutable = False
+
+    def visit_binary(binary):
+        nonlocal unroutable
+        left = binary.left
+        if getattr(left, "name", None) != "user_id" or not hasattr(left, "table"):
+            return
+        value = getattr(binary.right, "effective_value", None)
+        if binary.operator == operators.eq and isinstance(value, str):
+            found.add(value)
+        elif binary.operator == operators.in_op and isinstance(value, (list, tuple)):
+            found.update(value)
+        else:
+            unroutable = True
+
+    visitors.traverse(where, {}, {"binary": visit_binary})
+    return None if unroutable or not found else found
+
+
+class ShardRouter:
+    """Routing callbacks for ``ShardedSession``."""
+
+    def __init__(self, ring: HashRing):
+        self.ring = ring
+
+    def shard_for(self, user_id: str) -> str:
+        return self.ring.shard_for(user_id)
+
+    def _routed_shard(self, session: Optional[Session]) -> Optional[str]:
+        user_id = session.info.get(ROUTED_USER) if session is not None else None
+        return self.shard_for(user_id) if user_id else None
+
+    def shard_chooser(self, mapper, instance, clause=None, **kw) -> str:
+        user_id = getattr(instance, "user_id", None)
+        if user_id:
+            return self.shard_for(user_id)
+        shard = self._routed_shard(
+            Session.object_session(instance) if instance is not None else None
+        )
+        if shard is not None:
+            return shard
+        if instance is None:
+            # get_bind(Model.__mapper__) for dialect checks: shards share one backend
+            return self.ring.shard_names[0]
+        raise ValueError(f"No shard for {mapper.class_.__name__} rows: call route_to_user() first")
+
+    def identity_chooser(
+        self,
+        mapper,
+        primary_key,
+        *,
+        lazy_loaded_from=None,
+        execution_options=None,
+        bind_arguments=None,
+        **kw,
+    ) -> List[str]:
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        if mapper.primary_key[0].name == "user_id":
+            return [self.shard_for(primary_key[0])]
+        return list(self.ring.shard_names)
+
+    def execute_chooser(self, orm_context) -> List[str]:
+        if orm_context.is_select and orm_context.lazy_loaded_from is not None:
+            return [orm_context.lazy_loaded_from.identity_token]
+        user_ids = _user_ids_in(orm_context.statement)
+        if user_ids:
+            return sorted({self.shard_for(user_id) for user_id in user_ids})
+        shard = self._routed_shard(orm_context.session)
+        if orm_context.is_insert:
+            if shard is None:
+                raise ValueError("INSERT statements need route_to_user() under sharding")
+            return [shard]
+        if shard is not None and (
+            not orm_context.is_select or _only_unowned_tables(orm_context.statement)
+        ):
+            return [shard]
+        return list(self.ring.shard_names)
+
+    def session_kwargs(self, engines: Dict[str, Engine]) -> Dict[str, Any]:
+        return {
+            "class_": ShardedSession,
+            "shards": engines,
+            "shard_chooser": self.shard_chooser,
+            "identity_chooser": self.identity_chooser,
+            "execute_chooser": self.execute_chooser,
+            "info": {SHARD_IDS: list(self.ring.shard_names)},
+        }
+
+
+def _only_unowned_tables(statement: Any) -> bool:
+    """True for statements that only read tables without a user_id column (snapshots)."""
+    tables = getattr(statement, "get_final_froms", lambda: [])()
+    return bool(tables) and all("user_id" not in getattr(table, "c", {}) for table in tables)
+
+
+def route_to_user(session: Session, user_id: str) -> None:
+    """Send rows without a user_id written or read by this session to ``user_id``'s shard."""
+    session.info[ROUTED_USER] = user_id
+
+
+def is_sharded(session: Session) -> bool:
+    return isinstance(session, ShardedSession)
+
+
+def scatter_gather(
+    query: Query, key: Callable[[Any], Any], limit: Optional[int] = None, reverse: bool = False
+) -> list:
+    """Run a cross-user query on every shard and merge the per-shard ordered results.
+
+    Each shard applies the query's own ORDER BY/LIMIT, so the merged top ``limit``
+    rows are the global ones. Without sharding this is just ``query.all()``.
+    """
+    session = query.session
+    if not is_sharded(session):
+        return query.all()
+    partials = [query.set_shard(shard_id).all() for shard_id in session.info[SHARD_IDS]]
+    merged = heapq.merge(*partials, key=key, reverse=reverse)
+    return list(islice(merged, limit)) if limit else list(merged)
+
+
+def _row_values(row: Any, skip: Sequence[str] = ()) -> Dict[str, Any]:
+    return {
+        column.key: getattr(row, column.key)
+        for column in row.__mapper__.column_attrs
+        if column.key not in skip
+    }
+
+
+def _copy_user(user_id: str, source: Session, target: Session) -> int:
+    """Copy one user's rows into ``target``, renumbering integer ids; returns rows copied.
+
+    The copies are logged as sync upserts under their new ids. ``target`` must
+    carry ``RESHARD_COPY``, so the flush hooks neither log them again nor
+    announce them as created.
+    """
+    from services.sync import ENTITY_BY_MODEL, UPSERT
+
+    copied = 0
+    synced: List[Any] = []
+    entry_ids: Dict[int, int] = {}
+    snapshot_ids: Dict[int, int] = {}
+    for model in USER_TABLES:
+        rows = (
+            source.query(model)
+            .filter(model.user_id == user_id)
+            .order_by(*model.__mapper__.primary_key)
+            .all()
+        )
+        integer_key = model.__mapper__.primary_key[0].name == "id"
+        for row in rows:
+            values = _row_values(row, skip=("id",) if integer_key else ())
+            if model is ChatMessage and row.mood_context_snapshot_id is not None:
+                values["mood_context_snapshot_id"] = _copy_snapshot(
+                    row.mood_context_snapshot_id, source, target, snapshot_ids
+                )
+            if model is MoodAlert and row.mood_entry_id is not None:
+                values["mood_entry_id"] = entry_ids.get(row.mood_entry_id)
+            if model is MoodChangeState and row.last_entry_id is not None:
+                values["last_entry_id"] = entry_ids.get(row.last_entry_id)
+            clone = model(**values)
+            target.add(clone)
+            if model is MoodEntry:
+                target.flush()
+                entry_ids[row.id] = clone.id
+            if model in ENTITY_BY_MODEL:
+                synced.append(clone)
+            copied += 1
+        target.flush()
+    if synced:
+        upserts = [
+            {
+                "user_id": user_id,
+                "entity": ENTITY_BY_MODEL[type(clone)],
+                "row_id": clone.id,
+                "op": UPSERT,
+            }
+            for clone in synced
+        ]
+        target.execute(insert(SyncChange.__table__), upserts)
+    return copied
+
+
+def _copy_snapshot(
+    snapshot_id: int, source: Session, target: Session, copied: Dict[int, int]
+) -> int:
+    if snapshot_id not in copied:
+        snapshot = source.get(MoodContextSnapshot, snapshot_id)
+        existing = (
+            target.query(MoodContextSnapshot.id)
+            .filter(MoodContextSnapshot.content_hash == snapshot.content_hash)
+            .scalar()
+        )
+        if existing is None:
+            clone = MoodContextSnapshot(**_row_values(snapshot, skip=("id",)))
+            target.add(clone)
+            target.flush()
+            existing = clone.id
+        copied[snapshot_id] = existing
+    return copied[snapshot_id]
+
+
+def _delete_user(user_id: str, session: Session) -> None:
+    # Bulk deletes bypass the sync hook: log a tombstone per synced row before the rows go
+    from services.sync import DELETE, ENTITY_BY_MODEL
+
+    tombstones = [
+        {"user_id": user_id, "entity": entity, "row_id": row_id, "op": DELETE}
+        for model, entity in ENTITY_BY_MODEL.items()
+        for (row_id,) in session.query(model.id).filter(model.user_id == user_id).order_by(model.id)
+    ]
+    if tombstones:
+        session.execute(insert(SyncChange.__table__), tombstones)
+    for model in reversed(USER_TABLES):
+        session.query(model).filter(model.user_id == user_id).delete(synchronize_session=False)
+
+
+def reshard(
+    source_urls: Dict[str, str],
+    target_urls: Dict[str, str],
+    vnodes: int = 256,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Move every user whose shard differs between two configurations.
+
+    Each user is copied and committed on the new shard before being deleted
+    from the old one, so an interrupted run can simply be repeated: users
+    already present on their new shard are only deleted from the old one.
+    A move is not a change: it writes no outbox events, only sync upserts for
+    the copies and tombstones for the originals. Run it while writes are
+    paused, then switch DATABASE_SHARDS.
+    """
+    engines: Dict[str, Engine] = {}
+
+    def engine_for(url: str) -> Engine:
+        if url not in engines:
+            engines[url] = create_engine(url)
+        return engines[url]
+
+    source_ring = HashRing(source_urls, vnodes)
+    target_ring = HashRing(target_urls, vnodes)
+    for url in target_urls.values():
+        Base.metadata.create_all(bind=engine_for(url))
+
+    # List users before moving any, so users moved onto a later source shard are not revisited
+    placements = {}
+    for name, url in source_urls.items():
+        with Session(engine_for(url)) as source:
+            placements[name] = [
+                user_id for (user_id,) in source.query(User.user_id).order_by(User.user_id)
+            ]
+
+    report = {"users_checked": 0, "users_moved": 0, "rows_moved": 0}
+    for name, user_ids in placements.items():
+        url = source_urls[name]
+        with Session(engine_for(url)) as source:
+            for user_id in user_ids:
+                report["users_checked"] += 1
+                destination = target_ring.shard_for(user_id)
+                if target_urls[destination] == url:
+                    continue
+                if source_ring.shard_for(user_id) != name:
+                    logger.warning(
+                        f"User {user_id} is on shard {name} but hashes to {source_ring.shard_for(user_id)}"
+                    )
+                report["users_moved"] += 1
+                if dry_run:
+                    continue
+                with Session(
+                    engine_for(target_urls[destination]), info={RESHARD_COPY: True}
+                ) as target:
+                    if target.query(User.id).filter(User.user_id == user_id).first() is None:
+                        report["rows_moved"] += _copy_user(user_id, source, target)
+                        target.commit()
+                _delete_user(user_id, source)
+                source.commit()
+        logger.info(f"Shard {name}: checked {len(user_ids)} users")
+
+    for engine in engines.values():
+        engine.dispose()
+    return report
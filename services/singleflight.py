@@ -0,0 +1,70 @@
+"""
+Request coalescing ("singleflight") for identical concurrent reads.
+
+The first caller for a key runs the computation; callers arriving while it
+is in flight wait for and share its result (or its exception) instead of
+repeating the same query. Route handlers run in the threadpool, so waiting
+uses threading primitives.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from services.metrics import metrics
+
+metrics.describe(
+    "singleflight_requests_total",
+    "counter",
+    "Reads by kind, as leader (computed) or coalesced (shared).",
+)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], kind: str = "default") -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc("singleflight_requests_total", (("kind", kind), ("role", "coalesced")))
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc("singleflight_requests_total", (("kind", kind), ("role", "leader")))
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# Global group shared by the read routes
+singleflight = SingleFlight()
@@ -0,0 +1,108 @@
+"""
+Application startup: eager initialization and cold-start reporting.
+
+Work that would otherwise land on the first request after a deploy (engine
+creation, schema checks, connection setup, agent preparation) runs once in
+the FastAPI lifespan, and each phase is timed so cold start can be tracked
+against ``STARTUP_TARGET_MS``.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from services.config import settings
+from services.crisis import get_detector
+from services.database import db_config, init_db
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("app_startup_seconds", "gauge", "Duration of each startup phase.")
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux only), covering interpreter and import time."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesized command name; starttime is field 22 overall
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupReport:
+    """Ordered timings of startup phases."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def as_dict(self) -> Dict[str, float]:
+        report = {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+        report["total"] = round(self.total * 1000, 2)
+        return report
+
+    def log(self) -> None:
+        breakdown = ", ".join(f"{name}={ms}ms" for name, ms in self.as_dict().items())
+        if self.total * 1000 > settings.STARTUP_TARGET_MS:
+            logger.warning(
+                f"Startup exceeded target of {settings.STARTUP_TARGET_MS:.0f}ms: {breakdown}"
+            )
+        else:
+            logger.info(f"Startup completed: {breakdown}")
+        for name, seconds in self.phases.items():
+            metrics.set_gauge("app_startup_seconds", seconds, (("phase", name),))
+        metrics.set_gauge("app_startup_seconds", self.total, (("phase", "total"),))
+
+
+def warm_up(agent) -> StartupReport:
+    """Initialize everything the first request would otherwise pay for."""
+    report = StartupReport()
+
+    # Interpreter start, server and application imports up to the lifespan
+    age = process_age()
+    if age is not None:
+        report.phases["process_and_imports"] = age
+
+    with report.phase("database"):
+        if db_config.engine is None:
+            init_db(create_tables=False)
+    if settings.DB_CREATE_TABLES:
+        with report.phase("create_tables"):
+            db_config.create_tables()
+
+    with report.phase("connection_pool"):
+        warmed = db_config.warm_pool(settings.DB_WARM_CONNECTIONS)
+    logger.debug(f"Pre-warmed {warmed} pooled connections")
+
+    with report.phase("agent"):
+        agent.warm_up()
+
+    with report.phase("crisis_detector"):
+        get_detector()
+
+    report.log()
+    return report
+
+
+def shutdown() -> None:
+    """Release pooled connections on shutdown."""
+    for engine in db_config.engines.values():
+        engine.dispose()
@@ -0,0 +1,169 @@
+"""
+Change log for delta sync (/api/sync).
+
+Every flush that inserts, updates or deletes a mood entry, journal entry,
+exercise session or music session appends (user_id, entity, row_id, op) to
+``sync_changes`` in the same transaction, so the log can never disagree with
+the data. The log's autoincrement id is the change sequence: a client that
+has seen sequence N asks for ``user_id = ? AND id > N`` through
+ix_sync_changes_user_id_id and gets only what changed since, with deletes as
+tombstones. Reads stop at the commit watermark (services/watermark.py): a
+cursor is never handed out past an id whose transaction may still commit, or
+that change would be skipped by the next sync.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, insert, inspect, literal, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.database import ExerciseSession, JournalEntry, MoodEntry, MusicSession, SyncChange
+from services.metrics import metrics
+from services.sharding import RESHARD_COPY, is_sharded
+from services.watermark import CommitWatermark
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "sync_changes_recorded_total",
+    "counter",
+    "Rows appended to the sync change log, by entity and op.",
+)
+
+SYNC_MODELS = {
+    "mood": MoodEntry,
+    "journal": JournalEntry,
+    "exercise": ExerciseSession,
+    "music": MusicSession,
+}
+ENTITY_BY_MODEL = {model: entity for entity, model in SYNC_MODELS.items()}
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Highest sequence per database that no open transaction can still write below
+_watermark = CommitWatermark(SyncChange.__table__, "changed_at")
+
+
+def _pending_changes(session: Session) -> Dict[Optional[str], List[dict]]:
+    """Change rows for the synced instances in this flush, grouped by shard (None when unsharded)."""
+    changes: Dict[Optional[str], List[dict]] = {}
+    candidates = [(instance, UPSERT) for instance in session.new]
+    candidates += [
+        (instance, UPSERT)
+        for instance in session.dirty
+        if session.is_modified(instance, include_collections=False)
+    ]
+    candidates += [(instance, DELETE) for instance in session.deleted]
+    for instance, op in candidates:
+        entity = ENTITY_BY_MODEL.get(type(instance))
+        if entity is None or instance.id is None:
+            continue
+        shard = inspect(instance).identity_token
+        changes.setdefault(shard, []).append(
+            {"user_id": instance.user_id, "entity": entity, "row_id": instance.id, "op": op}
+        )
+    return changes
+
+
+@event.listens_for(Session, "after_flush")
+def _record_sync_changes(session: Session, flush_context) -> None:
+    if session.info.get(RESHARD_COPY):
+        return  # reshard logs the move itself
+    for shard, rows in _pending_changes(session).items():
+        # Core insert on the flush's own connection: same transaction, no second flush
+        bind_arguments = (
+            {"shard_id": shard} if shard is not None else {"mapper": SyncChange.__mapper__}
+        )
+        session.connection(bind_arguments=bind_arguments).execute(
+            insert(SyncChange.__table__), rows
+        )
+        for row in rows:
+            metrics.inc(
+                "sync_changes_recorded_total", (("entity", row["entity"]), ("op", row["op"]))
+            )
+
+
+def _log_connection(session: Session, shard: str) -> Connection:
+    bind_arguments = (
+        {"shard_id": shard} if is_sharded(session) else {"mapper": SyncChange.__mapper__}
+    )
+    return session.connection(bind_arguments=bind_arguments)
+
+
+def read_changes(
+    session: Session, user_id: str, after: int, limit: int, shard: str
+) -> Tuple[List[dict], int, bool]:
+    """Up to ``limit`` log entries after sequence ``after``, collapsed to each row's latest state.
+
+    Returns (changes, last sequence read, has_more). Each change is
+    ``{"seq", "type", "op", "id"}`` plus ``"data"`` (all columns) for upserts;
+    upserted rows that no longer exist are reported as deletes. Entries
+    above the watermark of ``shard`` wait for a later sync.
+    """
+    horizon = _watermark.horizon(_log_connection(session, shard))
+    log = (
+        session.query(SyncChange.id, SyncChange.entity, SyncChange.row_id, SyncChange.op)
+        .filter(SyncChange.user_id == user_id, SyncChange.id > after, SyncChange.id <= horizon)
+        .order_by(SyncChange.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(log) > limit
+    log = log[:limit]
+
+    # Latest op per row, ordered by the sequence of that op
+    latest: Dict[Tuple[str, int], Tuple[int, str]] = {}
+    for seq, entity, row_id, op in log:
+        latest.pop((entity, row_id), None)
+        latest[(entity, row_id)] = (seq, op)
+
+    rows: Dict[Tuple[str, int], dict] = {}
+    for entity, model in SYNC_MODELS.items():
+        ids = [
+            row_id for (kind, row_id), (_, op) in latest.items() if kind == entity and op == UPSERT
+        ]
+        if ids:
+            query = session.query(*model.__table__.columns).filter(
+                model.user_id == user_id, model.id.in_(ids)
+            )
+            rows.update(((entity, row.id), row._asdict()) for row in query)
+
+    changes = []
+    for (entity, row_id), (seq, op) in latest.items():
+        data = rows.get((entity, row_id)) if op == UPSERT else None
+        change = {"seq": seq, "type": entity, "op": UPSERT if data else DELETE, "id": row_id}
+        if data:
+            change["data"] = data
+        changes.append(change)
+    return changes, (log[-1].id if log else after), has_more
+
+
+def seed_sync_changes(session: Session) -> Dict[str, int]:
+    """Log rows written before the change log existed so a first sync returns them.
+
+    Rows with no log entry at all are seeded. An old row that was updated
+    after the log existed already has an entry, and older ids than it may
+    not. Running this again logs nothing.
+    """
+    report = {}
+    log = SyncChange.__table__
+    for entity, model in SYNC_MODELS.items():
+        # Correlated on user_id as well, so each probe is a range of ix_sync_changes_user_id_id
+        logged = select(SyncChange.id).where(
+            SyncChange.user_id == model.user_id,
+            SyncChange.entity == entity,
+            SyncChange.row_id == model.id,
+        )
+        unlogged = (
+            select(model.user_id, literal(entity), model.id, literal(UPSERT))
+            .where(~logged.exists())
+            .order_by(model.id)
+        )
+        result = session.execute(
+            insert(log).from_select(["user_id", "entity", "row_id", "op"], unlogged)
+        )
+        report[entity] = result.rowcount
+        logger.info(f"Sync log: seeded {result.rowcount} {entity} rows")
+    return report
@@ -0,0 +1,114 @@
+"""
+Commit watermarks for append-only tables read in id order (outbox_events, sync_changes).
+
+Ids are assigned when a transaction flushes, not when it commits. On
+databases with concurrent writers (PostgreSQL) a transaction can still hold
+id N while id N + 1 is already committed and visible; a reader that moved its
+position past N + 1 would never see N. ``CommitWatermark.horizon`` returns the
+highest id below which no such hole remains. A hole is waited for until it has
+been visible for SEQUENCE_GAP_SECONDS (longer than any write transaction), and
+is then treated as a rolled-back insert. SQLite serializes writers, so holes
+there are rare (only rolled-back inserts into AUTOINCREMENT tables).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import Table, select
+from sqlalchemy.engine import Connection
+
+from services.config import settings
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "sequence_gaps_skipped_total",
+    "counter",
+    "Id holes treated as rolled back after the wait, by table.",
+)
+
+# Ids examined per call; a backlog larger than this is caught up over several calls
+SCAN_LIMIT = 1000
+# Server timestamps may be truncated to whole seconds (SQLite CURRENT_TIMESTAMP)
+TIMESTAMP_SLACK_SECONDS = 1
+
+
+class _State:
+    __slots__ = ("safe", "gaps")
+
+    def __init__(self, safe: int):
+        self.safe = safe
+        self.gaps: Dict[int, float] = {}  # First missing id -> when the hole was first seen
+
+
+class CommitWatermark:
+    """Tracks, per database, the highest id of ``table`` that no uncommitted transaction can undercut."""
+
+    def __init__(self, table: Table, time_column: str):
+        self.table = table
+        self.id_column = table.c.id
+        self.time_column = table.c[time_column]
+        self._lock = threading.Lock()
+        self._states: Dict[str, _State] = {}
+
+    def horizon(self, connection: Connection) -> int:
+        """Highest id that is safe to read up to (inclusive) on ``connection``'s database."""
+        key = str(connection.engine.url)
+        with self._lock:
+            state = self._states.get(key)
+        if state is None:
+            initial = _State(self._initial(connection))
+            with self._lock:
+                state = self._states.setdefault(key, initial)
+
+        start = state.safe
+        ids = (
+            connection.execute(
+                select(self.id_column)
+                .where(self.id_column > start)
+                .order_by(self.id_column)
+                .limit(SCAN_LIMIT)
+            )
+            .scalars()
+            .all()
+        )
+
+        now = time.monotonic()
+        with self._lock:
+            safe = max(start, state.safe)
+            for id_ in ids:
+                if id_ <= safe:
+                    continue
+                if id_ != safe + 1:
+                    first_seen = state.gaps.setdefault(safe + 1, now)
+                    if now - first_seen < settings.SEQUENCE_GAP_SECONDS:
+                        break  # A transaction may still commit into the hole
+                    metrics.inc("sequence_gaps_skipped_total", (("table", self.table.name),))
+                    logger.warning(
+                        f"{self.table.name}: ids {safe + 1}-{id_ - 1} never committed; skipping them"
+                    )
+                safe = id_
+            state.safe = safe
+            state.gaps = {missing: seen for missing, seen in state.gaps.items() if missing > safe}
+            return safe
+
+    def reset(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def _initial(self, connection: Connection) -> int:
+        """Start from the newest id written longer ago than any transaction can stay open."""
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=settings.SEQUENCE_GAP_SECONDS + TIMESTAMP_SLACK_SECONDS
+        )
+        newest_old = connection.execute(
+            select(self.id_column)
+            .where(self.time_column < cutoff)
+            .order_by(self.id_column.desc())
+            .limit(1)
+        ).scalar()
+        return newest_old or 0
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import routes.chat
+from app import app
+from services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    ConcurrencyLimiter,
+    MemoryRateLimiter,
+    RedisRateLimiter,
+)
+from services.crisis import is_crisis_message
+
+client = TestClient(app)
+
+
+def _controller(user_burst=2, ip_burst=100, max_concurrent=4, max_wait=0.05):
+    return AdmissionController(
+        MemoryRateLimiter(rate=0.01, burst=user_burst),
+        MemoryRateLimiter(rate=0.01, burst=ip_burst),
+        ConcurrencyLimiter(max_concurrent, max_wait),
+    )
+
+
+def test_token_bucket_allows_burst_then_limits():
+    """Test that a bucket admits its burst and then reports a retry delay."""
+    limiter = MemoryRateLimiter(rate=1, burst=3)
+
+    assert [limiter.acquire("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0 < limiter.acquire("k") <= 1.0
+    assert limiter.acquire("other") == 0.0
+
+
+def test_redis_rate_limiter_shares_state():
+    """Test that two limiters on one Redis draw from the same bucket."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first = RedisRateLimiter(fakeredis.FakeRedis(server=server), rate=1, burst=2)
+    second = RedisRateLimiter(fakeredis.FakeRedis(server=server), rate=1, burst=2)
+
+    assert first.acquire("user:a") == 0.0
+    assert second.acquire("user:a") == 0.0
+    assert first.acquire("user:a") > 0
+
+
+def test_concurrency_limiter_sheds_after_wait_budget():
+    """Test that a request waiting longer than the budget is rejected with 503."""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_wait=0.05)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot():
+            entered.set()
+            release.wait()
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    entered.wait()
+    try:
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with limiter.slot():
+                pass
+        assert excinfo.value.status_code == 503
+
+        with limiter.slot(bypass=True):
+            assert limiter.inflight == 2
+    finally:
+        release.set()
+        worker.join()
+
+
+def test_crisis_detection_normalizes_text():
+    """Test that crisis terms match regardless of case and punctuation."""
+    assert is_crisis_message("I keep thinking about SELF-HARM lately")
+    assert is_crisis_message("honestly i want to die.")
+    assert not is_crisis_message("this homework is killing me")
+
+
+def test_chat_rate_limited_per_user(monkeypatch):
+    """Test that /api/chat returns 429 with Retry-After once a user's bucket is empty."""
+    monkeypatch.setattr(routes.chat, "admission", _controller(user_burst=2))
+    payload = {"message": "hello", "user_id": "rate_limited_user"}
+
+    statuses = [client.post("/api/chat", json=payload).status_code for _ in range(3)]
+    response = client.post("/api/chat", json=payload)
+
+    assert statuses == [200, 200, 429]
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_crisis_message_bypasses_limits(monkeypatch):
+    """Test that a crisis message is answered even when the user is rate limited."""
+    monkeypatch.setattr(routes.chat, "admission", _controller(user_burst=1))
+    user_id = "crisis_bypass_user"
+    client.post("/api/chat", json={"message": "hello", "user_id": user_id})
+
+    limited = client.post("/api/chat", json={"message": "hello again", "user_id": user_id})
+    crisis = client.post("/api/chat", json={"message": "I want to end my life", "user_id": user_id})
+
+    assert limited.status_code == 429
+    assert crisis.status_code == 200
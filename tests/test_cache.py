@@ -0,0 +1,88 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from services.cache import Cache, MemoryBackend, RedisBackend, cache
+
+client = TestClient(app)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    """Test that the LRU drops the entry touched longest ago."""
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1", 60, "ns")
+    backend.set("b", b"2", 60, "ns")
+    backend.get("a")
+    backend.set("c", b"3", 60, "ns")
+
+    assert backend.get("a") == b"1"
+    assert backend.get("b") is None
+    assert len(backend) == 2
+
+
+def test_memory_backend_expires_entries():
+    """Test that entries past their TTL are not returned."""
+    backend = MemoryBackend()
+    backend.set("a", b"1", 0, "ns")
+    time.sleep(0.01)
+
+    assert backend.get("a") is None
+
+
+def test_invalidation_is_scoped_to_one_user():
+    """Test that invalidating a user leaves other users' entries in place."""
+    local = Cache(MemoryBackend())
+    local.get_or_set_bytes("alice", "kind", (1,), lambda: b"a")
+    local.get_or_set_bytes("bob", "kind", (1,), lambda: b"b")
+
+    local.invalidate_user("alice")
+
+    assert local.backend.get(local.key("alice", "kind", 1)) is None
+    assert local.backend.get(local.key("bob", "kind", 1)) == b"b"
+
+
+def test_redis_backend_namespaces_and_ttl():
+    """Test the Redis backend against an in-memory Redis."""
+    fakeredis = pytest.importorskip("fakeredis")
+    client_ = fakeredis.FakeRedis()
+    local = Cache(RedisBackend(client_), default_ttl=30)
+
+    calls = []
+    for _ in range(2):
+        local.get_or_set_json("carol", "stats", (7,), lambda: calls.append(1) or {"n": 1})
+    key = local.key("carol", "stats", 7)
+
+    assert len(calls) == 1
+    assert 0 < client_.ttl(key) <= 30
+
+    local.invalidate_user("carol")
+
+    assert client_.get(key) is None
+    assert local.get_or_set_json("carol", "stats", (7,), lambda: {"n": 2}) == {"n": 2}
+
+
+def test_mood_write_invalidates_cached_statistics():
+    """Test that logging a mood refreshes the user's cached statistics."""
+    user_id = "cache_stats_user"
+    client.post("/api/mood", json={"mood_level": 4, "user_id": user_id})
+    first = client.get(f"/api/mood/statistics?user_id={user_id}").json()["statistics"]
+
+    client.post("/api/mood", json={"mood_level": 8, "user_id": user_id})
+    second = client.get(f"/api/mood/statistics?user_id={user_id}").json()["statistics"]
+
+    assert second["total_entries"] == first["total_entries"] + 1
+
+
+def test_repeated_history_reads_are_cache_hits():
+    """Test that an unchanged user's chat history is served from the cache."""
+    user_id = "cache_history_user"
+    client.post("/api/chat", json={"message": "hello", "user_id": user_id})
+    client.get(f"/api/chat/history?user_id={user_id}")
+    before = cache.hit_ratio("chat_history")
+
+    responses = [client.get(f"/api/chat/history?user_id={user_id}") for _ in range(3)]
+
+    assert all(r.json() == responses[0].json() for r in responses)
+    assert cache.hit_ratio("chat_history") > before
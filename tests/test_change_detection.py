@@ -0,0 +1,131 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app import app
+from models.database import MoodChangeState, MoodEntry
+from services.change_detection import ChangeDetector, CusumState, initialize_states
+from services.database import get_db_session
+
+client = TestClient(app)
+
+
+def test_cusum_flags_sustained_drop_only():
+    """Test that a collapse from 7s to 2s alarms while ordinary noise does not."""
+    detector = ChangeDetector(drift=1.0, threshold=5.0, warmup=3)
+    state, alarms = detector.replay([7, 7, 7, 2, 2])
+    assert [index for index, _, _ in alarms] == [4]
+    assert alarms[0][1] == 7.0
+    # The baseline restarts at the new level after an alarm
+    assert state.baseline == 2.0 and state.statistic == 0.0
+
+    _, alarms = detector.replay([7, 6, 8, 7, 5, 7, 6, 8, 6, 7, 5, 7])
+    assert alarms == []
+    _, alarms = detector.replay([7, 7, 7, 1])
+    assert alarms == []
+
+
+def test_replay_resumes_from_saved_state():
+    """Test that stepping from a persisted state equals one replay of the whole series."""
+    detector = ChangeDetector()
+    levels = [6, 7, 8, 7, 3, 2, 2, 4, 5, 6, 6, 1, 1, 1]
+    full, full_alarms = detector.replay(levels)
+    first, first_alarms = detector.replay(levels[:6])
+    resumed = CusumState(first.observations, first.baseline, first.statistic)
+    _, rest_alarms = detector.replay(levels[6:], resumed)
+    assert len(first_alarms) + len(rest_alarms) == len(full_alarms)
+    assert (resumed.observations, resumed.baseline, resumed.statistic) == (
+        full.observations,
+        full.baseline,
+        full.statistic,
+    )
+
+
+def test_mood_entries_raise_alerts_and_persist_state():
+    """Test that logging a mood collapse creates an alert and that bulk init matches online state."""
+    user_id = f"drop_user_{uuid.uuid4().hex[:8]}"
+    start = datetime.utcnow() - timedelta(days=4)
+    for day, level in enumerate([7, 7, 8, 2, 2]):
+        timestamp = (start + timedelta(days=day)).isoformat()
+        assert (
+            client.post(
+                "/api/mood", json={"mood_level": level, "user_id": user_id, "timestamp": timestamp}
+            ).status_code
+            == 200
+        )
+
+    alerts = client.get(f"/api/mood/alerts?user_id={user_id}").json()["alerts"]
+    assert len(alerts) == 1
+    assert alerts[0]["kind"] == "mood_drop" and alerts[0]["mood_level"] == 2
+
+    with get_db_session() as session:
+        online = session.get(MoodChangeState, user_id)
+        online = (online.observations, online.baseline, online.statistic, online.last_entry_id)
+        report = initialize_states(session, batch_size=50)
+        replayed = session.get(MoodChangeState, user_id)
+        assert report["users"] >= 1
+        assert (
+            replayed.observations,
+            replayed.baseline,
+            replayed.statistic,
+            replayed.last_entry_id,
+        ) == online
+
+
+def test_entry_that_loses_the_first_state_insert_continues_from_the_winner(monkeypatch):
+    """Test that an entry missing a concurrently created state row resumes it instead of failing."""
+    user_id = f"race_user_{uuid.uuid4().hex[:8]}"
+    for level in (6, 7):
+        assert (
+            client.post("/api/mood", json={"mood_level": level, "user_id": user_id}).status_code
+            == 200
+        )
+    with get_db_session() as session:
+        observations = session.get(MoodChangeState, user_id).observations
+
+    lookups = []
+    locked_state = ChangeDetector._locked_state
+
+    def racing_lookup(session, user_id):
+        # The first lookup ran before the other transaction's row was committed
+        lookups.append(user_id)
+        return None if len(lookups) == 1 else locked_state(session, user_id)
+
+    monkeypatch.setattr(ChangeDetector, "_locked_state", staticmethod(racing_lookup))
+    response = client.post("/api/mood", json={"mood_level": 6, "user_id": user_id})
+    monkeypatch.undo()
+
+    assert response.status_code == 200
+    with get_db_session() as session:
+        state = session.get(MoodChangeState, user_id)
+        newest = session.query(func.max(MoodEntry.id)).filter(MoodEntry.user_id == user_id).scalar()
+        assert (state.observations, state.last_entry_id) == (observations + 1, newest)
+
+
+def test_backdated_entries_fold_in_logging_order_online_and_in_rebuild():
+    """Test that entries logged out of timestamp order give the same state online and replayed."""
+    user_id = f"backdate_user_{uuid.uuid4().hex[:8]}"
+    now = datetime.utcnow()
+    for days_ago, level in [(1, 8), (2, 7), (9, 2), (3, 7), (10, 3), (4, 8)]:
+        timestamp = (now - timedelta(days=days_ago)).isoformat()
+        assert (
+            client.post(
+                "/api/mood", json={"mood_level": level, "user_id": user_id, "timestamp": timestamp}
+            ).status_code
+            == 200
+        )
+
+    with get_db_session() as session:
+        online = session.get(MoodChangeState, user_id)
+        online = (online.observations, online.baseline, online.statistic, online.last_entry_id)
+        initialize_states(session, batch_size=50)
+        session.expire_all()
+        replayed = session.get(MoodChangeState, user_id)
+        assert (
+            replayed.observations,
+            replayed.baseline,
+            replayed.statistic,
+            replayed.last_entry_id,
+        ) == online
@@ -0,0 +1,105 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import app
+from models.database import ChatMessage
+from services.database import get_db_session
+from services.pagination import decode_cursor, encode_cursor
+from services.repositories import UserRepository
+
+client = TestClient(app)
+
+USER_ID = "pagination_user"
+
+
+def _seed(count):
+    for i in range(count):
+        client.post("/api/chat", json={"message": f"page message {i}", "user_id": USER_ID})
+
+
+def test_cursor_round_trip():
+    """Test that cursors decode to the (timestamp, id) they were built from."""
+    timestamp = datetime(2025, 1, 2, 3, 4, 5, 678)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+def test_pages_cover_history_without_overlap():
+    """Test that following next_cursor walks the whole history exactly once, newest first."""
+    _seed(7)
+    full = client.get(f"/api/chat/history?user_id={USER_ID}&limit=1000").json()["messages"]
+
+    seen, cursor = [], None
+    while True:
+        url = f"/api/chat/history?user_id={USER_ID}&limit=3" + (
+            f"&cursor={cursor}" if cursor else ""
+        )
+        page = client.get(url).json()
+        assert len(page["messages"]) <= 3
+        seen.extend(page["messages"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [m["id"] for m in seen] == [m["id"] for m in full]
+    assert len({m["id"] for m in seen}) == len(seen)
+
+
+def test_pages_across_whole_second_timestamps_stored_both_ways():
+    """Test paging over rows at one whole second, some written from Python and some by the server default."""
+    user_id = f"pagination_{uuid.uuid4().hex[:8]}"
+    second = datetime(2025, 1, 2, 3, 4, 5)
+    with get_db_session() as session:
+        UserRepository(session).create_user(user_id)
+        rows = [
+            ChatMessage(
+                user_id=user_id,
+                message=f"m{i}",
+                response="r",
+                ai_provider="mock",
+                ai_model="mock",
+                timestamp=second,
+            )
+            for i in range(4)
+        ]
+        session.add_all(rows)
+        session.flush()
+        # Stored as CURRENT_TIMESTAMP would store them: without the ".000000" Python writes
+        for row in rows[::2]:
+            session.execute(
+                text("UPDATE chat_messages SET timestamp = :timestamp WHERE id = :id"),
+                {"timestamp": "2025-01-02 03:04:05", "id": row.id},
+            )
+
+    full = client.get(f"/api/chat/history?user_id={user_id}&limit=1000").json()["messages"]
+    seen, cursor = [], None
+    while True:
+        page = client.get(
+            f"/api/chat/history?user_id={user_id}&limit=1" + (f"&cursor={cursor}" if cursor else "")
+        ).json()
+        seen.extend(page["messages"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(full) == 4
+    assert [m["id"] for m in seen] == [m["id"] for m in full]
+
+
+def test_compact_mode_omits_responses():
+    """Test that compact pages leave out response bodies."""
+    _seed(1)
+    messages = client.get(f"/api/chat/history?user_id={USER_ID}&limit=2&compact=true").json()[
+        "messages"
+    ]
+
+    assert messages
+    assert all("response" not in m and "message" in m for m in messages)
+
+
+def test_invalid_cursor_is_rejected():
+    """Test that a malformed cursor returns 400."""
+    response = client.get(f"/api/chat/history?user_id={USER_ID}&cursor=not-a-cursor")
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import app
+from services.config import settings
+
+client = TestClient(app)
+
+
+def _exchange(ws, message: str) -> dict:
+    """Send one message and collect its frames until the end frame."""
+    ws.send_json({"type": "message", "message": message})
+    assert ws.receive_json() == {"type": "start"}
+    deltas = []
+    while True:
+        frame = ws.receive_json()
+        if frame["type"] == "end":
+            assert "".join(deltas) == frame["reply"]
+            return frame
+        assert frame["type"] == "delta"
+        deltas.append(frame["text"])
+
+
+def _history(user_id: str) -> list:
+    return [
+        item["message"]
+        for item in client.get(f"/api/chat/history?user_id={user_id}").json()["messages"]
+    ]
+
+
+def _history_after_close(user_id: str, expected: list, timeout: float = 5.0) -> list:
+    """History once the closing flush lands; the test client can return before the handler's finally finishes."""
+    deadline = time.monotonic() + timeout
+    while (history := _history(user_id)) != expected and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return history
+
+
+def test_streams_replies_with_connection_history():
+    """Test that replies stream as deltas and later turns see earlier ones on the same socket."""
+    user_id = f"ws_user_{uuid.uuid4().hex[:8]}"
+    with client.websocket_connect("/ws/chat") as ws:
+        ws.send_json({"type": "hello", "user_id": user_id})
+        assert ws.receive_json() == {"type": "ready", "user_id": user_id}
+
+        first = _exchange(ws, "Work has been stressful")
+        assert not first["crisis"]
+        second = _exchange(ws, "I could not sleep")
+        assert 'Earlier you told me: "Work has been stressful"' in second["reply"]
+
+        ws.send_json({"type": "message", "message": "   "})
+        assert ws.receive_json()["status"] == 400
+
+    # Turns are saved when the socket closes
+    expected = ["I could not sleep", "Work has been stressful"]
+    assert _history_after_close(user_id, expected) == expected
+
+
+def test_turns_are_saved_in_batches(monkeypatch):
+    """Test that a full batch is written before the connection closes."""
+    monkeypatch.setattr(settings, "WS_CHAT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "WS_CHAT_FLUSH_MS", 60000)
+    user_id = f"ws_batch_{uuid.uuid4().hex[:8]}"
+    with client.websocket_connect(f"/ws/chat?user_id={user_id}") as ws:
+        assert ws.receive_json()["type"] == "ready"
+        _exchange(ws, "one")
+        assert _history(user_id) == []
+        _exchange(ws, "two")
+        assert _history(user_id) == ["two", "one"]
+        _exchange(ws, "three")
+    assert _history_after_close(user_id, ["three", "two", "one"]) == ["three", "two", "one"]
+
+
+def test_crisis_messages_and_identification():
+    """Test crisis replies over the socket and that a connection without a user is refused."""
+    with client.websocket_connect(f"/ws/chat?user_id=ws_crisis_{uuid.uuid4().hex[:8]}") as ws:
+        ws.receive_json()
+        frame = _exchange(ws, "I want to end my life")
+        assert frame["crisis"] and "988" in frame["reply"]
+
+    with client.websocket_connect("/ws/chat") as ws:
+        ws.send_json({"type": "message", "message": "hi"})
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+        assert exc.value.code == 1008
+
+
+def test_disconnect_before_hello_is_not_an_error():
+    """Test that a client leaving before its hello frame ends the handler quietly."""
+    with client.websocket_connect("/ws/chat") as ws:
+        ws.close()
@@ -0,0 +1,134 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+import routes.chat
+from app import app
+from services.cache import cache
+from services.config import settings
+
+client = TestClient(app)
+
+
+def test_mood_history_revalidates_with_etag():
+    """Test that an unchanged mood history is answered with 304 and a new entry changes the ETag."""
+    user_id = "etag_mood_user"
+    client.post("/api/mood", json={"mood_level": 5, "user_id": user_id})
+
+    first = client.get(f"/api/mood/history?user_id={user_id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert "last-modified" in first.headers
+
+    revalidated = client.get(
+        f"/api/mood/history?user_id={user_id}", headers={"If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    client.post("/api/mood", json={"mood_level": 7, "user_id": user_id})
+    changed = client.get(f"/api/mood/history?user_id={user_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["moods"]) == len(first.json()["moods"]) + 1
+
+
+def test_chat_history_not_modified_loads_no_rows(monkeypatch):
+    """Test that a matching If-None-Match on chat history only runs the validator lookup."""
+    user_id = "etag_chat_user"
+    client.post("/api/chat", json={"message": "hello", "user_id": user_id})
+    etag = client.get(f"/api/chat/history?user_id={user_id}").headers["etag"]
+
+    monkeypatch.setattr(settings, "DEBUG", True)
+    response = client.get(
+        f"/api/chat/history?user_id={user_id}", headers={"If-None-Match": f'"x", {etag}'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["x-db-query-count"] == "1"
+
+
+def test_statistics_etag_depends_on_window():
+    """Test that statistics for different windows get different ETags."""
+    user_id = "etag_stats_user"
+    client.post("/api/mood", json={"mood_level": 3, "user_id": user_id})
+
+    week = client.get(f"/api/mood/statistics?user_id={user_id}&days_back=7")
+    month = client.get(f"/api/mood/statistics?user_id={user_id}&days_back=30")
+
+    assert week.headers["etag"] != month.headers["etag"]
+    assert (
+        client.get(
+            f"/api/mood/statistics?user_id={user_id}&days_back=7",
+            headers={"If-None-Match": week.headers["etag"]},
+        ).status_code
+        == 304
+    )
+
+
+def test_stale_body_cached_by_racing_read_is_not_served_with_new_etag():
+    """Test that a body a slow reader stores after a write's invalidation is not served for the new version."""
+    user_id = f"etag_race_user_{uuid.uuid4().hex[:8]}"
+    client.post("/api/mood", json={"mood_level": 4, "user_id": user_id})
+    client.post("/api/chat", json={"message": "hello", "user_id": user_id})
+    urls = [
+        f"/api/mood/history?user_id={user_id}",
+        f"/api/mood/statistics?user_id={user_id}",
+        f"/api/chat/history?user_id={user_id}",
+    ]
+    before = [client.get(url) for url in urls]
+    namespace = cache.namespace(user_id)
+    stale = {
+        key: value
+        for key, (_, value, _) in list(cache.backend._entries.items())
+        if key.startswith(namespace)
+    }
+
+    client.post("/api/mood", json={"mood_level": 9, "user_id": user_id})
+    client.post("/api/chat", json={"message": "hello again", "user_id": user_id})
+    for (
+        key,
+        value,
+    ) in stale.items():  # Reads that started before the writes finish after the invalidation
+        cache.backend.set(key, value, 60, namespace)
+
+    after = [
+        client.get(url, headers={"If-None-Match": old.headers["etag"]})
+        for url, old in zip(urls, before)
+    ]
+    assert [response.status_code for response in after] == [200, 200, 200]
+    assert len(after[0].json()["moods"]) == 2
+    assert after[1].json()["statistics"] != before[1].json()["statistics"]
+    assert len(after[2].json()["messages"]) == 2
+
+
+def test_mood_context_cached_by_racing_chat_is_not_used_after_mood_write(monkeypatch):
+    """Test that a mood context a slow chat stores after a mood write's invalidation is not used later."""
+    user_id = f"context_race_user_{uuid.uuid4().hex[:8]}"
+    client.post("/api/mood", json={"mood_level": 4, "user_id": user_id})
+    namespace = cache.namespace(user_id)
+    contexts, stored = [], {}
+
+    def respond(message, user_id=None, mood_context=None, history=None):
+        contexts.append(mood_context)
+        # What this chat cached, taken before its own commit invalidates the namespace
+        stored.update(
+            (key, value)
+            for key, (_, value, _) in list(cache.backend._entries.items())
+            if key.startswith(namespace)
+        )
+        return "ok"
+
+    monkeypatch.setattr(routes.chat.agent, "generate_response", respond)
+    client.post("/api/chat", json={"message": "hello", "user_id": user_id})
+    client.post("/api/mood", json={"mood_level": 9, "user_id": user_id})
+    for (
+        key,
+        value,
+    ) in stored.items():  # The first chat's context lands after the mood write's invalidation
+        cache.backend.set(key, value, 60, namespace)
+    client.post("/api/chat", json={"message": "and now?", "user_id": user_id})
+
+    assert stored
+    assert [context["latest_mood"] for context in contexts] == [4, 9]
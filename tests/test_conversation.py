@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+
+from app import app
+from services.conversation import ConversationStore
+from services.metrics import metrics
+
+client = TestClient(app)
+
+
+def test_window_keeps_last_turns_and_hydrates_once():
+    """Test that a window is loaded once and then behaves as a ring buffer."""
+    store = ConversationStore(max_turns=2)
+    loads = []
+
+    def load(limit):
+        loads.append(limit)
+        return [("m1", "r1")]
+
+    assert store.get_turns("u", 1, load) == [("m1", "r1")]
+    store.append("u", "m2", "r2")
+    store.append("u", "m3", "r3")
+
+    assert store.get_turns("u", 3, load) == [("m2", "r2"), ("m3", "r3")]
+    assert loads == [2]
+
+
+def test_append_ignores_users_without_window():
+    """Test that turns for unhydrated users are left for the next hydration."""
+    store = ConversationStore()
+    store.append("nobody", "m", "r")
+
+    assert len(store) == 0
+
+
+def test_turns_missed_by_a_window_trigger_a_reload():
+    """Test that a turn committed during hydration or by another worker is not lost from the window."""
+    store = ConversationStore(max_turns=5)
+
+    def load_racing_a_commit(limit):
+        # Another request commits its turn after this load read the table, before the window exists
+        store.append("u", "m2", "r2")
+        return [("m1", "r1")]
+
+    assert store.get_turns("u", 1, load_racing_a_commit) == [("m1", "r1")]
+    assert store.get_turns("u", 2, lambda limit: [("m1", "r1"), ("m2", "r2")]) == [
+        ("m1", "r1"),
+        ("m2", "r2"),
+    ]
+
+    # m3 was committed by another worker, then this worker appends m4
+    store.append("u", "m4", "r4")
+    reloaded = [("m1", "r1"), ("m2", "r2"), ("m3", "r3"), ("m4", "r4")]
+    assert store.get_turns("u", 4, lambda limit: reloaded) == reloaded
+
+
+def test_idle_users_evicted_by_count_and_bytes():
+    """Test LRU eviction under the user cap and the byte budget."""
+    store = ConversationStore(max_turns=5, max_users=2)
+    for user in ("a", "b"):
+        store.get_turns(user, 0, lambda limit: [])
+    store.get_turns("a", 0, lambda limit: [])  # a is now most recent
+    store.get_turns("c", 0, lambda limit: [])
+
+    assert len(store) == 2
+    assert store.get_turns("b", 0, lambda limit: [("reloaded", "x")]) == [("reloaded", "x")]
+
+    small = ConversationStore(max_turns=5, max_bytes=1000)
+    small.get_turns("a", 0, lambda limit: [("x" * 300, "y" * 300)])
+    small.get_turns("b", 0, lambda limit: [("x" * 300, "y" * 300)])
+
+    assert len(small) == 1
+    assert small.total_bytes <= 1000
+
+
+def test_chat_uses_previous_turn_without_rehydrating():
+    """Test that a second chat turn sees the first one from memory."""
+    user_id = "conversation_user"
+    before = metrics.get_counter("conversation_hydrations_total")
+
+    client.post("/api/chat", json={"message": "I slept badly", "user_id": user_id})
+    reply = client.post(
+        "/api/chat", json={"message": "and work is stressful", "user_id": user_id}
+    ).json()["reply"]
+
+    assert 'Earlier you told me: "I slept badly"' in reply
+    assert metrics.get_counter("conversation_hydrations_total") - before == 1
@@ -0,0 +1,61 @@
+import random
+
+from fastapi.testclient import TestClient
+
+from app import app
+from services.crisis import AhoCorasick, CrisisDetector, CrisisMatch, normalize_text
+
+client = TestClient(app)
+
+
+def test_automaton_matches_naive_search():
+    """Test that the automaton finds exactly the patterns a substring search finds."""
+    rng = random.Random(7)
+    patterns = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(40)}
+    automaton = AhoCorasick((p, p) for p in patterns)
+
+    for _ in range(200):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 20)))
+        found = {value for values in automaton.iter_matches(text) for value in values}
+        assert found == {p for p in patterns if p in text}
+
+
+def test_normalization_handles_case_punctuation_and_lookalikes():
+    """Test that variants of a phrase normalize to the same words."""
+    assert normalize_text("Self-HARM!!") == " self harm "
+    assert normalize_text("I don't wanna diiiie") == " i dont wanna die "
+    assert normalize_text("su1c1dal, take 3 pills") == " suicidal take 3 pills "
+
+
+def test_detector_matches_whole_words_only():
+    """Test phrase matching on word boundaries with categories from the lexicon."""
+    detector = CrisisDetector(
+        [CrisisMatch("suicide", "end my life"), CrisisMatch("self_harm", "cut myself")]
+    )
+
+    assert detector.scan("I want to END my life, and I cut myself") == [
+        CrisisMatch("suicide", "end my life"),
+        CrisisMatch("self_harm", "cut myself"),
+    ]
+    assert detector.first_match("a friend my lifend my life") is None
+
+
+def test_flagged_message_gets_safe_response():
+    """Test that a crisis message skips the agent and returns crisis resources."""
+    response = client.post(
+        "/api/chat", json={"message": "I think I'm going to kill myself", "user_id": "crisis_user"}
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["crisis"] is True
+    assert "988" in data["reply"]
+    assert "I hear you saying" not in data["reply"]
+
+
+def test_ordinary_message_not_flagged():
+    """Test that everyday phrasing is answered normally."""
+    data = client.post("/api/chat", json={"message": "This deadline is killing me"}).json()
+
+    assert data["crisis"] is False
+    assert "I hear you saying" in data["reply"]
@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import routes.chat
+from app import app
+from models.schemas import ChatRequest, ChatResponse
+from services.idempotency import (
+    IdempotencyGuard,
+    MemoryIdempotencyStore,
+    RedisIdempotencyStore,
+    fingerprint,
+)
+
+client = TestClient(app)
+
+
+class _FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_mood_retry_replays_without_second_row():
+    """Test that a retried mood post returns the first response and logs one entry."""
+    user_id = f"idem_user_{uuid.uuid4().hex[:8]}"
+    payload = {"mood_level": 6, "notes": "Retried", "user_id": user_id}
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    first = client.post("/api/mood", json=payload, headers=headers)
+    retry = client.post("/api/mood", json=payload, headers=headers)
+    reused = client.post("/api/mood", json={**payload, "mood_level": 2}, headers=headers)
+    unkeyed = client.post("/api/mood", json=payload)
+
+    assert first.status_code == retry.status_code == unkeyed.status_code == 200
+    assert retry.content == first.content
+    assert (
+        retry.headers["idempotent-replayed"] == "true"
+        and "idempotent-replayed" not in first.headers
+    )
+    assert reused.status_code == 422
+    history = client.get("/api/mood/history", params={"user_id": user_id}).json()
+    assert len(history["moods"]) == 2  # keyed post once, unkeyed post once
+
+
+def test_concurrent_chat_duplicates_wait_for_first(monkeypatch):
+    """Test that duplicates sent while the first request runs share its reply and agent call."""
+    user_id = f"idem_user_{uuid.uuid4().hex[:8]}"
+    calls, started = [], threading.Event()
+
+    def slow_response(message, user_id=None, mood_context=None, history=None):
+        calls.append(message)
+        started.set()
+        time.sleep(0.2)
+        return f"reply {len(calls)}"
+
+    monkeypatch.setattr(routes.chat.agent, "generate_response", slow_response)
+    payload, headers = {"message": "Are you there?", "user_id": user_id}, {
+        "Idempotency-Key": "chat-retry-1"
+    }
+    responses = []
+
+    def post():
+        responses.append(client.post("/api/chat", json=payload, headers=headers))
+
+    first = threading.Thread(target=post)
+    first.start()
+    started.wait(5)
+    duplicates = [threading.Thread(target=post) for _ in range(2)]
+    for thread in duplicates:
+        thread.start()
+    for thread in [first, *duplicates]:
+        thread.join()
+
+    assert calls == ["Are you there?"]
+    assert {response.json()["reply"] for response in responses} == {"reply 1"}
+    assert sum(response.headers.get("idempotent-replayed") == "true" for response in responses) == 2
+    history = client.get("/api/chat/history", params={"user_id": user_id}).json()
+    assert len(history["messages"]) == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_guard_releases_failed_keys_and_expires_records(backend):
+    """Test that errors are not replayed, stored responses expire, and slow duplicates get 409."""
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        store = RedisIdempotencyStore(fakeredis.FakeRedis())
+    else:
+        store = MemoryIdempotencyStore(max_keys=10)
+    guard = IdempotencyGuard(store, ttl=0.2, lock_ttl=5, wait=0.05)
+    request, db = ChatRequest(message="hi", user_id="u1"), _FakeSession()
+    results = iter(["second", "third"])
+
+    def fail():
+        raise HTTPException(status_code=503, detail="busy")
+
+    def reply():
+        return ChatResponse(reply=next(results), provider="mock", model="mock-model")
+
+    with pytest.raises(HTTPException):
+        guard.run("chat", "k1", request, db, fail)
+    assert (
+        guard.run("chat", "k1", request, db, reply).body
+        == guard.run("chat", "k1", request, db, fail).body
+    )
+    assert db.commits == 1
+    time.sleep(0.25)
+    assert b'"third"' in guard.run("chat", "k1", request, db, reply).body
+
+    # A key still held by another worker's request: the duplicate gives up after the wait budget
+    assert store.add("mw:idem:chat:k2", b"P" + fingerprint(request), 5)
+    with pytest.raises(HTTPException) as excinfo:
+        guard.run("chat", "k2", request, db, reply)
+    assert excinfo.value.status_code == 409
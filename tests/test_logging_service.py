@@ -0,0 +1,127 @@
+import io
+import json
+import logging
+
+import pytest
+
+from services import logging_service
+from services.config import settings
+from services.logging_service import JsonFormatter, RateLimitFilter, SamplingFilter, parse_rules
+from services.metrics import metrics
+
+
+def make_record(name="app.test", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    logging_service.shutdown_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging_service._installed_handler = None
+
+
+def test_json_formatter_includes_extra_fields():
+    """Test that records become one JSON object per line."""
+    line = JsonFormatter().format(make_record(user_id="u1"))
+
+    payload = json.loads(line)
+    assert payload["message"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "app.test"
+    assert payload["user_id"] == "u1"
+    assert "\n" not in line
+
+
+def test_parse_rules():
+    """Test parsing of per-logger sampling and rate limit specs."""
+    assert parse_rules("a.b=0.5, root=1") == {"a.b": 0.5, "": 1.0}
+    assert parse_rules("httpx=20/s", rate_suffix=True) == {"httpx": 20.0}
+    assert parse_rules("") == {}
+
+
+def test_sampling_filter_keeps_warnings():
+    """Test that sampling drops info records but never warnings."""
+    sampling = SamplingFilter({"noisy": 0.0})
+
+    assert not sampling.filter(make_record(name="noisy.child"))
+    assert sampling.filter(make_record(name="noisy.child", level=logging.WARNING))
+    assert sampling.filter(make_record(name="quiet"))
+
+
+def test_rate_limit_filter_reports_suppressed_records():
+    """Test that a burst beyond the rate is dropped and counted."""
+    limiter = RateLimitFilter({"noisy": 3})
+
+    allowed = [limiter.filter(make_record(name="noisy")) for _ in range(10)]
+    assert allowed.count(True) == 3
+
+    _tokens, updated, suppressed = limiter._buckets["noisy"]
+    limiter._buckets["noisy"] = (1.0, updated, suppressed)
+    record = make_record(name="noisy")
+    assert limiter.filter(record)
+    assert record.suppressed == 7
+
+
+def test_rate_limit_filter_allows_fractional_rates():
+    """Test that a rate below one record per second still lets records through."""
+    limiter = RateLimitFilter({"slow": 0.5})
+
+    assert limiter.filter(make_record(name="slow"))
+    assert not limiter.filter(make_record(name="slow"))
+
+    tokens, updated, suppressed = limiter._buckets["slow"]
+    limiter._buckets["slow"] = (tokens, updated - 2.0, suppressed)
+    assert limiter.filter(make_record(name="slow"))
+
+
+def test_plain_text_logging_applies_filters(monkeypatch, restore_root_logger):
+    """Test that the default text handler is sampled and rate limited and counts what it drops."""
+    monkeypatch.setattr(settings, "LOG_FORMAT", "text")
+    monkeypatch.setattr(settings, "LOG_ASYNC", False)
+    monkeypatch.setattr(settings, "LOG_SAMPLING", "services.sampled_test=0")
+    monkeypatch.setattr(settings, "LOG_RATE_LIMIT", "services.text_test=3/s")
+    stream = io.StringIO()
+    rate_limited = metrics.get_counter("log_records_dropped_total", (("reason", "rate_limited"),))
+    sampled = metrics.get_counter("log_records_dropped_total", (("reason", "sampled"),))
+
+    logging_service.configure_logging(stream=stream)
+    for i in range(10):
+        logging.getLogger("services.text_test").info("event %d", i)
+        logging.getLogger("services.sampled_test").info("sampled %d", i)
+
+    lines = stream.getvalue().splitlines()
+    assert sum("services.text_test" in line for line in lines) == 3
+    assert not any("services.sampled_test" in line for line in lines)
+    assert (
+        metrics.get_counter("log_records_dropped_total", (("reason", "rate_limited"),))
+        == rate_limited + 7
+    )
+    assert (
+        metrics.get_counter("log_records_dropped_total", (("reason", "sampled"),)) == sampled + 10
+    )
+
+
+def test_async_json_logging_flushes_on_shutdown(monkeypatch, restore_root_logger):
+    """Test that queued records are written by the listener and flushed on shutdown."""
+    monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+    monkeypatch.setattr(settings, "LOG_ASYNC", True)
+    monkeypatch.setattr(settings, "LOG_SAMPLING", "")
+    monkeypatch.setattr(settings, "LOG_RATE_LIMIT", "")
+    stream = io.StringIO()
+
+    logging_service.configure_logging(stream=stream)
+    for i in range(100):
+        logging.getLogger("services.async_test").info("event %d", i)
+    logging_service.shutdown_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    messages = [line["message"] for line in lines if line["logger"] == "services.async_test"]
+    assert messages == [f"event {i}" for i in range(100)]
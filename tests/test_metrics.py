@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+
+from app import app
+from services.metrics import Histogram, MetricsRegistry, metrics
+
+client = TestClient(app)
+
+
+def test_histogram_buckets():
+    """Test that observations land in the first bucket at or above the value."""
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert abs(histogram.sum - 3.65) < 1e-9
+
+
+def test_render_prometheus_text():
+    """Test the text exposition format for counters and histograms."""
+    registry = MetricsRegistry()
+    registry.describe("jobs_total", "counter", "Jobs run.")
+    registry.inc("jobs_total", (("kind", 'a"b'),), 2)
+    registry.observe("job_seconds", 0.2, (("kind", "a"),))
+
+    text = registry.render()
+
+    assert "# HELP jobs_total Jobs run.\n# TYPE jobs_total counter" in text
+    assert 'jobs_total{kind="a\\"b"} 2' in text
+    assert 'job_seconds_bucket{kind="a",le="0.25"} 1' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 1' in text
+    assert 'job_seconds_count{kind="a"} 1' in text
+
+
+def test_chat_request_records_route_and_stage_metrics():
+    """Test that /api/chat records request counts and per-stage latency."""
+    client.post("/api/mood", json={"mood_level": 6, "user_id": "metrics_user"})
+    labels = (("method", "POST"), ("route", "/api/chat"))
+    before = metrics.get_counter("http_requests_total", labels + (("status", "200"),))
+
+    response = client.post("/api/chat", json={"message": "hello", "user_id": "metrics_user"})
+    assert response.status_code == 200
+
+    assert metrics.get_counter("http_requests_total", labels + (("status", "200"),)) == before + 1
+    for stage_name in ("mood_query", "mood_context", "agent", "chat_insert", "db_commit"):
+        histogram = metrics.get_histogram(
+            "http_request_stage_duration_seconds", (("route", "/api/chat"), ("stage", stage_name))
+        )
+        assert histogram is not None and histogram.count >= 1, stage_name
+
+    scrape = client.get("/metrics")
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_stage_duration_seconds_count{route="/api/chat",stage="agent"}' in scrape.text
+    )
+
+
+def test_unknown_paths_share_one_label():
+    """Test that unmatched paths do not create a series per URL."""
+    client.get("/no/such/path/123")
+    client.get("/no/such/path/456")
+
+    assert (
+        metrics.get_counter(
+            "http_requests_total", (("method", "GET"), ("route", "unmatched"), ("status", "404"))
+        )
+        >= 2
+    )
@@ -9,8 +9,7 @@ client = TestClient(app)
 def test_chat_without_mood_context():
     """Test chat response when no mood context is available."""
     response = client.post(
-        "/api/chat",
-        json={"message": "I'm feeling stressed about work", "user_id": "new_user"}
+        "/api/chat", json={"message": "I'm feeling stressed about work", "user_id": "new_user"}
     )
     assert response.status_code == 200
     data = response.json()
@@ -23,38 +22,43 @@ def test_chat_with_positive_mood_context():
     """Test chat response when user has positive mood history."""
     # First, log some positive moods
     client.post("/api/mood", json={"mood_level": 8, "notes": "Great day!", "user_id": "happy_user"})
-    client.post("/api/mood", json={"mood_level": 9, "notes": "Feeling awesome", "user_id": "happy_user"})
-    
+    client.post(
+        "/api/mood", json={"mood_level": 9, "notes": "Feeling awesome", "user_id": "happy_user"}
+    )
+
     # Now chat
     response = client.post(
-        "/api/chat",
-        json={"message": "I want to keep feeling this good", "user_id": "happy_user"}
+        "/api/chat", json={"message": "I want to keep feeling this good", "user_id": "happy_user"}
     )
     assert response.status_code == 200
     data = response.json()
     assert "wonderful that you're feeling so positive" in data["reply"]
     assert "mood level 9/10" in data["reply"]
     assert "maintain this great energy" in data["reply"]
-    assert "recently noted: \"Feeling awesome\"" in data["reply"]
+    assert 'recently noted: "Feeling awesome"' in data["reply"]
 
 
 def test_chat_with_low_mood_context():
     """Test chat response when user has low mood history."""
     # Log some low moods
-    client.post("/api/mood", json={"mood_level": 2, "notes": "Really struggling", "user_id": "struggling_user"})
-    client.post("/api/mood", json={"mood_level": 3, "notes": "Still tough", "user_id": "struggling_user"})
-    
+    client.post(
+        "/api/mood",
+        json={"mood_level": 2, "notes": "Really struggling", "user_id": "struggling_user"},
+    )
+    client.post(
+        "/api/mood", json={"mood_level": 3, "notes": "Still tough", "user_id": "struggling_user"}
+    )
+
     # Chat
     response = client.post(
-        "/api/chat",
-        json={"message": "Everything feels overwhelming", "user_id": "struggling_user"}
+        "/api/chat", json={"message": "Everything feels overwhelming", "user_id": "struggling_user"}
     )
     assert response.status_code == 200
     data = response.json()
     assert "really sorry you're struggling" in data["reply"]
     assert "mood level 3/10" in data["reply"]
     assert "immediate steps" in data["reply"]
-    assert "recently noted: \"Still tough\"" in data["reply"]
+    assert 'recently noted: "Still tough"' in data["reply"]
     assert "professional support" in data["reply"]
 
 
@@ -62,26 +66,19 @@ def test_chat_with_improving_mood_trend():
     """Test chat response when user's mood is improving."""
     # Log moods showing improvement
     base_time = datetime.utcnow()
-    client.post("/api/mood", json={
-        "mood_level": 3, 
-        "notes": "Starting low", 
-        "user_id": "improving_user"
-    })
-    client.post("/api/mood", json={
-        "mood_level": 5, 
-        "notes": "Getting better", 
-        "user_id": "improving_user"
-    })
-    client.post("/api/mood", json={
-        "mood_level": 7, 
-        "notes": "Much better now", 
-        "user_id": "improving_user"
-    })
-    
+    client.post(
+        "/api/mood", json={"mood_level": 3, "notes": "Starting low", "user_id": "improving_user"}
+    )
+    client.post(
+        "/api/mood", json={"mood_level": 5, "notes": "Getting better", "user_id": "improving_user"}
+    )
+    client.post(
+        "/api/mood", json={"mood_level": 7, "notes": "Much better now", "user_id": "improving_user"}
+    )
+
     # Chat
     response = client.post(
-        "/api/chat",
-        json={"message": "I think I'm doing better", "user_id": "improving_user"}
+        "/api/chat", json={"message": "I think I'm doing better", "user_id": "improving_user"}
     )
     assert response.status_code == 200
     data = response.json()
@@ -93,26 +90,20 @@ def test_chat_with_improving_mood_trend():
 def test_chat_with_declining_mood_trend():
     """Test chat response when user's mood is declining."""
     # Log moods showing decline
-    client.post("/api/mood", json={
-        "mood_level": 8, 
-        "notes": "Was feeling good", 
-        "user_id": "declining_user"
-    })
-    client.post("/api/mood", json={
-        "mood_level": 5, 
-        "notes": "Getting harder", 
-        "user_id": "declining_user"
-    })
-    client.post("/api/mood", json={
-        "mood_level": 3, 
-        "notes": "Really down now", 
-        "user_id": "declining_user"
-    })
-    
+    client.post(
+        "/api/mood",
+        json={"mood_level": 8, "notes": "Was feeling good", "user_id": "declining_user"},
+    )
+    client.post(
+        "/api/mood", json={"mood_level": 5, "notes": "Getting harder", "user_id": "declining_user"}
+    )
+    client.post(
+        "/api/mood", json={"mood_level": 3, "notes": "Really down now", "user_id": "declining_user"}
+    )
+
     # Chat
     response = client.post(
-        "/api/chat",
-        json={"message": "Things are getting worse", "user_id": "declining_user"}
+        "/api/chat", json={"message": "Things are getting worse", "user_id": "declining_user"}
     )
     assert response.status_code == 200
     data = response.json()
@@ -125,13 +116,14 @@ def test_chat_with_declining_mood_trend():
 def test_chat_neutral_mood_context():
     """Test chat response for neutral mood range."""
     # Log neutral moods
-    client.post("/api/mood", json={"mood_level": 5, "notes": "Just okay", "user_id": "neutral_user"})
+    client.post(
+        "/api/mood", json={"mood_level": 5, "notes": "Just okay", "user_id": "neutral_user"}
+    )
     client.post("/api/mood", json={"mood_level": 4, "notes": "Meh", "user_id": "neutral_user"})
-    
+
     # Chat
     response = client.post(
-        "/api/chat",
-        json={"message": "I'm feeling pretty average", "user_id": "neutral_user"}
+        "/api/chat", json={"message": "I'm feeling pretty average", "user_id": "neutral_user"}
     )
     assert response.status_code == 200
     data = response.json()
@@ -142,10 +134,7 @@ def test_chat_neutral_mood_context():
 
 def test_chat_without_user_id():
     """Test chat response when no user_id is provided (no mood context)."""
-    response = client.post(
-        "/api/chat",
-        json={"message": "I need some help"}
-    )
+    response = client.post("/api/chat", json={"message": "I need some help"})
     assert response.status_code == 200
     data = response.json()
     assert "I hear you saying" in data["reply"]
@@ -156,10 +145,7 @@ def test_chat_without_user_id():
 
 def test_chat_empty_message_still_fails():
     """Test that empty messages still return validation error."""
-    response = client.post(
-        "/api/chat",
-        json={"message": "", "user_id": "test_user"}
-    )
+    response = client.post("/api/chat", json={"message": "", "user_id": "test_user"})
     assert response.status_code == 422  # Pydantic validation error
     assert "String should have at least 1 character" in str(response.json())
 
@@ -169,17 +155,22 @@ def test_mood_context_service_directly():
     from services.mood_context import MoodContextService
     from models.schemas import MoodEntry
     from datetime import datetime
-    
+
     # Test with no moods
     context = MoodContextService.get_mood_context([])
     assert context["status"] == "no_data"
-    
+
     # Test with moods
     moods = [
-        MoodEntry(user_id="test", mood_level=3, notes="low", timestamp=datetime.utcnow() - timedelta(days=2)),
-        MoodEntry(user_id="test", mood_level=7, notes="better", timestamp=datetime.utcnow())
+        MoodEntry(
+            user_id="test",
+            mood_level=3,
+            notes="low",
+            timestamp=datetime.utcnow() - timedelta(days=2),
+        ),
+        MoodEntry(user_id="test", mood_level=7, notes="better", timestamp=datetime.utcnow()),
     ]
-    
+
     context = MoodContextService.get_mood_context(moods)
     assert context["status"] == "available"
     assert context["latest_mood"] == 7
@@ -190,43 +181,68 @@ def test_mood_context_service_directly():
 def test_full_mood_aware_workflow():
     """Test the complete workflow: log moods, then chat."""
     user_id = "workflow_user"
-    
+
     # Step 1: Log some moods over time
-    client.post("/api/mood", json={
-        "mood_level": 4, 
-        "notes": "Starting point", 
-        "user_id": user_id
-    })
-    client.post("/api/mood", json={
-        "mood_level": 6, 
-        "notes": "Getting better", 
-        "user_id": user_id
-    })
-    client.post("/api/mood", json={
-        "mood_level": 8, 
-        "notes": "Feeling great!", 
-        "user_id": user_id
-    })
-    
+    client.post("/api/mood", json={"mood_level": 4, "notes": "Starting point", "user_id": user_id})
+    client.post("/api/mood", json={"mood_level": 6, "notes": "Getting better", "user_id": user_id})
+    client.post("/api/mood", json={"mood_level": 8, "notes": "Feeling great!", "user_id": user_id})
+
     # Step 2: Verify mood history
     mood_response = client.get(f"/api/mood/history?user_id={user_id}")
     assert mood_response.status_code == 200
     mood_data = mood_response.json()
     assert len(mood_data["moods"]) >= 3
-    
+
     # Step 3: Chat and get mood-aware response
     chat_response = client.post(
         "/api/chat",
-        json={
-            "message": "I want to talk about how I've been feeling", 
-            "user_id": user_id
-        }
+        json={"message": "I want to talk about how I've been feeling", "user_id": user_id},
     )
     assert chat_response.status_code == 200
     chat_data = chat_response.json()
-    
+
     # Verify mood awareness in response
     assert "mood level 8/10" in chat_data["reply"]
     assert "improving recently" in chat_data["reply"]
     assert "Feeling great!" in chat_data["reply"]
-    assert "positive" in chat_data["reply"]
\ No newline at end of file
+    assert "positive" in chat_data["reply"]
+
+
+def test_mood_context_from_projected_series():
+    """Test that the projected mood series yields the same context as schema objects."""
+    from services.database import get_db_session
+    from services.mood_context import MoodContextService, MoodSeries
+    from services.repositories import MoodRepository, convert_mood_entry_to_schema
+
+    user_id = "series_user"
+    client.post(
+        "/api/mood", json={"mood_level": 6, "notes": "long notes " * 50, "user_id": user_id}
+    )
+    client.post("/api/mood", json={"mood_level": 2, "user_id": user_id})
+    client.post("/api/mood", json={"mood_level": 3, "notes": "latest", "user_id": user_id})
+
+    with get_db_session() as session:
+        repo = MoodRepository(session)
+        series = repo.get_mood_series_by_user(user_id, days_back=7)
+        entries = [
+            convert_mood_entry_to_schema(m)
+            for m in repo.get_mood_entries_by_user(user_id, days_back=7)
+        ]
+
+    assert isinstance(series, MoodSeries)
+    assert list(series.levels)[-3:] == [6, 2, 3]
+    assert series.latest_notes == "latest"
+    # Schema objects carry no stored sentiment; everything else must agree
+    series_context = MoodContextService.get_mood_context(series)
+    sentiment_keys = ("notes_sentiment", "latest_emotion")
+    assert {
+        k: v for k, v in series_context.items() if k not in sentiment_keys
+    } == MoodContextService.get_mood_context(entries)
+
+    # Entries older than the window are dropped, keeping the latest notes
+    old = datetime.utcnow() - timedelta(days=30)
+    series = MoodSeries([old, datetime.utcnow()], [9, 4], latest_notes="today")
+    context = MoodContextService.get_mood_context(series)
+    assert context["entry_count"] == 1
+    assert context["latest_notes"] == "today"
+    assert MoodContextService.get_mood_context(MoodSeries())["status"] == "no_data"
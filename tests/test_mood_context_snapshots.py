@@ -0,0 +1,108 @@
+import json
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, ChatMessage, MoodContextSnapshot
+from services.migrations import migrate_chat_mood_contexts, upgrade_schema
+from services.repositories import ChatRepository
+
+CONTEXT = {"status": "available", "average_mood": 6.5, "latest_mood": 7, "trend": "stable"}
+
+
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshots.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_identical_contexts_share_one_snapshot(tmp_path):
+    """Test that repeated chat turns reference a single stored context."""
+    session = make_session(tmp_path)
+    chat_repo = ChatRepository(session)
+
+    first = chat_repo.create_chat_message("u1", "hi", "hello", "mock", "mock-model", CONTEXT)
+    second = chat_repo.create_chat_message(
+        "u1", "again", "hello", "mock", "mock-model", dict(CONTEXT)
+    )
+    other = chat_repo.create_chat_message(
+        "u1", "later", "hello", "mock", "mock-model", {**CONTEXT, "latest_mood": 3}
+    )
+    session.commit()
+
+    assert first.mood_context_snapshot_id == second.mood_context_snapshot_id
+    assert other.mood_context_snapshot_id != first.mood_context_snapshot_id
+    assert session.query(MoodContextSnapshot).count() == 2
+    assert first.mood_context is None
+    assert chat_repo.get_mood_context(second) == CONTEXT
+
+
+def test_chat_without_context_has_no_snapshot(tmp_path):
+    """Test that chats without mood context do not create snapshots."""
+    session = make_session(tmp_path)
+    message = ChatRepository(session).create_chat_message("u1", "hi", "hello", "mock", "mock-model")
+
+    assert message.mood_context_snapshot_id is None
+    assert session.query(MoodContextSnapshot).count() == 0
+
+
+def test_migrate_legacy_contexts_reports_savings(tmp_path):
+    """Test moving legacy JSON text into snapshots."""
+    session = make_session(tmp_path)
+    legacy = json.dumps(CONTEXT)
+    for i in range(10):
+        session.add(
+            ChatMessage(
+                user_id="u1",
+                message=f"m{i}",
+                response="r",
+                ai_provider="mock",
+                ai_model="mock-model",
+                mood_context=legacy,
+            )
+        )
+    session.add(
+        ChatMessage(
+            user_id="u1",
+            message="bad",
+            response="r",
+            ai_provider="mock",
+            ai_model="mock-model",
+            mood_context="{oops",
+        )
+    )
+    session.commit()
+
+    report = migrate_chat_mood_contexts(session, batch_size=3)
+
+    assert report["rows_migrated"] == 10
+    assert report["rows_skipped"] == 1
+    assert report["snapshots_created"] == 1
+    assert report["legacy_bytes"] == 10 * len(legacy)
+    assert report["bytes_saved"] > 0
+    migrated = session.query(ChatMessage).filter(ChatMessage.message == "m0").one()
+    assert ChatRepository(session).get_mood_context(migrated) == CONTEXT
+
+    # Re-running is a no-op
+    assert migrate_chat_mood_contexts(session)["rows_migrated"] == 0
+
+
+def test_upgrade_schema_adds_missing_columns(tmp_path):
+    """Test that existing tables gain columns added to the models."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, user_id VARCHAR(255) NOT NULL, "
+                "message TEXT NOT NULL, response TEXT NOT NULL, mood_context TEXT, "
+                "ai_provider VARCHAR(100) NOT NULL, ai_model VARCHAR(100) NOT NULL, timestamp DATETIME)"
+            )
+        )
+    Base.metadata.create_all(bind=engine)
+
+    applied = upgrade_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("chat_messages")}
+    assert "mood_context_snapshot_id" in columns
+    assert "add column chat_messages.mood_context_snapshot_id" in applied
+    assert upgrade_schema(engine) == []
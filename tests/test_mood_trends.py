@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, timedelta
+
+from services.mood_context import MoodContextService, MoodSeries
+from services.mood_trends import TrendState
+
+
+def _series(count: int, seed: int = 3, span_days: int = 120):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    offsets = sorted(rng.uniform(0, span_days) for _ in range(count))
+    timestamps = [now - timedelta(days=span_days - offset) for offset in offsets]
+    levels = [rng.randint(1, 10) for _ in range(count)]
+    return now, timestamps, levels
+
+
+def _naive_slope(timestamps, levels):
+    if len(levels) < 2:
+        return None
+    xs = [(ts - timestamps[0]).total_seconds() / 86400 for ts in timestamps]
+    mean_x, mean_y = sum(xs) / len(xs), sum(levels) / len(levels)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, levels)) / sxx
+
+
+def _naive_trend(levels):
+    if len(levels) < 2:
+        return "insufficient_data"
+    mid = len(levels) // 2
+    diff = sum(levels[mid:]) / (len(levels) - mid) - sum(levels[:mid]) / mid
+    return "improving" if diff > 0.5 else "declining" if diff < -0.5 else "stable"
+
+
+def test_windows_match_naive_computation():
+    """Test that each window's average, slope and trend match a direct computation."""
+    now, timestamps, levels = _series(300)
+    state = TrendState.from_series(timestamps, levels)
+    for days in (7, 30, 90):
+        cutoff = now - timedelta(days=days)
+        in_window = [(ts, level) for ts, level in zip(timestamps, levels) if ts >= cutoff]
+        stats = state.window(days, now)
+        window_levels = [level for _, level in in_window]
+        assert stats["count"] == len(in_window)
+        assert abs(stats["average"] - sum(window_levels) / len(window_levels)) < 1e-9
+        assert (
+            abs(stats["slope_per_day"] - _naive_slope([ts for ts, _ in in_window], window_levels))
+            < 1e-6
+        )
+        assert stats["trend"] == _naive_trend(window_levels)
+
+
+def test_incremental_updates_match_batch_build():
+    """Test that adding entries one at a time gives the same windows as a rebuild."""
+    now, timestamps, levels = _series(200, seed=7)
+    state = TrendState()
+    for i, (timestamp, level) in enumerate(zip(timestamps, levels)):
+        assert state.add(timestamp, level)
+        if i % 40 == 39:
+            rebuilt = TrendState.from_series(timestamps[: i + 1], levels[: i + 1])
+            assert state.summary(now) == rebuilt.summary(now)
+            assert abs(state.ewma - rebuilt.ewma) < 1e-9
+    # Out-of-order entries are rejected rather than corrupting the sums
+    assert not state.add(timestamps[0], 5)
+    assert len(state) == 200
+
+
+def test_seven_day_trend_matches_mood_context():
+    """Test that the mood context's 7-day trend agrees with the previous halves comparison."""
+    for seed in range(20):
+        now, timestamps, levels = _series(40, seed=seed, span_days=20)
+        context = MoodContextService.get_mood_context(MoodSeries(timestamps, levels))
+        recent = [level for ts, level in zip(timestamps, levels) if ts >= now - timedelta(days=7)]
+        if not recent:
+            continue
+        assert context["trend"] == _naive_trend(recent)
+        assert context["average_mood"] == round(sum(recent) / len(recent), 1)
+        assert context["trends"]["7d"]["trend"] == context["trend"]
+        assert context["trends"]["30d"]["count"] == len(levels)
+
+
+def test_ewma_weights_recent_entries():
+    """Test that the EWMA follows recent levels and the slope sign follows the direction."""
+    now = datetime.utcnow()
+    timestamps = [now - timedelta(days=60 - day) for day in range(60)]
+    levels = [2] * 50 + [9] * 10
+    state = TrendState.from_series(timestamps, levels)
+    assert state.ewma > 6
+    assert state.window(90, now)["slope_per_day"] > 0
+    assert state.window(7, now)["trend"] == "stable"
+    # Two entries at the same instant have no time axis
+    same = TrendState.from_series([now, now], [3, 7])
+    assert same.window(7, now)["slope_per_day"] is None
+    assert same.window(7, now)["trend"] == "improving"
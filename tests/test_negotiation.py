@@ -0,0 +1,96 @@
+import struct
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from services import negotiation, serialization
+from services.serialization import MSGPACK_MEDIA_TYPE
+
+client = TestClient(app)
+
+
+def _user_with_moods(count: int) -> str:
+    user_id = f"negotiation_user_{uuid.uuid4().hex[:8]}"
+    for i in range(count):
+        client.post(
+            "/api/mood",
+            json={"mood_level": 1 + i % 10, "notes": f"entry number {i}", "user_id": user_id},
+        )
+    return user_id
+
+
+def test_fallback_packer_matches_msgpack_format():
+    """Test the pure-Python MessagePack encoder against hand-encoded bytes."""
+    payload = {"a": [1, -1, None, True, 1.5, "x", 300, -200]}
+    expected = (
+        b"\x81\xa1a\x98\x01\xff\xc0\xc3\xcb"
+        + struct.pack(">d", 1.5)
+        + b"\xa1x\xcd\x01\x2c\xd1\xff\x38"
+    )
+    out = bytearray()
+    serialization._pack_into(out, payload)
+    assert bytes(out) == expected
+
+
+def test_msgpack_history_round_trip():
+    """Test that MessagePack history sends field names once and epoch timestamps."""
+    msgpack = pytest.importorskip("msgpack")
+    timestamp = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    rows = [("u1", 7, "ok", timestamp), ("u1", 4, None, timestamp.replace(tzinfo=None))]
+    decoded = msgpack.unpackb(serialization.encode_mood_history_msgpack("u1", rows))
+    assert decoded["fields"] == list(serialization.MOOD_HISTORY_FIELDS)
+    assert decoded["moods"] == [
+        ["u1", 7, "ok", timestamp.timestamp()],
+        ["u1", 4, None, timestamp.timestamp()],
+    ]
+
+
+def test_accept_negotiates_msgpack_with_own_etag():
+    """Test that only an explicit Accept selects MessagePack and that it gets its own validators."""
+    user_id = _user_with_moods(2)
+    url = f"/api/mood/history?user_id={user_id}"
+
+    as_json = client.get(url, headers={"Accept": "*/*"})
+    as_msgpack = client.get(url, headers={"Accept": "application/msgpack, application/json;q=0.5"})
+    assert as_json.headers["content-type"] == "application/json"
+    assert as_msgpack.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert as_msgpack.headers["vary"] == "Accept, Accept-Encoding"
+    assert as_msgpack.headers["etag"] != as_json.headers["etag"]
+    assert len(as_msgpack.content) < len(as_json.content)
+
+    preferred_json = client.get(
+        url, headers={"Accept": "application/json, application/msgpack;q=0.5"}
+    )
+    assert preferred_json.headers["content-type"] == "application/json"
+
+    revalidated = client.get(
+        url, headers={"Accept": MSGPACK_MEDIA_TYPE, "If-None-Match": as_msgpack.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    cross = client.get(
+        url, headers={"Accept": "application/json", "If-None-Match": as_msgpack.headers["etag"]}
+    )
+    assert cross.status_code == 200
+
+
+def test_large_responses_are_compressed(monkeypatch):
+    """Test that bodies over the threshold are gzip compressed only when the client accepts it."""
+    monkeypatch.setattr(negotiation, "brotli", None)
+    user_id = _user_with_moods(30)
+    url = f"/api/mood/history?user_id={user_id}"
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert len(compressed.json()["moods"]) == 30
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == compressed.json()
+
+    small = client.get(
+        f"/api/mood/history?user_id={_user_with_moods(1)}", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,170 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app import app
+from models.database import Base, JournalEntry, MoodEntry, OutboxCheckpoint, OutboxEvent
+from services.config import settings
+from services.outbox import EventBus, OutboxDispatcher, event_bus
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_events_commit_and_roll_back_with_their_changes(engine):
+    """Test that outbox rows are written in the change's transaction and only for real changes."""
+    with Session(engine) as session:
+        session.add(MoodEntry(user_id="outbox_user", mood_level=4))
+        session.add(JournalEntry(user_id="outbox_user", content="Draft"))
+        session.commit()
+
+        entry = session.query(MoodEntry).one()
+        entry_id = entry.id
+        entry.mood_level = 6
+        session.commit()
+        assert entry.mood_level == 6
+        entry.mood_level = 6  # No net change: no event
+        session.commit()
+
+        session.add(MoodEntry(user_id="outbox_user", mood_level=1))
+        session.flush()
+        session.rollback()
+
+        session.delete(entry)
+        session.commit()
+
+        events = (
+            session.query(OutboxEvent.topic, OutboxEvent.entity_id, OutboxEvent.payload)
+            .order_by(OutboxEvent.id)
+            .all()
+        )
+    assert [(topic, entity_id) for topic, entity_id, _ in events] == [
+        ("mood.created", entry_id),
+        ("journal.created", 1),
+        ("mood.updated", entry_id),
+        ("mood.deleted", entry_id),
+    ]
+    assert events[2].payload["mood_level"] == 6
+    assert events[3].payload == {"id": entry_id, "user_id": "outbox_user"}
+
+
+def test_dispatcher_checkpoints_retries_and_leases(engine):
+    """Test filtered batches, retry of a failing consumer from its checkpoint and single-owner leases."""
+    with Session(engine) as session:
+        session.add_all([MoodEntry(user_id="outbox_user", mood_level=level) for level in (3, 5, 7)])
+        session.add(JournalEntry(user_id="outbox_user", content="Evening notes"))
+        session.commit()
+
+    bus = EventBus()
+    moods, attempts = [], []
+
+    @bus.consumer("mood_levels", topics=("mood.*",))
+    async def collect(events):
+        moods.extend(event.payload["mood_level"] for event in events)
+
+    @bus.consumer("flaky")
+    async def flaky(events):
+        attempts.append([event.id for event in events])
+        if len(attempts) == 1:
+            raise RuntimeError("downstream unavailable")
+
+    first = OutboxDispatcher(bus, engines={"default": engine}, owner="worker-1")
+    second = OutboxDispatcher(bus, engines={"default": engine}, owner="worker-2")
+
+    async def run():
+        assert await first.dispatch_once() == 4  # mood_levels consumed; flaky failed and stays put
+        assert await second.dispatch_once() == 0  # first holds both leases
+        first._retry_at.clear()
+        assert await first.dispatch_once() == 4
+        assert await first.dispatch_once() == 0
+        await first.stop()
+
+    asyncio.run(run())
+    assert moods == [3, 5, 7]
+    assert attempts == [[1, 2, 3, 4], [1, 2, 3, 4]]
+    with Session(engine) as session:
+        assert dict(session.query(OutboxCheckpoint.consumer, OutboxCheckpoint.position)) == {
+            "mood_levels": 4,
+            "flaky": 4,
+        }
+
+    with pytest.raises(TypeError):
+        bus.subscribe("sync_handler", lambda events: None)
+
+
+def test_dispatcher_waits_for_ids_committed_out_of_order(engine, monkeypatch):
+    """Test that a lower id committed after a higher one is still delivered, and a hole that never commits is skipped."""
+    monkeypatch.setattr(settings, "SEQUENCE_GAP_SECONDS", 0.2)
+    bus, seen = EventBus(), []
+
+    @bus.consumer("all")
+    async def collect(events):
+        seen.extend(event.id for event in events)
+
+    def commit_event(event_id):
+        # Explicit ids stand in for two PostgreSQL transactions that flushed in one order and committed in the other
+        with Session(engine) as session:
+            session.execute(
+                insert(OutboxEvent),
+                [
+                    {
+                        "id": event_id,
+                        "topic": "mood.created",
+                        "user_id": "outbox_user",
+                        "entity_id": event_id,
+                        "payload": {},
+                    },
+                ],
+            )
+            session.commit()
+
+    dispatcher = OutboxDispatcher(bus, engines={"default": engine}, owner="worker-1")
+
+    async def run():
+        commit_event(2)
+        assert await dispatcher.dispatch_once() == 0  # id 1 may still commit
+        commit_event(1)
+        assert await dispatcher.dispatch_once() == 2
+        commit_event(4)
+        assert await dispatcher.dispatch_once() == 0
+        await asyncio.sleep(0.25)  # id 3 never commits (rolled back): skipped after the wait
+        assert await dispatcher.dispatch_once() == 1
+        await dispatcher.stop()
+
+    asyncio.run(run())
+    assert seen == [1, 2, 4]
+
+
+def test_lifespan_dispatcher_delivers_api_writes():
+    """Test that the app's dispatcher delivers events for API writes to registered consumers."""
+    user_id = f"outbox_user_{uuid.uuid4().hex[:8]}"
+    received = []
+
+    async def consume(events):
+        received.extend(
+            event.payload.get("mood_level") for event in events if event.user_id == user_id
+        )
+
+    event_bus.subscribe(f"test_consumer_{uuid.uuid4().hex[:8]}", consume, topics=("mood.created",))
+    try:
+        with TestClient(app) as client:
+            client.post("/api/mood", json={"mood_level": 8, "user_id": user_id})
+            deadline = time.monotonic() + 5
+            while not received and time.monotonic() < deadline:
+                time.sleep(0.02)
+    finally:
+        for name in [
+            name for name, consumer in event_bus.consumers.items() if consumer.handler is consume
+        ]:
+            event_bus.unsubscribe(name)
+    assert received == [8]
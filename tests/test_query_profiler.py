@@ -0,0 +1,55 @@
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import app
+from services import query_profiler
+from services.config import settings
+from services.query_profiler import QueryStats, attach_query_profiler, normalize_parameters
+
+client = TestClient(app)
+
+
+def test_normalize_parameters_hides_values():
+    """Test that parameters are described by type and size only."""
+    assert normalize_parameters(("secret note", 7, None)) == "(<str:11>, <int>, NULL)"
+    assert normalize_parameters({"user_id": "alice"}) == "{user_id: <str:5>}"
+    assert normalize_parameters([("a",), ("bb",)], executemany=True) == "2 x (<str:1>)"
+
+
+def test_repeated_statements_and_slow_query_log(monkeypatch, caplog):
+    """Test per-request counting, N+1 detection and slow query logging."""
+    engine = create_engine("sqlite://")
+    attach_query_profiler(engine)
+    attach_query_profiler(engine)  # Idempotent
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0)
+
+    stats = QueryStats()
+    token = query_profiler._current_stats.set(stats)
+    try:
+        with caplog.at_level(logging.WARNING, logger="services.query_profiler"):
+            with engine.connect() as conn:
+                for i in range(6):
+                    conn.execute(text("SELECT :value"), {"value": f"private-{i}"})
+    finally:
+        query_profiler._current_stats.reset(token)
+
+    assert stats.count == 6
+    assert stats.total_time > 0
+    assert stats.repeated_statements(5) == [("SELECT ?", 6)]
+    assert "Slow query" in caplog.text
+    assert "private-" not in caplog.text
+
+
+def test_debug_mode_adds_query_headers(monkeypatch):
+    """Test that query counts are attached to responses in debug mode only."""
+    response = client.get("/api/mood/statistics?user_id=profiler_user")
+    assert "x-db-query-count" not in response.headers
+
+    monkeypatch.setattr(settings, "DEBUG", True)
+    # A different window misses the statistics cache, so the query runs
+    response = client.get("/api/mood/statistics?user_id=profiler_user&days_back=7")
+    assert int(response.headers["x-db-query-count"]) >= 1
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert response.headers["x-db-repeated-statements"] == "0"
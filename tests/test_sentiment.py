@@ -0,0 +1,104 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app import app
+from models.database import JournalEntry, MoodEntry
+from services.conditional import get_user_versions
+from services.database import get_db_session
+from services.migrations import backfill_sentiment
+from services.mood_context import MoodContextService
+from services.repositories import JournalRepository, MoodRepository
+from services.sentiment import build_table, score_batch, score_text
+
+client = TestClient(app)
+
+
+def test_scores_polarity_negation_and_emotion():
+    """Test lexicon scoring of positive, negative and negated text."""
+    positive = score_text("Had a really wonderful, relaxing day with friends")
+    negative = score_text("Feeling so anxious and overwhelmed about work")
+    negated = score_text("I am not happy at all")
+
+    assert positive.score > 0.5 and positive.emotion in ("joy", "calm")
+    assert negative.score < -0.5 and negative.emotion == "anxiety"
+    assert negated.score < 0
+    assert score_text("The meeting is at noon") == (0.0, None)
+    assert score_text(None) is None
+
+
+def test_table_includes_inflections():
+    """Test that regular inflections of lexicon words are precomputed."""
+    table = build_table()
+    assert table["worrying"] == table["worry"]
+    assert table["relaxing"] == table["relax"]
+
+
+def test_batch_matches_single_scoring():
+    """Test that batch scoring returns the same scores as one-by-one scoring."""
+    texts = ["great day", None, "so tired", "sad and lonely"]
+    assert score_batch(texts) == [score_text(text) for text in texts]
+
+
+def test_writes_store_scores_used_by_mood_context():
+    """Test that mood notes are scored on write and surfaced in the mood context."""
+    user_id = "sentiment_user"
+    client.post(
+        "/api/mood", json={"mood_level": 4, "notes": "Stressed and exhausted", "user_id": user_id}
+    )
+    client.post("/api/mood", json={"mood_level": 5, "notes": "Feeling worried", "user_id": user_id})
+
+    with get_db_session() as session:
+        series = MoodRepository(session).get_mood_series_by_user(user_id)
+        journal = JournalRepository(session).create_journal_entry(
+            user_id, "Grateful for a calm evening"
+        )
+        journal_score = journal.sentiment_score
+
+    context = MoodContextService.get_mood_context(series)
+    assert context["notes_sentiment"] < 0
+    assert context["latest_emotion"] == "anxiety"
+    assert journal_score > 0
+
+
+def test_backfill_scores_unscored_rows():
+    """Test that the backfill scores legacy rows and skips already-scored ones."""
+    with get_db_session() as session:
+        repo = MoodRepository(session)
+        entry = repo.create_mood_entry("backfill_user", 3, notes="Angry and frustrated today")
+        journal = JournalRepository(session).create_journal_entry("backfill_user", "Lonely and sad")
+        entry.sentiment_score = entry.emotion = None
+        journal.sentiment_score = journal.emotion = None
+        entry_id, journal_id = entry.id, journal.id
+
+    with get_db_session() as session:
+        report = backfill_sentiment(session, batch_size=50, workers=2)
+
+    with get_db_session() as session:
+        entry = session.get(MoodEntry, entry_id)
+        journal = session.get(JournalEntry, journal_id)
+        assert entry.emotion == "anger" and entry.sentiment_score < 0
+        assert journal.emotion == "sadness"
+        assert report["mood_entries"] >= 1
+
+    with get_db_session() as session:
+        assert backfill_sentiment(session, workers=1)["mood_entries"] == 0
+
+
+def test_backfill_counts_scored_rows_and_bumps_versions():
+    """Test that rows left unscored are not reported and that scored users' mood version moves on."""
+    user_id = f"backfill_{uuid.uuid4().hex[:8]}"
+    with get_db_session() as session:
+        repo = MoodRepository(session)
+        entries = [
+            repo.create_mood_entry(user_id, 3, notes=notes) for notes in ("Sad and tired", "")
+        ]
+        for entry in entries:
+            entry.sentiment_score = entry.emotion = None
+
+    with get_db_session() as session:
+        before = get_user_versions(session, user_id)["mood_version"]
+        backfill_sentiment(session, workers=1)
+        assert get_user_versions(session, user_id)["mood_version"] == before + 1
+        # The empty note is still unscored, but rescanning it scores nothing
+        assert backfill_sentiment(session, workers=1)["mood_entries"] == 0
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app import app
+from models.schemas import MoodResponse
+from services import serialization
+from services.database import get_db_session
+from services.repositories import ChatRepository, MoodRepository, convert_mood_entry_to_schema
+
+client = TestClient(app)
+
+TIMESTAMPS = [
+    datetime(2024, 5, 1, 12, 0, 0),
+    datetime(2024, 5, 1, 12, 0, 0, 123456),
+    datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc),
+    datetime(2024, 5, 1, 12, 0, 0, 5, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+]
+
+
+def legacy_mood_history(user_id, db_moods):
+    """Reproduce the pydantic response_model path the fast path replaced."""
+    moods = [convert_mood_entry_to_schema(mood) for mood in db_moods]
+    return MoodResponse(user_id=user_id, moods=moods).model_dump(mode="json")
+
+
+def legacy_chat_history(user_id, messages):
+    """Reproduce the per-row dict path the fast path replaced."""
+    return jsonable_encoder(
+        {
+            "user_id": user_id,
+            "messages": [
+                {
+                    "id": msg.id,
+                    "message": msg.message,
+                    "response": msg.response,
+                    "timestamp": msg.timestamp,
+                    "ai_provider": msg.ai_provider,
+                    "ai_model": msg.ai_model,
+                }
+                for msg in messages
+            ],
+        }
+    )
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_mood_encoding_matches_pydantic(encoder):
+    """Test that encoded mood rows match MoodResponse serialization."""
+    rows = [
+        ("u1", level, note, ts)
+        for level, note, ts in zip([1, 5, 10, 7], [None, "ok", "ünï", '"q"'], TIMESTAMPS)
+    ]
+    expected = MoodResponse(
+        user_id="u1",
+        moods=[dict(zip(serialization.MOOD_HISTORY_FIELDS, row)) for row in rows],
+    ).model_dump_json()
+
+    assert json.loads(serialization.encode_mood_history("u1", rows)) == json.loads(expected)
+
+
+def test_chat_encoding_matches_jsonable_encoder(encoder):
+    """Test that encoded chat rows match FastAPI's default dict encoding."""
+    rows = [(i, f"m{i}", f"r{i}", ts, "mock", "mock-model") for i, ts in enumerate(TIMESTAMPS)]
+    expected = jsonable_encoder(
+        {
+            "user_id": "u1",
+            "messages": [dict(zip(serialization.CHAT_HISTORY_FIELDS, row)) for row in rows],
+            "next_cursor": None,
+        }
+    )
+
+    assert json.loads(serialization.encode_chat_history("u1", rows)) == expected
+
+
+def test_mood_history_endpoint_matches_legacy_output():
+    """Test the /api/mood/history fast path against the previous pydantic output."""
+    client.post(
+        "/api/mood", json={"mood_level": 4, "notes": "fast path", "user_id": "serializer_user"}
+    )
+    client.post("/api/mood", json={"mood_level": 6, "user_id": "serializer_user"})
+
+    response = client.get("/api/mood/history?user_id=serializer_user&days_back=7")
+    all_response = client.get("/api/mood/history?days_back=7")
+
+    with get_db_session() as session:
+        repo = MoodRepository(session)
+        expected = legacy_mood_history(
+            "serializer_user", repo.get_mood_entries_by_user("serializer_user", 7)
+        )
+        expected_all = legacy_mood_history(None, repo.get_all_mood_entries(7))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected
+    assert all_response.json() == expected_all
+
+
+def test_chat_history_endpoint_matches_legacy_output():
+    """Test the /api/chat/history fast path against the previous dict output."""
+    client.post("/api/chat", json={"message": "first", "user_id": "serializer_chat_user"})
+    client.post("/api/chat", json={"message": "second", "user_id": "serializer_chat_user"})
+
+    response = client.get("/api/chat/history?user_id=serializer_chat_user&limit=5")
+
+    with get_db_session() as session:
+        messages = ChatRepository(session).get_chat_history_by_user("serializer_chat_user", 5)
+        expected = legacy_chat_history("serializer_chat_user", messages)
+
+    assert response.status_code == 200
+    assert response.json() == {**expected, "next_cursor": None}
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import pytest
+
+import serve
+from services.database import db_config, ensure_db
+
+
+class FakeProcess:
+    events = []
+    counter = 0
+
+    def __init__(self, config, target, sockets):
+        FakeProcess.counter += 1
+        self.pid = FakeProcess.counter
+
+    def start(self):
+        self.events.append(("start", self.pid))
+
+    def is_alive(self, timeout=5):
+        return True
+
+    def terminate(self):
+        self.events.append(("terminate", self.pid))
+
+    def join(self):
+        pass
+
+
+def test_rolling_restart_starts_replacement_before_stopping_worker(monkeypatch):
+    """Test that SIGHUP restarts never leave fewer than N live workers."""
+    monkeypatch.setattr(serve, "Process", FakeProcess)
+    FakeProcess.events.clear()
+    supervisor = serve.RollingMultiprocess.__new__(serve.RollingMultiprocess)
+    supervisor.config = supervisor.target = None
+    supervisor.sockets = []
+    supervisor.restart_grace = 0
+    supervisor.should_exit = threading.Event()
+    supervisor.processes = [FakeProcess(None, None, []), FakeProcess(None, None, [])]
+    old_pids = [process.pid for process in supervisor.processes]
+
+    supervisor.restart_all()
+
+    new_pids = [process.pid for process in supervisor.processes]
+    assert set(new_pids).isdisjoint(old_pids)
+    assert FakeProcess.events == [
+        ("start", new_pids[0]),
+        ("terminate", old_pids[0]),
+        ("start", new_pids[1]),
+        ("terminate", old_pids[1]),
+    ]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available on this platform")
+def test_forked_child_gets_fresh_connection_pool():
+    """Test that a forked worker does not reuse the parent's pooled connections."""
+    ensure_db()
+    parent_pool = db_config.engine.pool
+    with db_config.engine.connect():
+        pass  # Leave a connection in the parent's pool
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        fresh = db_config.engine.pool is not parent_pool and db_config.engine.pool.checkedin() == 0
+        os.write(write_fd, b"1" if fresh else b"0")
+        os._exit(0)
+
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    os.close(read_fd)
+    assert result == b"1"
+    assert db_config.engine.pool is parent_pool
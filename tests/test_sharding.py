@@ -0,0 +1,151 @@
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.database import ChatMessage, MoodAlert, MoodChangeState, MoodEntry
+from services.config import settings
+from services.database import DatabaseConfig
+from services.repositories import ChatRepository, MoodRepository
+from services.sharding import HashRing, parse_shard_urls, reshard
+
+USERS = [f"shard_user_{i:02d}" for i in range(12)]
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    urls = {name: f"sqlite:///{tmp_path / name}.db" for name in ("a", "b", "c")}
+    monkeypatch.setattr(
+        settings, "DATABASE_SHARDS", ",".join(f"{name}={url}" for name, url in urls.items())
+    )
+    config = DatabaseConfig()
+    config.initialize()
+    config.create_tables()
+    yield config, urls, tmp_path
+    for engine in config.engines.values():
+        engine.dispose()
+
+
+def _populate(config):
+    start = datetime.utcnow() - timedelta(days=1)
+    session = config.SessionLocal()
+    for n, user_id in enumerate(USERS):
+        for i, level in enumerate((8, 8, 8, 8, 2, 1, 1, 1)):
+            MoodRepository(session).create_mood_entry(
+                user_id, level, timestamp=start + timedelta(minutes=n + 20 * i)
+            )
+        ChatRepository(session).create_chat_message(
+            user_id, "hi", "hello", "mock", "mock-model", {"status": "available"}
+        )
+    session.commit()
+    session.close()
+
+
+def _users_in(path):
+    with sqlite3.connect(path) as conn:
+        return {user_id for (user_id,) in conn.execute("SELECT user_id FROM mood_entries")}
+
+
+def test_parse_and_ring_placement():
+    """Test shard URL parsing and that the ring is balanced and moves few users when a shard is added."""
+    assert parse_shard_urls("a=sqlite:///a.db, b=postgresql://u:p@h/db?sslmode=require") == {
+        "a": "sqlite:///a.db",
+        "b": "postgresql://u:p@h/db?sslmode=require",
+    }
+    assert parse_shard_urls("sqlite:///x.db?mode=ro,sqlite:///y.db") == {
+        "shard0": "sqlite:///x.db?mode=ro",
+        "shard1": "sqlite:///y.db",
+    }
+
+    users = [f"user_{i}" for i in range(30000)]
+    three = HashRing(["a", "b", "c"])
+    counts = Counter(three.shard_for(user_id) for user_id in users)
+    assert all(abs(count - 10000) < 1000 for count in counts.values())
+
+    four = HashRing(["a", "b", "c", "d"])
+    moved = [user_id for user_id in users if three.shard_for(user_id) != four.shard_for(user_id)]
+    assert all(four.shard_for(user_id) == "d" for user_id in moved)
+    assert len(moved) < len(users) * 0.3
+
+
+def test_repositories_route_by_user(sharded):
+    """Test that each user's rows and snapshots live on one shard and cross-user reads merge shards."""
+    config, urls, tmp_path = sharded
+    _populate(config)
+    ring = HashRing(urls)
+
+    for name in urls:
+        assert _users_in(tmp_path / f"{name}.db") == {u for u in USERS if ring.shard_for(u) == name}
+
+    session = config.SessionLocal()
+    try:
+        mood_repo, chat_repo = MoodRepository(session), ChatRepository(session)
+        assert len(mood_repo.get_mood_rows_by_user(USERS[3], days_back=7)) == 8
+        assert len(mood_repo.get_mood_alerts_by_user(USERS[3])) == 1
+        message = chat_repo.get_chat_history_by_user(USERS[5])[0]
+        assert chat_repo.get_mood_context(message) == {"status": "available"}
+
+        rows = mood_repo.get_all_mood_rows(days_back=7)
+        assert len(rows) == len(USERS) * 8
+        assert [row.timestamp for row in rows] == sorted(row.timestamp for row in rows)
+        first = mood_repo.get_all_mood_entries(days_back=7, limit=5)
+        assert [entry.user_id for entry in first] == USERS[:5]
+    finally:
+        session.close()
+
+
+def test_reshard_moves_users_and_remaps_ids(sharded):
+    """Test that resharding moves only users whose shard changes, with their references intact."""
+    config, urls, tmp_path = sharded
+    _populate(config)
+    target = dict(urls, d=f"sqlite:///{tmp_path / 'd'}.db")
+
+    report = reshard(urls, target)
+    ring = HashRing(target)
+    moved = [u for u in USERS if ring.shard_for(u) == "d"]
+    assert report["users_moved"] == len(moved) > 0
+    assert report["rows_moved"] == len(moved) * (
+        1 + 8 + 1 + 1 + 1
+    )  # user, moods, chat, state, alert
+    for name in target:
+        assert _users_in(tmp_path / f"{name}.db") == {u for u in USERS if ring.shard_for(u) == name}
+
+    with sqlite3.connect(tmp_path / "d.db") as conn:
+        dangling = conn.execute(
+            f"SELECT (SELECT COUNT(*) FROM {MoodAlert.__tablename__} WHERE mood_entry_id NOT IN (SELECT id FROM {MoodEntry.__tablename__}))"
+            f" + (SELECT COUNT(*) FROM {MoodChangeState.__tablename__} WHERE last_entry_id NOT IN (SELECT id FROM {MoodEntry.__tablename__}))"
+            f" + (SELECT COUNT(*) FROM {ChatMessage.__tablename__} WHERE mood_context_snapshot_id NOT IN (SELECT id FROM mood_context_snapshots))"
+        ).fetchone()[0]
+    assert dangling == 0
+
+    assert reshard(urls, target)["users_moved"] == 0
+
+
+def test_reshard_logs_the_move_without_outbox_events(sharded):
+    """Test that moved rows get sync upserts on the new shard and tombstones on the old one, but no events."""
+    config, urls, tmp_path = sharded
+    _populate(config)
+    target = dict(urls, d=f"sqlite:///{tmp_path / 'd'}.db")
+    reshard(urls, target)
+    moved = {u for u in USERS if HashRing(target).shard_for(u) == "d"}
+
+    with sqlite3.connect(tmp_path / "d.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM outbox_events").fetchone()[0] == 0
+        logged = set(
+            conn.execute(
+                "SELECT user_id, row_id FROM sync_changes WHERE entity = 'mood' AND op = 'upsert'"
+            )
+        )
+        assert logged == set(conn.execute("SELECT user_id, id FROM mood_entries"))
+
+    tombstones = Counter()
+    for name in urls:
+        with sqlite3.connect(tmp_path / f"{name}.db") as conn:
+            tombstones.update(
+                user_id
+                for (user_id,) in conn.execute(
+                    "SELECT user_id FROM sync_changes WHERE op = 'delete'"
+                )
+            )
+    assert tombstones == {user_id: 8 for user_id in moved}
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from services.cache import Cache, MemoryBackend
+from services.metrics import metrics
+from services.singleflight import SingleFlight
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_computation():
+    """Test that callers arriving while a key is in flight reuse its result."""
+    group = SingleFlight()
+    calls = []
+    labels = (("kind", "sf_test"), ("role", "coalesced"))
+    before = metrics.get_counter("singleflight_requests_total", labels)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return b"result"
+
+    results, _ = _run_concurrently(5, lambda: group.do("key", compute, kind="sf_test"))
+
+    assert results == [b"result"] * 5
+    assert len(calls) == 1
+    assert metrics.get_counter("singleflight_requests_total", labels) - before == 4
+    assert group.in_flight() == 0
+
+
+def test_errors_propagate_to_waiting_callers():
+    """Test that every coalesced caller sees the leader's exception."""
+    group = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    _, errors = _run_concurrently(3, lambda: group.do("key", fail))
+
+    assert all(isinstance(e, ValueError) for e in errors)
+    with pytest.raises(KeyError):
+        group.do("key", lambda: {}["missing"])
+
+
+def test_concurrent_cache_misses_query_once():
+    """Test that a cold cache key is computed once for simultaneous readers."""
+    local = Cache(MemoryBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return b"stats"
+
+    results, _ = _run_concurrently(
+        4, lambda: local.get_or_set_bytes("dana", "mood_stats", (30,), compute)
+    )
+
+    assert results == [b"stats"] * 4
+    assert len(calls) == 1
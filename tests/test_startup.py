@@ -0,0 +1,57 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app import app
+from services import database
+from services.config import settings
+from services.metrics import metrics
+
+
+def test_lifespan_warms_up_before_first_request():
+    """Test that startup initializes the database, pool and agent and reports timings."""
+    with TestClient(app) as client:
+        report = app.state.startup_report.as_dict()
+        response = client.get("/health")
+
+    assert response.status_code == 200
+    for phase in ("database", "create_tables", "connection_pool", "agent", "total"):
+        assert phase in report
+    assert report["total"] >= report["agent"]
+    assert metrics.get_gauge("app_startup_seconds", (("phase", "total"),)) is not None
+
+
+def test_production_startup_skips_create_all(monkeypatch):
+    """Test that create_all is skipped when DB_CREATE_TABLES is off."""
+    monkeypatch.setattr(settings, "DB_CREATE_TABLES", False)
+
+    with TestClient(app):
+        report = app.state.startup_report.as_dict()
+
+    assert "create_tables" not in report
+    assert "connection_pool" in report
+
+
+def test_concurrent_first_requests_initialize_once(monkeypatch):
+    """Test that racing callers of ensure_db run initialization a single time."""
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def fake_init_db(create_tables=True):
+        calls.append(create_tables)
+        database._initialized = True
+
+    monkeypatch.setattr(database, "_initialized", False)
+    monkeypatch.setattr(database, "init_db", fake_init_db)
+
+    def worker():
+        barrier.wait()
+        database.ensure_db()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
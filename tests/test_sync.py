@@ -0,0 +1,159 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app import app
+from models.database import Base, ExerciseSession, JournalEntry, MoodEntry, SyncChange, User
+from services.config import settings
+from services.database import get_db_session
+from services.pagination import encode_sync_cursor
+from services.repositories import JournalRepository, MoodRepository
+from services.sync import read_changes, seed_sync_changes
+
+client = TestClient(app)
+
+
+def _sync(user_id: str, cursor: str = None, limit: int = 500) -> dict:
+    params = {"user_id": user_id, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    response = client.get("/api/sync", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_sync_returns_only_changes_since_cursor():
+    """Test that a sync returns new rows, then only later updates and tombstones, collapsed per row."""
+    user_id = f"sync_user_{uuid.uuid4().hex[:8]}"
+    for level in (5, 6):
+        client.post("/api/mood", json={"mood_level": level, "user_id": user_id})
+    with get_db_session() as session:
+        journal_id = (
+            JournalRepository(session).create_journal_entry(user_id, "A calm day", title="draft").id
+        )
+        session.add(
+            ExerciseSession(
+                user_id=user_id, exercise_type="breathing", exercise_name="Box breathing"
+            )
+        )
+
+    first = _sync(user_id)
+    assert [(c["type"], c["op"]) for c in first["changes"]] == [
+        ("mood", "upsert"),
+        ("mood", "upsert"),
+        ("journal", "upsert"),
+        ("exercise", "upsert"),
+    ]
+    assert first["changes"][0]["data"]["mood_level"] == 5
+    assert not first["has_more"] and not first["reset"]
+    assert _sync(user_id, first["cursor"])["changes"] == []
+
+    with get_db_session() as session:
+        JournalRepository(session).update_journal_entry(journal_id, title="final")
+    with get_db_session() as session:
+        JournalRepository(session).update_journal_entry(journal_id, content="A calm, good day")
+        mood_id = MoodRepository(session).get_mood_entries_by_user(user_id)[0].id
+        MoodRepository(session).delete_mood_entry(mood_id)
+
+    delta = _sync(user_id, first["cursor"])
+    assert [(c["type"], c["op"], c["id"]) for c in delta["changes"]] == [
+        ("journal", "upsert", journal_id),
+        ("mood", "delete", mood_id),
+    ]
+    assert delta["changes"][0]["data"]["title"] == "final"
+    assert "data" not in delta["changes"][1]
+
+
+def test_sync_pages_and_rejects_bad_cursors():
+    """Test bounded pages, invalid cursors and the reset signal for cursors from another database."""
+    user_id = f"sync_user_{uuid.uuid4().hex[:8]}"
+    for level in range(1, 6):
+        client.post("/api/mood", json={"mood_level": level, "user_id": user_id})
+
+    seen, cursor, has_more = [], None, True
+    while has_more:
+        page = _sync(user_id, cursor, limit=2)
+        assert len(page["changes"]) <= 2
+        seen += [change["data"]["mood_level"] for change in page["changes"]]
+        cursor, has_more = page["cursor"], page["has_more"]
+    assert seen == [1, 2, 3, 4, 5]
+
+    assert (
+        client.get("/api/sync", params={"user_id": user_id, "cursor": "not-a-cursor"}).status_code
+        == 400
+    )
+    moved = _sync(user_id, encode_sync_cursor("old_shard", 10**9))
+    assert moved["reset"] and len(moved["changes"]) == 5
+
+
+def test_seed_logs_existing_rows_once(tmp_path):
+    """Test that rows written before the change log are seeded once, even below ids already logged."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        # Core inserts bypass the flush hook, like rows written before it existed
+        session.execute(insert(User), [{"user_id": "old_user"}])
+        session.execute(
+            insert(MoodEntry), [{"user_id": "old_user", "mood_level": level} for level in (3, 4)]
+        )
+        session.execute(
+            insert(JournalEntry),
+            [
+                {"user_id": "old_user", "content": content}
+                for content in ("Edited later", "Before sync")
+            ],
+        )
+        session.commit()
+        # The older legacy journal entry is edited once the log exists; the newer one stays unlogged
+        edited = session.query(JournalEntry).filter(JournalEntry.content == "Edited later").one()
+        edited.title = "edited"
+        session.commit()
+
+        assert seed_sync_changes(session) == {"mood": 2, "journal": 1, "exercise": 0, "music": 0}
+        assert session.query(SyncChange).filter(SyncChange.entity == "journal").count() == 2
+        session.add(MoodEntry(user_id="old_user", mood_level=7))
+        session.commit()
+        assert seed_sync_changes(session) == {"mood": 0, "journal": 0, "exercise": 0, "music": 0}
+        assert session.query(SyncChange).filter(SyncChange.entity == "mood").count() == 3
+    engine.dispose()
+
+
+def test_cursor_stops_below_uncommitted_sequences(tmp_path, monkeypatch):
+    """Test that a change committed after a higher sequence is not skipped by a cursor handed out before it."""
+    monkeypatch.setattr(settings, "SEQUENCE_GAP_SECONDS", 0.2)
+    engine = create_engine(f"sqlite:///{tmp_path / 'gaps.db'}")
+    Base.metadata.create_all(bind=engine)
+
+    def commit_change(seq):
+        # Explicit ids stand in for two PostgreSQL transactions that flushed in one order and committed in the other
+        with Session(engine) as session:
+            session.execute(
+                insert(SyncChange),
+                [
+                    {
+                        "id": seq,
+                        "user_id": "gap_user",
+                        "entity": "mood",
+                        "row_id": seq,
+                        "op": "delete",
+                    },
+                ],
+            )
+            session.commit()
+
+    with Session(engine) as session:
+        commit_change(2)
+        changes, cursor, _ = read_changes(session, "gap_user", 0, 10, "default")
+        assert (changes, cursor) == ([], 0)  # sequence 1 may still commit
+        commit_change(1)
+        changes, cursor, _ = read_changes(session, "gap_user", cursor, 10, "default")
+        assert [change["seq"] for change in changes] == [1, 2] and cursor == 2
+
+        commit_change(4)
+        assert read_changes(session, "gap_user", cursor, 10, "default")[1] == 2
+        time.sleep(0.25)  # sequence 3 never commits (rolled back): passed after the wait
+        assert read_changes(session, "gap_user", cursor, 10, "default")[1] == 4
+    engine.dispose()